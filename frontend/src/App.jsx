@@ -95,14 +95,21 @@ export default function App() {
     // Function to fetch projects from the Django API
     const fetchProjects = async () => {
       try {
-        // Use the proxied API endpoint
-        const response = await fetch('/api/projects/');
-        if (!response.ok) {
-          // If response is not OK (e.g., 404, 500), throw an error
-          throw new Error(`HTTP error! status: ${response.status}`);
+        // Use the proxied API endpoint; the list is cursor-paginated, so follow the "next" links
+        const allProjects = [];
+        let url = '/api/projects/?page_size=100';
+        while (url) {
+          const response = await fetch(url);
+          if (!response.ok) {
+            // If response is not OK (e.g., 404, 500), throw an error
+            throw new Error(`HTTP error! status: ${response.status}`);
+          }
+          const data = await response.json();
+          allProjects.push(...data.results);
+          // "next" is an absolute URL built by the backend; keep only its path so it goes through the proxy
+          url = data.next ? new URL(data.next).pathname + new URL(data.next).search : null;
         }
-        const data = await response.json();
-        setProjects(data); // Set the fetched projects to state
+        setProjects(allProjects); // Set the fetched projects to state
       } catch (error) {
         console.error("Error fetching projects:", error);
         setError(error); // Set error state
@@ -274,6 +274,8 @@ export default function CustomAIModelPage() {
         headers: {
           "Content-Type": "application/json",
           'Authorization': `Bearer ${token}`,
+          // One key per prompt: a retried request is answered once by the server
+          'Idempotency-Key': crypto.randomUUID(),
         },
         body: JSON.stringify(body)
       });
@@ -405,6 +407,8 @@ export default function CustomAIModelPage() {
         headers: {
           "Content-Type": "application/json",
           'Authorization': `Bearer ${token}`,
+          // One key per prompt: a retried request is generated (and counted against the quota) once
+          'Idempotency-Key': crypto.randomUUID(),
         },
         body: JSON.stringify({ prompt: imagePrompt.trim() })
       });
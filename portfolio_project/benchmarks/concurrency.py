@@ -0,0 +1,113 @@
+# portfolio_project/benchmarks/concurrency.py
+"""
+How many concurrent requests can one worker handle?
+
+Starts a single gunicorn worker against the fake upstreams in each serving mode:
+  sync    - gunicorn's sync worker (--threads 1) running project.wsgi
+  gthread - one worker with --threads N running project.wsgi (the default deployment)
+  asgi    - ASGI_MODE=True: uvicorn worker running project.asgi with the async views
+then ramps client concurrency and reports throughput, p50/p95 latency and the effective
+number of requests in flight (Little's law: throughput x mean latency). Upstream latency
+is what makes the endpoints I/O-bound, so it defaults to a realistic LLM delay.
+
+    python -m benchmarks.concurrency --modes sync,gthread,asgi --concurrency 1,8,32,128 \
+        --endpoints chat,codegen --latency hf_llm=1000 --latency gemini=800 \
+        --output bench-results/concurrency.json
+
+SQLite serializes writes; pass --database-url postgres://... for codegen at high concurrency.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .fake_upstreams import FakeUpstreamServer, add_fault_arguments, apply_fault_arguments
+from .run_benchmarks import PROJECT_DIR, HttpTarget, bench_environment, run_level, _git_revision
+from .startup import gunicorn_server
+
+MODES = ('sync', 'gthread', 'asgi')
+
+
+def mode_settings(mode, env, threads):
+    """
+    Environment and extra gunicorn arguments for one serving mode (always one worker).
+    """
+    args = ['--workers', '1']
+    if mode == 'asgi':
+        return dict(env, ASGI_MODE='True'), args
+    env = dict(env, ASGI_MODE='False')
+    if mode == 'gthread':
+        args += ['--worker-class', 'gthread', '--threads', str(threads)]
+    else:
+        args += ['--threads', '1']  # gunicorn.conf.py defaults to threaded workers
+    return env, args
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-worker concurrency: sync vs threaded vs ASGI.")
+    parser.add_argument('--modes', default=','.join(MODES), help=f"Comma-separated: {', '.join(MODES)}")
+    parser.add_argument('--endpoints', default='chat,codegen', help="Endpoints as in run_benchmarks")
+    parser.add_argument('--concurrency', default='1,8,32,128', help="Comma-separated client concurrency levels")
+    parser.add_argument('--requests-per-client', type=int, default=4,
+                        help="Requests per level = concurrency x this (at least 20)")
+    parser.add_argument('--threads', type=int, default=8, help="Threads for the gthread worker")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--database-url', help="Database for the app (default: throwaway SQLite)")
+    parser.add_argument('--output', help="Write results JSON here")
+    add_fault_arguments(parser)
+    # Later --latency values override these
+    parser.set_defaults(latency=['hf_llm=1000', 'gemini=800'])
+    args = parser.parse_args(argv)
+
+    server = FakeUpstreamServer().start()
+    apply_fault_arguments(server, args)
+    env = dict(os.environ, **bench_environment(server, database_url=args.database_url))
+    # Upstream calls without an async API still use the per-worker upstream pool
+    env.setdefault('UPSTREAM_MAX_THREADS', '64')
+
+    subprocess.check_call([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'], cwd=PROJECT_DIR, env=env)
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    results = []
+    try:
+        for mode in modes:
+            mode_env, extra_args = mode_settings(mode, env, args.threads)
+            with gunicorn_server(mode_env, args.port, *extra_args):
+                target = HttpTarget(f"http://127.0.0.1:{args.port}")
+                for endpoint in endpoints:
+                    run_level(target, endpoint, 1, 2, server.signer, None, 0)  # warm-up
+                    for concurrency in levels:
+                        row = run_level(target, endpoint, concurrency, max(20, concurrency * args.requests_per_client),
+                                        server.signer, None, 0)
+                        row['mode'] = mode
+                        row['in_flight'] = round(row['throughput_rps'] * row['latency_ms']['mean'] / 1000, 1)
+                        results.append(row)
+                        print(f"{mode:<8}{endpoint:<10}conc={concurrency:<5}rps={row['throughput_rps']:<8}"
+                              f"p50={row['latency_ms']['p50']:<10}p95={row['latency_ms']['p95']:<10}"
+                              f"in_flight={row['in_flight']:<7}errors={row['errors']}")
+    finally:
+        server.stop()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'upstream_faults': {name: vars(profile) for name, profile in server.faults.items()},
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+# portfolio_project/benchmarks/fake_upstreams.py
+"""
+Local stand-ins for the upstream services the AI endpoints call, for offline benchmarking:
+Hugging Face inference (embeddings, chat completion, text-to-image, summarization),
+Pinecone (control plane + index), Gemini (generateContent + streamGenerateContent),
+Google OAuth2 signing certs and Google Safe Browsing, plus a static web page for URL fetching.
+
+Every service has its own fault profile (latency, jitter, error rate) that can be changed
+while the server runs. Run standalone to benchmark an external server:
+
+    python -m benchmarks.fake_upstreams --port 9100 --latency hf_llm=800 --error-rate pinecone=0.05
+
+and export the printed environment variables before starting Django.
+Requires `cryptography` (to mint the RSA key/certificate used to sign fake Google ID tokens).
+"""
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+EMBEDDING_DIM = 768
+INDEX_NAME = 'codegen-demo'
+CLIENT_ID = 'bench-client-id'
+KEY_ID = 'bench-key'
+
+SERVICES = ('hf_embedding', 'hf_llm', 'hf_image', 'hf_summarization', 'pinecone', 'gemini', 'google_auth', 'safebrowsing', 'web')
+
+PAGE_HTML = (
+    "<html><head><title>Bench page</title><style>body{}</style><script>var x=1;</script></head><body>"
+    + "".join(f"<p>Paragraph {i}: Django views, serializers and querysets explained in detail.</p>" for i in range(400))
+    + "</body></html>"
+)
+
+
+@dataclass
+class FaultProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+    def apply(self):
+        """
+        Sleep for the configured latency; return True if this call should fail.
+        """
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return random.random() < self.error_rate
+
+
+def _png_bytes(size=64):
+    """
+    A valid grayscale PNG, built by hand so the fake has no imaging dependency.
+    """
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    raw = b''.join(b'\x00' + bytes((x * 4) % 256 for x in range(size)) for _ in range(size))
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 0, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(raw))
+        + chunk(b'IEND', b'')
+    )
+
+
+def _vector(seed_text):
+    rng = random.Random(seed_text)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIM)]
+
+
+class GoogleSigner:
+    """
+    RSA key + self-signed certificate used to mint ID tokens the app will accept
+    when GOOGLE_OAUTH2_CERTS_URL points at the fake server.
+    """
+
+    def __init__(self):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+        from google.auth import crypt
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'bench')])
+        now = datetime.now(timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=30))
+            .sign(key, hashes.SHA256())
+        )
+        self.cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+        key_pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        ).decode()
+        self._signer = crypt.RSASigner.from_string(key_pem, key_id=KEY_ID)
+
+    def token(self, sub, audience=CLIENT_ID, lifetime=3600):
+        from google.auth import jwt
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com',
+            'aud': audience,
+            'sub': str(sub),
+            'email': f"{sub}@bench.local",
+            'iat': now,
+            'exp': now + lifetime,
+        }
+        return jwt.encode(self._signer, payload).decode()
+
+
+class FakeUpstreamServer:
+    """
+    One threaded HTTP server that routes by path prefix to each fake service.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.faults = {name: FaultProfile() for name in SERVICES}
+        self.calls = {name: 0 for name in SERVICES}
+        self.signer = GoogleSigner()
+        self._calls_lock = threading.Lock()
+        # Vectors upserted into the fake index (id -> metadata), so fetch/list/delete behave like the real thing
+        self.vectors = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, service, latency_ms=None, jitter_ms=None, error_rate=None):
+        profile = self.faults[service]
+        if latency_ms is not None:
+            profile.latency_ms = latency_ms
+        if jitter_ms is not None:
+            profile.jitter_ms = jitter_ms
+        if error_rate is not None:
+            profile.error_rate = error_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def django_env(self):
+        """
+        Environment variables that point the Django app at this server.
+        """
+        base = self.base_url
+        return {
+            'HF_API_TOKEN': 'bench-hf-token',
+            'HF_INFERENCE_BASE_URL': f"{base}/hf",
+            'PINECONE_API_KEY': 'bench-pinecone-key',
+            'PINECONE_CONTROLLER_HOST': f"{base}/pinecone",
+            'PINECONE_HOST': f"{base}/pinecone-index",
+            'GEMINI_API_KEY': 'bench-gemini-key',
+            'GEMINI_API_BASE': f"{base}/gemini/v1beta",
+            'GOOGLE_CLIENT_ID': CLIENT_ID,
+            'GOOGLE_OAUTH2_CERTS_URL': f"{base}/google/certs",
+            'GOOGLE_SAFE_BROWSING_API_KEY': 'bench-safebrowsing-key',
+            'GOOGLE_SAFE_BROWSING_API_URL': f"{base}/safebrowsing/v4/threatMatches:find",
+        }
+
+    def page_url(self):
+        return f"{self.base_url}/web/page.html"
+
+    def _record(self, service):
+        with self._calls_lock:
+            self.calls[service] += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    return json.loads(raw) if raw else {}
+                except ValueError:
+                    return {}
+
+            def _send(self, status, body, content_type='application/json'):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _service_for(self, path):
+                if path.startswith('/hf/'):
+                    if path.endswith('/chat/completions'):
+                        return 'hf_llm'
+                    if 'FLUX' in path:
+                        return 'hf_image'
+                    if 'pegasus' in path:
+                        return 'hf_summarization'
+                    return 'hf_embedding'
+                for prefix, service in (
+                    ('/pinecone', 'pinecone'), ('/gemini/', 'gemini'), ('/google/', 'google_auth'),
+                    ('/safebrowsing/', 'safebrowsing'), ('/web/', 'web'),
+                ):
+                    if path.startswith(prefix):
+                        return service
+                return None
+
+            def _dispatch(self):
+                path = self.path.split('?', 1)[0]
+                service = self._service_for(path)
+                if service is None:
+                    return self._send(404, {'error': 'unknown route'})
+                server._record(service)
+                body = self._body() if self.command == 'POST' else {}
+                if server.faults[service].apply():
+                    return self._send(503, {'error': f'injected {service} failure'})
+                handler = getattr(self, f"_handle_{service}")
+                return handler(path, body)
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+            def _handle_hf_embedding(self, path, body):
+                inputs = body.get('inputs', '')
+                if isinstance(inputs, list):
+                    return self._send(200, [_vector(text) for text in inputs])
+                return self._send(200, [_vector(inputs)])
+
+            def _handle_hf_llm(self, path, body):
+                if body.get('stream'):
+                    return self._send(400, {'error': 'streaming not supported by the fake'})
+                last = (body.get('messages') or [{}])[-1].get('content', '')
+                content = f"Here is an answer to: {last[:80]}\n```python\nprint('hello from the fake LLM')\n```"
+                return self._send(200, {
+                    'id': 'bench', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': 'bench', 'system_fingerprint': 'bench',
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                    'usage': {'prompt_tokens': 10, 'completion_tokens': 20, 'total_tokens': 30},
+                })
+
+            def _handle_hf_image(self, path, body):
+                return self._send(200, _png_bytes(), content_type='image/png')
+
+            def _handle_hf_summarization(self, path, body):
+                text = body.get('inputs', '')
+                return self._send(200, [{'summary_text': f"Summary of {len(text)} characters of conversation."}])
+
+            def _handle_pinecone(self, path, body):
+                if path.startswith('/pinecone-index'):
+                    if path.endswith('/describe_index_stats'):
+                        return self._send(200, {'namespaces': {'': {'vectorCount': 1000}}, 'dimension': EMBEDDING_DIM, 'indexFullness': 0.0, 'totalVectorCount': 1000})
+                    if path.endswith('/query'):
+                        top_k = int(body.get('topK', 3))
+                        matches = [
+                            {
+                                'id': f"doc-{i}",
+                                'score': 0.9 - i * 0.05,
+                                'values': _vector(f"doc-{i}") if body.get('includeValues') else [],
+                                'metadata': {'text': f"Document {i}: Django ORM querysets are lazy and chainable. " * 20},
+                            }
+                            for i in range(top_k)
+                        ]
+                        return self._send(200, {'matches': matches, 'namespace': body.get('namespace', '')})
+                    if path.endswith('/vectors/upsert'):
+                        vectors = body.get('vectors', [])
+                        with server._calls_lock:
+                            server.vectors.update((vector['id'], vector.get('metadata') or {}) for vector in vectors)
+                        return self._send(200, {'upsertedCount': len(vectors)})
+                    if '/vectors/fetch' in self.path:
+                        ids = parse_qs(urlsplit(self.path).query).get('ids', [])
+                        with server._calls_lock:
+                            found = {vector_id: server.vectors[vector_id] for vector_id in ids if vector_id in server.vectors}
+                        vectors = {
+                            vector_id: {'id': vector_id, 'values': _vector(vector_id), 'metadata': metadata}
+                            for vector_id, metadata in found.items()
+                        }
+                        return self._send(200, {'vectors': vectors, 'namespace': ''})
+                    if '/vectors/list' in self.path:
+                        prefix = parse_qs(urlsplit(self.path).query).get('prefix', [''])[0]
+                        with server._calls_lock:
+                            ids = sorted(vector_id for vector_id in server.vectors if vector_id.startswith(prefix))
+                        return self._send(200, {'vectors': [{'id': vector_id} for vector_id in ids], 'namespace': '',
+                                                'usage': {'readUnits': 1}})
+                    if path.endswith('/vectors/delete'):
+                        with server._calls_lock:
+                            if body.get('deleteAll'):
+                                server.vectors.clear()
+                            for vector_id in body.get('ids') or []:
+                                server.vectors.pop(vector_id, None)
+                        return self._send(200, {})
+                    return self._send(404, {'error': 'unknown index route'})
+                index = {
+                    'name': INDEX_NAME, 'dimension': EMBEDDING_DIM, 'metric': 'cosine',
+                    'host': f"{server.base_url}/pinecone-index",
+                    'spec': {'serverless': {'cloud': 'aws', 'region': 'us-east-1'}},
+                    'status': {'ready': True, 'state': 'Ready'},
+                }
+                if path.rstrip('/').endswith('/indexes'):
+                    return self._send(200, {'indexes': [index]})
+                return self._send(200, index)
+
+            def _handle_gemini(self, path, body):
+                reply = "This is a fake Gemini reply about **Django** and cloud deployments."
+                if path.endswith(':streamGenerateContent'):
+                    words = reply.split(' ')
+                    payload = ''.join(
+                        'data: ' + json.dumps({'candidates': [{'content': {'role': 'model', 'parts': [{'text': word + ' '}]}}]}) + '\r\n\r\n'
+                        for word in words
+                    ).encode()
+                    return self._send(200, payload, content_type='text/event-stream')
+                return self._send(200, {'candidates': [{'content': {'role': 'model', 'parts': [{'text': reply}]}, 'finishReason': 'STOP'}]})
+
+            def _handle_google_auth(self, path, body):
+                return self._send(200, {KEY_ID: server.signer.cert_pem})
+
+            def _handle_safebrowsing(self, path, body):
+                # Nothing is malicious in the bench: an empty body means "no matches"
+                return self._send(200, {})
+
+            def _handle_web(self, path, body):
+                return self._send(200, PAGE_HTML.encode(), content_type='text/html; charset=utf-8')
+
+        return Handler
+
+
+def parse_service_values(items, cast=float):
+    """
+    Parse ["hf_llm=800", "pinecone=20"] (or "all=50") into {service: value}.
+    """
+    values = {}
+    for item in items or []:
+        name, _, raw = item.partition('=')
+        targets = SERVICES if name == 'all' else (name,)
+        for target in targets:
+            if target not in SERVICES:
+                raise ValueError(f"Unknown service '{target}'. Choose from: {', '.join(SERVICES)}")
+            values[target] = cast(raw)
+    return values
+
+
+def add_fault_arguments(parser):
+    parser.add_argument('--latency', action='append', metavar='SERVICE=MS', help="Added latency per service (or all=MS)")
+    parser.add_argument('--jitter', action='append', metavar='SERVICE=MS', help="Uniform +/- jitter per service")
+    parser.add_argument('--error-rate', action='append', metavar='SERVICE=P', help="Fraction of calls answered with 503")
+
+
+def apply_fault_arguments(server, args):
+    for service, value in parse_service_values(args.latency).items():
+        server.configure(service, latency_ms=value)
+    for service, value in parse_service_values(args.jitter).items():
+        server.configure(service, jitter_ms=value)
+    for service, value in parse_service_values(args.error_rate).items():
+        server.configure(service, error_rate=value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake upstream services for benchmarking.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--tokens', type=int, default=0, help="Print this many signed Google ID tokens")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeUpstreamServer(args.host, args.port)
+    apply_fault_arguments(server, args)
+    for key, value in server.django_env().items():
+        print(f"export {key}='{value}'")
+    for i in range(args.tokens):
+        print(f"# token {i}: {server.signer.token(f'bench-user-{i}')}")
+    print(f"# Fake upstreams listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
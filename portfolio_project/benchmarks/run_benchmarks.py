@@ -0,0 +1,367 @@
+# portfolio_project/benchmarks/run_benchmarks.py
+"""
+Offline end-to-end benchmark for the AI endpoints (codegen, flux image, Gemini chat).
+
+Starts the fake upstream services (benchmarks/fake_upstreams.py), points Django at them,
+then drives each endpoint at the requested concurrency levels and reports p50/p95/p99
+latency, throughput, status codes and a per-stage breakdown taken from the Server-Timing
+header. Results are written as JSON so runs can be compared.
+
+In-process (default; Django is set up in this process and called through the test client):
+    python -m benchmarks.run_benchmarks --endpoints codegen,flux,chat --concurrency 1,4,16 \
+        --requests 60 --latency hf_llm=800 --latency pinecone=40 --output bench-results/baseline.json
+
+Against a running server (the harness starts the fakes, prints the environment the server
+must be started with, and waits for Enter):
+    python -m benchmarks.run_benchmarks --target http://127.0.0.1:8000 --concurrency 1,8,32 ...
+
+Compare two runs:
+    python -m benchmarks.run_benchmarks --compare bench-results/baseline.json bench-results/new.json
+
+Tokenizer note: HF_ENDPOINT points at the fake server, so count_tokens() cannot download the
+Mistral tokenizer; if it is not in the local Hugging Face cache, trimming is skipped and the
+numbers omit it. (HF_HUB_OFFLINE is not used: it also blocks the InferenceClient calls.)
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .fake_upstreams import FakeUpstreamServer, add_fault_arguments, apply_fault_arguments
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+CODEGEN_QUESTIONS = [
+    "How do I write a Django queryset that filters by a related model field?",
+    "Show me a DRF serializer with a nested read-only field.",
+    "What is the difference between select_related and prefetch_related?",
+    "Write a Python function that chunks a list into batches of n items.",
+    "How can I add a custom management command in Django?",
+    "Explain how to use F expressions to update a counter atomically.",
+]
+IMAGE_PROMPTS = ["A watercolor fox reading Python docs", "Isometric server room at sunset", "A robot sketching UML diagrams"]
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def parse_server_timing(header):
+    stages = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        if not name:
+            continue
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                try:
+                    stages[name] = stages.get(name, 0.0) + float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+class InProcessTarget:
+    """
+    Calls the Django app in this process through django.test.Client (one client per thread).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            from django.test import Client
+            client = self._local.client = Client()
+        return client
+
+    def post(self, path, payload, headers):
+        response = self._client().post(path, data=json.dumps(payload), content_type='application/json', headers=headers)
+        if getattr(response, 'streaming', False):
+            body_size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            body_size = len(response.content)
+        return response.status_code, response.headers.get('Server-Timing', ''), body_size
+
+
+class HttpTarget:
+    """
+    Calls an already running server over HTTP with a pooled requests.Session per thread.
+    """
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def post(self, path, payload, headers):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.post(f"{self.base_url}{path}", json=payload, headers=headers, stream=True, timeout=300)
+        # Bytes on the wire (still compressed if the server compressed them)
+        body_size = sum(len(chunk) for chunk in response.raw.stream(65536, decode_content=False))
+        return response.status_code, response.headers.get('Server-Timing', ''), body_size
+
+
+def build_request(endpoint, i, signer, page_url, url_fraction, query='', accept_encoding=None):
+    """
+    Return (path, payload, headers) for the i-th request of an endpoint scenario.
+    """
+    path, payload, headers = _scenario_request(endpoint, i, signer, page_url, url_fraction)
+    if query:
+        path = f"{path}?{query}"
+    if accept_encoding:
+        headers['Accept-Encoding'] = accept_encoding
+    return path, payload, headers
+
+
+def _scenario_request(endpoint, i, signer, page_url, url_fraction):
+    if endpoint in ('codegen', 'codegen_cached'):
+        question = CODEGEN_QUESTIONS[i % len(CODEGEN_QUESTIONS)]
+        if page_url and url_fraction and (i % max(1, round(1 / url_fraction))) == 0:
+            question = f"{question} See {page_url}"
+        token = signer.token(f"bench-codegen-{i % 8}")
+        payload = {'input': question}
+        if endpoint == 'codegen':
+            payload['cache'] = False
+        return '/api/codegen/', payload, {'Authorization': f"Bearer {token}"}
+    if endpoint == 'flux':
+        # Unique user per request: the monthly quota is 2 images per user
+        token = signer.token(f"bench-flux-{uuid.uuid4().hex}")
+        return '/api/flux-image/', {'prompt': IMAGE_PROMPTS[i % len(IMAGE_PROMPTS)]}, {'Authorization': f"Bearer {token}"}
+    if endpoint in ('chat', 'chat_stream'):
+        payload = {'messages': [
+            {'role': 'user', 'content': 'What does Osmar work on?'},
+            {'role': 'model', 'content': 'Cloud, AI and full-stack projects.'},
+            {'role': 'user', 'content': f"Tell me more about Django deployments ({i})."},
+        ]}
+        if endpoint == 'chat_stream':
+            payload['stream'] = True
+        return '/api/chat/', payload, {}
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+
+def run_level(target, endpoint, concurrency, total_requests, signer, page_url, url_fraction, query='', accept_encoding=None):
+    requests_to_send = [
+        build_request(endpoint, i, signer, page_url, url_fraction, query, accept_encoding) for i in range(total_requests)
+    ]
+    samples = []
+    samples_lock = threading.Lock()
+
+    def one(request):
+        path, payload, headers = request
+        start = time.perf_counter()
+        try:
+            status, server_timing, size = target.post(path, payload, headers)
+        except Exception as e:
+            status, server_timing, size = f"exception:{type(e).__name__}", '', 0
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with samples_lock:
+            samples.append((elapsed_ms, status, parse_server_timing(server_timing), size))
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests_to_send))
+    wall_seconds = time.perf_counter() - wall_start
+
+    latencies = sorted(sample[0] for sample in samples)
+    status_counts = {}
+    stage_values = {}
+    for _, status, stages, _ in samples:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+        for name, duration in stages.items():
+            stage_values.setdefault(name, []).append(duration)
+    errors = sum(count for status, count in status_counts.items() if not status.startswith('2'))
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': errors,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'mean_response_bytes': round(sum(sample[3] for sample in samples) / len(samples)),
+        'status_counts': status_counts,
+        'stages_ms': {
+            name: {
+                'p50': round(percentile(sorted(values), 50), 2),
+                'p95': round(percentile(sorted(values), 95), 2),
+                'mean': round(sum(values) / len(values), 2),
+                'count': len(values),
+            }
+            for name, values in sorted(stage_values.items())
+        },
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_environment(server, semantic_cache=False, database_url=None):
+    """
+    Environment for a Django process that talks to the fakes and an isolated database.
+    """
+    env = server.django_env()
+    env['DJANGO_SETTINGS_MODULE'] = os.environ.get('DJANGO_SETTINGS_MODULE', 'project.settings')
+    env['DJANGO_ALLOWED_HOSTS'] = 'testserver,127.0.0.1,localhost'
+    env['SEMANTIC_CACHE_ENABLED'] = 'True' if semantic_cache else 'False'
+    # Runs measure the pipeline; upstream bulkheads would turn most concurrent requests into 503s
+    env['BULKHEAD_ENABLED'] = 'False'
+    # Hub downloads (the tokenizer) go to the fake server and fail fast instead of reaching the internet
+    env['HF_ENDPOINT'] = os.environ.get('HF_ENDPOINT', f"{server.base_url}/hf-hub")
+    env['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'WARNING')
+    if database_url:
+        env['DATABASE_URL'] = database_url
+    elif 'DATABASE_URL' not in os.environ:
+        env['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='portfolio-bench-')}/bench.sqlite3"
+    return env
+
+
+def setup_django(server, args):
+    """
+    Point the app at the fakes and an isolated database, then run migrations.
+    """
+    os.environ.update(bench_environment(server, args.semantic_cache, args.database_url))
+    sys.path.insert(0, str(PROJECT_DIR))
+
+    from django.conf import settings
+    # SQLite serializes writers; give concurrent requests time to wait for the lock
+    if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0, interactive=False)
+
+
+def print_table(results):
+    header = f"{'endpoint':<14}{'conc':>5}{'reqs':>6}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'bytes':>10}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        latency = row['latency_ms']
+        print(f"{row['endpoint']:<14}{row['concurrency']:>5}{row['requests']:>6}{row['errors']:>5}"
+              f"{row['throughput_rps']:>9}{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+              f"{row['mean_response_bytes']:>10}")
+        stages = ', '.join(f"{name}={values['p50']}" for name, values in row['stages_ms'].items() if name != 'total')
+        if stages:
+            print(f"{'':<14}stage p50 ms: {stages}")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r['endpoint'], r['concurrency']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['endpoint'], r['concurrency']): r for r in json.load(f)['results']}
+    print(f"{'endpoint':<14}{'conc':>5}{'metric':>10}{'old':>12}{'new':>12}{'change':>10}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        rows = [(f"{p} ms", before['latency_ms'][p], after['latency_ms'][p]) for p in ('p50', 'p95', 'p99')]
+        rows.append(('rps', before['throughput_rps'], after['throughput_rps']))
+        for metric, a, b in rows:
+            change = f"{(b - a) / a * 100:+.1f}%" if a else 'n/a'
+            print(f"{key[0]:<14}{key[1]:>5}{metric:>10}{a:>12}{b:>12}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AI endpoints against local upstream stand-ins.")
+    parser.add_argument('--endpoints', default='codegen,flux,chat',
+                        help="Comma-separated: codegen, codegen_cached, flux, chat, chat_stream")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=40, help="Requests per endpoint and concurrency level")
+    parser.add_argument('--warmup', type=int, default=2, help="Unmeasured requests per endpoint before measuring")
+    parser.add_argument('--url-fraction', type=float, default=0.0,
+                        help="Fraction of codegen questions that include a URL to the fake web page")
+    parser.add_argument('--query', default='', help="Query string added to every request, e.g. 'context=full' or 'fields=response'")
+    parser.add_argument('--accept-encoding', help="Accept-Encoding header to send, e.g. 'gzip' or 'br' (response sizes are measured on the wire)")
+    parser.add_argument('--semantic-cache', action='store_true', help="Leave the semantic answer cache enabled")
+    parser.add_argument('--database-url', help="Database for the in-process app (default: throwaway SQLite)")
+    parser.add_argument('--target', help="Base URL of a running server instead of calling Django in-process")
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files and exit")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    server = FakeUpstreamServer().start()
+    apply_fault_arguments(server, args)
+    if args.target:
+        print("Start the target server with these environment variables:")
+        for key, value in server.django_env().items():
+            print(f"  export {key}='{value}'")
+        input("Press Enter once the server is running... ")
+        target = HttpTarget(args.target)
+    else:
+        setup_django(server, args)
+        target = InProcessTarget()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    page_url = server.page_url()
+    results = []
+    try:
+        for endpoint in endpoints:
+            if args.warmup:
+                run_level(target, endpoint, 1, args.warmup, server.signer, page_url, args.url_fraction,
+                          args.query, args.accept_encoding)
+            for concurrency in levels:
+                results.append(run_level(target, endpoint, concurrency, args.requests, server.signer, page_url,
+                                         args.url_fraction, args.query, args.accept_encoding))
+    finally:
+        server.stop()
+
+    print_table(results)
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'target': args.target or 'in-process',
+            'upstream_faults': {name: vars(profile) for name, profile in server.faults.items()},
+            'upstream_calls': server.calls,
+            'args': {key: value for key, value in vars(args).items() if key != 'compare'},
+        },
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
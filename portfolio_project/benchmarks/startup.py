@@ -0,0 +1,229 @@
+# portfolio_project/benchmarks/startup.py
+"""
+Import-time and boot-time benchmark.
+
+imports: in fresh interpreters, times django.setup(), importing portfolio_app.views (what a
+worker pays before its first request) and each deferred AI library on its own, and lists
+which of those libraries the views import pulled in.
+
+boot: starts gunicorn against the fake upstreams with and without GUNICORN_PRELOAD=True and
+measures time until /health/ answers, latency of the first and later codegen requests, and
+per-worker memory (RSS, and PSS/USS where /proc/<pid>/smaps_rollup exists) so the
+copy-on-write sharing of the preloaded master shows up.
+
+    python -m benchmarks.startup imports --repeat 5
+    python -m benchmarks.startup boot --workers 4 --output bench-results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+from portfolio_app.warmup import HEAVY_MODULES
+
+from .fake_upstreams import FakeUpstreamServer
+from .run_benchmarks import PROJECT_DIR, CODEGEN_QUESTIONS, bench_environment
+
+_IMPORT_PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+import portfolio_app.views
+t2 = time.perf_counter()
+print(json.dumps({
+    'django_setup_s': t1 - t0,
+    'views_import_s': t2 - t1,
+    'heavy_loaded': [m for m in %r if m in sys.modules],
+}))
+'''
+
+_MODULE_PROBE = '''
+import json, time
+t0 = time.perf_counter()
+import %s
+print(json.dumps({'seconds': time.perf_counter() - t0}))
+'''
+
+
+def _run_probe(code, env):
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=PROJECT_DIR, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summary(values):
+    return {'median': round(statistics.median(values), 4), 'min': round(min(values), 4), 'max': round(max(values), 4)}
+
+
+def measure_imports(env, repeat):
+    probes = [_run_probe(_IMPORT_PROBE % (HEAVY_MODULES,), env) for _ in range(repeat)]
+    modules = {}
+    for name in HEAVY_MODULES:
+        try:
+            modules[name] = _summary([_run_probe(_MODULE_PROBE % name, env)['seconds'] for _ in range(repeat)])
+        except subprocess.CalledProcessError:
+            modules[name] = None  # not installed
+    return {
+        'django_setup_s': _summary([probe['django_setup_s'] for probe in probes]),
+        'views_import_s': _summary([probe['views_import_s'] for probe in probes]),
+        'heavy_loaded_by_views': probes[0]['heavy_loaded'],
+        'heavy_module_import_s': modules,
+    }
+
+
+def _get(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _post_json(url, payload, headers, timeout=120):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), method='POST',
+        headers={'Content-Type': 'application/json', **headers},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory_kb(pid):
+    """
+    RSS/PSS/USS of a process in KiB (Linux only; empty dict elsewhere).
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                    fields[key] = int(rest.split()[0])
+    except OSError:
+        return fields
+    return {
+        'rss': fields.get('Rss'),
+        'pss': fields.get('Pss'),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+@contextmanager
+def gunicorn_server(env, port, *extra_args):
+    """
+    Start gunicorn (app and worker class from gunicorn.conf.py + env) and yield
+    (process, seconds until /health/ answered). The server is stopped on exit.
+    """
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{port}", '--timeout', '300', *extra_args],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+            try:
+                if _get(f"{base}/health/", timeout=1) == 200:
+                    break
+            except OSError:
+                pass
+            if time.perf_counter() - started > 300:
+                raise RuntimeError("gunicorn did not become ready within 300s")
+            time.sleep(0.05)
+        yield process, time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def measure_boot(env, server, preload, workers, port, requests_after_boot):
+    env = dict(env, GUNICORN_PRELOAD='True' if preload else 'False')
+    base = f"http://127.0.0.1:{port}"
+    with gunicorn_server(env, port, '--workers', str(workers)) as (process, ready_s):
+        latencies = []
+        statuses = {}
+        for i in range(requests_after_boot):
+            token = server.signer.token(f"bench-startup-{i}")
+            payload = {'input': CODEGEN_QUESTIONS[i % len(CODEGEN_QUESTIONS)], 'cache': False}
+            request_started = time.perf_counter()
+            code = _post_json(f"{base}/api/codegen/", payload, {'Authorization': f"Bearer {token}"})
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+
+        worker_memory = [_memory_kb(pid) for pid in _children(process.pid)]
+        return {
+            'preload': preload,
+            'workers': workers,
+            'ready_s': round(ready_s, 3),
+            'first_request_ms': round(latencies[0], 1) if latencies else None,
+            'later_requests_median_ms': round(statistics.median(latencies[1:]), 1) if len(latencies) > 1 else None,
+            'statuses': statuses,
+            'master_memory_kb': _memory_kb(process.pid),
+            'worker_memory_kb': worker_memory,
+            'worker_pss_total_kb': sum(m.get('pss') or 0 for m in worker_memory) or None,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time and boot-time benchmark.")
+    parser.add_argument('mode', choices=('imports', 'boot', 'all'))
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per import measurement")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--requests', type=int, default=8, help="Codegen requests sent after each boot")
+    parser.add_argument('--database-url', help="Database for the app (default: throwaway SQLite)")
+    parser.add_argument('--output', help="Write results JSON here")
+    args = parser.parse_args(argv)
+
+    server = FakeUpstreamServer().start()
+    env = dict(os.environ, **bench_environment(server, database_url=args.database_url))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(PROJECT_DIR), env.get('PYTHONPATH')]))
+    report = {}
+    try:
+        if args.mode in ('imports', 'all'):
+            report['imports'] = measure_imports(env, args.repeat)
+            print(json.dumps(report['imports'], indent=2))
+        if args.mode in ('boot', 'all'):
+            subprocess.check_call([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'], cwd=PROJECT_DIR, env=env)
+            report['boot'] = [
+                measure_boot(env, server, preload, args.workers, args.port, args.requests)
+                for preload in (False, True)
+            ]
+            for row in report['boot']:
+                print(f"preload={row['preload']!s:<6} ready={row['ready_s']}s first={row['first_request_ms']}ms "
+                      f"later={row['later_requests_median_ms']}ms workers_pss={row['worker_pss_total_kb']}KiB "
+                      f"statuses={row['statuses']}")
+    finally:
+        server.stop()
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# portfolio_project/gunicorn.conf.py
+"""
+Gunicorn settings (picked up automatically from the working directory).
+
+Preload mode is opt-in: with GUNICORN_PRELOAD=True the master imports the Django app and
+runs portfolio_app.warmup.warm_up() before forking, so workers share the AI libraries,
+tokenizer and resolved Pinecone index copy-on-write and boot without the import cost.
+Without it, workers import the app themselves and load the heavy parts on first use.
+
+ASGI_MODE=True serves project.asgi with uvicorn workers (and Django routes the AI endpoints
+to the async views); otherwise project.wsgi runs on threaded workers (GUNICORN_THREADS per
+worker), so requests blocked on an AI upstream leave threads free for the cheap endpoints
+(the upstream bulkheads in settings.py keep them from taking every thread).
+"""
+import gc
+import os
+import sys
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'False') == 'True'
+
+if os.environ.get('ASGI_MODE', 'False') == 'True':
+    wsgi_app = 'project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'project.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+
+if preload_app:
+    # The master touches the tokenizer before forking; Rust-side parallelism must stay off
+    os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the first worker is forked
+    if not preload_app:
+        return
+    from portfolio_app.warmup import warm_up
+    warm_up()
+    # Keep the warmed objects out of the collector's reach so GC passes in workers
+    # do not write to (and un-share) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Only gunicorn workers have a master to replace them when MEMORY_RSS_LIMIT_MB is hit
+    from portfolio_app.memory import enable_worker_recycling
+    enable_worker_recycling()
+    if not preload_app:
+        return
+    from portfolio_app.warmup import reset_after_fork
+    reset_after_fork()
+
+
+def worker_exit(server, worker):
+    # Write any queued conversation messages (MESSAGE_WRITE_BEHIND) before the worker goes away;
+    # if the app never got that far there is nothing to flush
+    message_writer = sys.modules.get('portfolio_app.message_writer')
+    if message_writer is not None:
+        message_writer.shutdown_message_writer()
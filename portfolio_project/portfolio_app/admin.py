@@ -1,5 +1,67 @@
 from django.contrib import admin
-from .models import Project
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import IdempotencyKey, Project, RequestProfile, Technology
 
-# Register your models here.
-admin.site.register(Project)
\ No newline at end of file
+
+@admin.register(Project)
+class ProjectAdmin(admin.ModelAdmin):
+    filter_horizontal = ['technologies']
+
+
+@admin.register(Technology)
+class TechnologyAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name']
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'google_user_id', 'endpoint', 'status', 'response_status', 'created_at']
+    list_filter = ['endpoint', 'status']
+    search_fields = ['key', 'google_user_id']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """
+    Profiles recorded by ProfilingMiddleware; read-only, with a download of the raw
+    profile (pstats dump or collapsed stacks).
+    """
+    list_display = ['created_at', 'method', 'path', 'mode', 'status_code', 'duration_ms', 'issued_by', 'download_link']
+    list_filter = ['mode', 'method', 'status_code']
+    search_fields = ['path', 'issued_by']
+    fields = ['created_at', 'method', 'path', 'mode', 'status_code', 'duration_ms', 'issued_by', 'download_link', 'summary_text']
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view), name='portfolio_app_requestprofile_download'),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if profile.mode == RequestProfile.SAMPLING:
+            filename, content_type = f"profile-{pk}.collapsed.txt", 'text/plain; charset=utf-8'
+        else:
+            filename, content_type = f"profile-{pk}.pstats", 'application/octet-stream'
+        response = HttpResponse(bytes(profile.data), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @admin.display(description='Profile')
+    def download_link(self, obj):
+        return format_html('<a href="{}">Download</a>', reverse('admin:portfolio_app_requestprofile_download', args=[obj.pk]))
+
+    @admin.display(description='Summary')
+    def summary_text(self, obj):
+        return format_html('<pre>{}</pre>', obj.summary)
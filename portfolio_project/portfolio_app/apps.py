@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PortfolioAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portfolio_app'
+
+    def ready(self):
+        # Keep the vector index in sync with Project saves/deletes
+        from . import signals  # noqa: F401
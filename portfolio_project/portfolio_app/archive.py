@@ -0,0 +1,106 @@
+# portfolio_project/portfolio_app/archive.py
+"""
+Cold storage for idle conversations.
+`manage.py archive_conversations` moves the messages of conversations idle for longer than
+CONVERSATION_ARCHIVE_IDLE_DAYS out of the messages table into one compressed blob per
+conversation (ConversationArchive, zlib or lzma over compact JSON). Reads go through
+conversation_messages(), which decompresses the archived part on demand and appends any
+messages written after archiving; a conversation that becomes idle again is re-archived
+with those messages folded into its blob.
+"""
+import json
+import lzma
+import zlib
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Conversation, ConversationArchive, Message
+
+CODECS = {
+    'zlib': (lambda payload: zlib.compress(payload, 9), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def encode_messages(rows, codec):
+    """
+    Compress [sender, content, created_at (ISO), token_count] rows; returns (blob, raw size).
+    """
+    payload = json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return CODECS[codec][0](payload), len(payload)
+
+
+def decode_messages(archive):
+    return json.loads(CODECS[archive.codec][1](bytes(archive.data)))
+
+
+def archived_rows(conversation_id):
+    archive = ConversationArchive.objects.filter(pk=conversation_id).first()
+    return decode_messages(archive) if archive is not None else []
+
+
+def conversation_messages(conversation, offset=0):
+    """
+    (sender, content, created_at) of the conversation's messages from `offset` on, oldest
+    first. The archived part is decompressed only for archived conversations, and only read
+    from the database when the offset does not already skip past it.
+    """
+    live = conversation.messages.order_by('created_at').values_list('sender', 'content', 'created_at')
+    if not conversation.archived_at:
+        return list(live[offset:])
+    archived = [
+        (sender, content, parse_datetime(created_at))
+        for sender, content, created_at, _ in archived_rows(conversation.pk)
+    ]
+    if offset >= len(archived):
+        return list(live[offset - len(archived):])
+    return archived[offset:] + list(live)
+
+
+def idle_conversations(idle_before):
+    """
+    Conversations last updated before idle_before that still have messages in the table
+    (deleted ones are purged instead).
+    """
+    return Conversation.objects.filter(
+        Exists(Message.objects.filter(conversation=OuterRef('pk'))),
+        updated_at__lt=idle_before,
+        deleted_at__isnull=True,
+    )
+
+
+def archive_conversation(conversation_id, idle_before, codec='zlib'):
+    """
+    Move the conversation's messages into its compressed archive (merging with an existing
+    one). Returns (messages moved, raw bytes, compressed bytes), or None if the conversation
+    was written to since idle_before or has nothing to move.
+    """
+    with transaction.atomic():
+        # The row lock makes a concurrent store_exchange (which updates updated_at in the
+        # same transaction as its INSERT) wait until the archive is committed
+        conversation = Conversation.objects.select_for_update().filter(
+            pk=conversation_id, updated_at__lt=idle_before, deleted_at__isnull=True,
+        ).first()
+        if conversation is None:
+            return None
+        live = list(conversation.messages.order_by('created_at').values_list(
+            'pk', 'sender', 'content', 'created_at', 'token_count',
+        ))
+        if not live:
+            return None
+        existing = ConversationArchive.objects.filter(pk=conversation_id).first()
+        rows = decode_messages(existing) if existing is not None else []
+        rows.extend([sender, content, created_at.isoformat(), token_count] for _, sender, content, created_at, token_count in live)
+        data, raw_size = encode_messages(rows, codec)
+        ConversationArchive.objects.update_or_create(
+            conversation_id=conversation_id,
+            defaults={'codec': codec, 'data': data, 'message_count': len(rows), 'raw_size': raw_size},
+        )
+        # Message has no dependents or delete signals: a single DELETE, no collector
+        Message.objects.filter(conversation_id=conversation_id, pk__lte=max(row[0] for row in live)).delete()
+        # Queryset update: leaves updated_at (the idle clock) alone
+        Conversation.objects.filter(pk=conversation_id).update(archived_at=timezone.now())
+    return len(live), raw_size, len(data)
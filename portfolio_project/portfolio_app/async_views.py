@@ -0,0 +1,458 @@
+# portfolio_project/portfolio_app/async_views.py
+"""
+Async versions of the AI endpoints, routed in place of the sync views when ASGI_MODE is on
+(uvicorn workers under gunicorn, see gunicorn.conf.py).
+Upstream HTTP calls are awaited on the event loop (httpx / AsyncInferenceClient), so a
+worker can hold many in-flight requests while they wait on the network. Work that has no
+async API (ORM, Pinecone, Google token verification, tokenizer, URL fetching) runs in
+threads via sync_to_async. Request/response contracts match views.py.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .context_packing import pack_context
+from .fast_path import FAST_PATH_REQUESTS, canned_reply, classify_input, fast_path_enabled, minimal_prompt
+from .idempotency import IDEMPOTENT_REQUESTS, IdempotencyKeyBusy, IdempotencyKeyMismatch, abegin, complete, release, request_key
+from .gemini_client import NO_RESPONSE_TEXT, agenerate_content, astream_content_as_sse, extract_gemini_text
+from .google_auth import verify_google_token
+from .metrics import span
+from .rag_pipeline import (
+    aembed_text,
+    aquery_pinecone,
+    acall_codegen_llm,
+    build_augmented_prompt,
+    trim_conversation_history_to_fit_tokens,
+    hf_model_target,
+)
+from .resilience import aacquire_bulkhead, acall_upstream, get_deadline, BulkheadFullError, UpstreamError, CircuitOpenError
+from .semantic_cache import get_semantic_cache, cache_bypassed, fingerprint_chunks, fingerprint_history
+from .views import (
+    build_gemini_payload,
+    stream_requested,
+    load_conversation_history,
+    collect_url_context,
+    postprocess_generated_code,
+    store_exchange,
+    codegen_response_payload,
+    consume_image_quota,
+    image_response_payload,
+)
+
+logger = logging.getLogger(__name__)
+
+# Blocking helpers without an async API run here rather than on the loop's default
+# executor, whose size (min(32, cpus + 4)) would cap concurrency on small machines
+_blocking_executor = None
+_blocking_executor_lock = threading.Lock()
+
+
+def _get_blocking_executor():
+    global _blocking_executor
+    if _blocking_executor is None:
+        with _blocking_executor_lock:
+            if _blocking_executor is None:
+                _blocking_executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_BLOCKING_THREADS,
+                    thread_name_prefix='async-blocking',
+                )
+    return _blocking_executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Await a blocking call that does not touch the database.
+    """
+    return await sync_to_async(fn, thread_sensitive=False, executor=_get_blocking_executor())(*args, **kwargs)
+
+
+def upstream_unavailable_response(error):
+    """
+    503 response for an upstream call rejected by the resilience layer (open circuit,
+    saturated bulkhead or deadline).
+    """
+    logger.warning("[upstream] %s", error)
+    response = JsonResponse(
+        {'error': 'The AI service is temporarily unavailable. Please try again shortly.'},
+        status=503,
+    )
+    if isinstance(error, (CircuitOpenError, BulkheadFullError)):
+        response['Retry-After'] = str(max(1, int(error.retry_after)))
+    return response
+
+
+async def authenticate(request):
+    """
+    Verify the Google ID token in the Authorization header.
+    Returns (user_info, None) or (None, error response).
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, JsonResponse({'error': 'Authorization header missing or invalid.'}, status=401)
+    user_info = await run_blocking(verify_google_token, auth_header.split(' ')[1])
+    if not user_info:
+        return None, JsonResponse({'error': 'Invalid or expired Google token.'}, status=401)
+    return user_info, None
+
+
+async def aidempotent_response(request, google_user_id, endpoint, handler, *args):
+    """
+    Async idempotent_response(): await handler(request, *args) at most once per
+    Idempotency-Key of the user; duplicates wait for and replay the first response.
+    """
+    try:
+        key = request_key(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not key or not google_user_id:
+        return await handler(request, *args)
+    try:
+        with span('idempotency'):
+            record, stored = await abegin(google_user_id, key, endpoint, request)
+    except IdempotencyKeyMismatch:
+        IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='mismatch')
+        return JsonResponse({'error': 'This Idempotency-Key was already used for a different request.'}, status=422)
+    except IdempotencyKeyBusy:
+        IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='busy')
+        return JsonResponse(
+            {'error': 'A request with this Idempotency-Key is still being processed.'},
+            status=409, headers={'Retry-After': '5'},
+        )
+    if stored is not None:
+        IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='replayed')
+        response_status, body = stored
+        return JsonResponse(body, status=response_status, safe=False, headers={'Idempotent-Replayed': 'true'})
+    IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='executed')
+    try:
+        response = await handler(request, *args)
+    except BaseException:
+        await sync_to_async(release)(record)
+        raise
+    body = json.loads(response.content) if isinstance(response, JsonResponse) else None
+    await sync_to_async(complete)(record, response.status_code, body)
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def gemini_chat_async_view(request):
+    """
+    Async gemini_chat_view: JSON reply, or SSE when streaming is requested.
+    """
+    try:
+        data = json.loads(request.body)
+        messages = data.get('messages')
+        user_message = data.get('message')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)
+
+    if not messages and not user_message:
+        return JsonResponse({'error': 'Either messages array or message field is required'}, status=400)
+
+    gemini_api_key = settings.GEMINI_API_KEY
+    if not gemini_api_key:
+        return JsonResponse({'error': 'Gemini API key not configured'}, status=500)
+
+    payload = build_gemini_payload(messages, user_message)
+    if payload is None:
+        return JsonResponse({'error': 'No valid messages provided'}, status=400)
+
+    if stream_requested(request, data):
+        try:
+            # Taken here so a saturated Gemini bulkhead is a 503, not an error event mid-stream
+            slot = await aacquire_bulkhead('gemini')
+        except BulkheadFullError as e:
+            return upstream_unavailable_response(e)
+        response = StreamingHttpResponse(astream_content_as_sse(payload, slot=slot), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    import httpx
+    try:
+        with span('gemini'):
+            gemini_result = await agenerate_content(payload)
+        ai_response_text = extract_gemini_text(gemini_result, missing_text=NO_RESPONSE_TEXT)
+        if ai_response_text is not None:
+            return JsonResponse({'response': ai_response_text})
+        logger.error("[gemini_chat_async_view] Unexpected Gemini API response structure: %s", gemini_result)
+        return JsonResponse({'error': 'Unexpected response from AI model'}, status=500)
+    except UpstreamError as e:
+        return upstream_unavailable_response(e)
+    except httpx.HTTPError as e:
+        sanitized_error_message = str(e).replace(gemini_api_key, "[REDACTED_API_KEY]")
+        logger.error("[gemini_chat_async_view] Error calling Gemini API: %s", sanitized_error_message)
+        return JsonResponse({'error': f'Failed to connect to AI model: {sanitized_error_message}'}, status=500)
+    except json.JSONDecodeError:
+        logger.error("[gemini_chat_async_view] Error decoding Gemini API response JSON.")
+        return JsonResponse({'error': 'Invalid JSON response from AI model. Received HTML or non-JSON.'}, status=500)
+    except Exception as e:
+        logger.exception("[gemini_chat_async_view] An unexpected error occurred: %s", e)
+        return JsonResponse({'error': 'An unexpected error occurred'}, status=500)
+
+
+async def _verify_recaptcha(recaptcha_token):
+    import httpx
+    recaptcha_verify_url = "https://www.google.com/recaptcha/api/siteverify"
+    recaptcha_payload = {
+        'secret': settings.RECAPTCHA_SECRET_KEY,
+        'response': recaptcha_token,
+    }
+    async with httpx.AsyncClient(timeout=get_deadline('recaptcha')) as client:
+        async def post():
+            # HTTP errors are raised inside the upstream call, so they count against the breaker
+            response = await client.post(recaptcha_verify_url, data=recaptcha_payload)
+            response.raise_for_status()
+            return response.json()
+
+        with span('recaptcha'):
+            return await acall_upstream('recaptcha', post)
+
+
+@csrf_exempt
+@require_POST
+async def custom_ai_model_async_view(request):
+    """
+    Async custom_ai_model_view (Google ID token + reCAPTCHA, then HF chat completion).
+    """
+    user_info, error_response = await authenticate(request)
+    if error_response:
+        return error_response
+
+    try:
+        data = json.loads(request.body)
+        user_input = data.get('input')
+        recaptcha_token = data.get('recaptcha_token')
+
+        if not user_input:
+            return JsonResponse({'error': 'Input field is required for custom AI model'}, status=400)
+        if not recaptcha_token:
+            return JsonResponse({'error': 'reCAPTCHA token is missing.'}, status=400)
+        if not settings.RECAPTCHA_SECRET_KEY:
+            return JsonResponse({'error': 'reCAPTCHA secret key not configured on the server.'}, status=500)
+
+        recaptcha_result = await _verify_recaptcha(recaptcha_token)
+        if not recaptcha_result.get('success'):
+            logger.warning("[custom_ai_model_async_view] reCAPTCHA verification failed: %s", recaptcha_result.get('error-codes'))
+            return JsonResponse({'error': 'reCAPTCHA verification failed. Are you a robot?'}, status=403)
+
+        from huggingface_hub import AsyncInferenceClient
+        hf_model_id = "mistralai/Mistral-7B-Instruct-v0.3"
+        async with AsyncInferenceClient(
+            model=hf_model_target(hf_model_id), token=settings.HF_API_TOKEN, timeout=get_deadline('hf_llm'),
+        ) as inference_client:
+            with span('llm'):
+                chat_completion_response = await acall_upstream(
+                    'hf_llm',
+                    inference_client.chat_completion,
+                    messages=[{"role": "user", "content": user_input}],
+                    max_tokens=200,
+                    temperature=0.7,
+                    top_p=0.9,
+                )
+        generated_text = chat_completion_response.choices[0].message.content if chat_completion_response.choices else "No response generated."
+        logger.debug("[custom_ai_model_async_view] Generated text: %s", generated_text)
+        return JsonResponse({'response': generated_text})
+
+    except UpstreamError as e:
+        return upstream_unavailable_response(e)
+    except json.JSONDecodeError:
+        logger.error("[custom_ai_model_async_view] Error decoding JSON in request body or from AI model response")
+        return JsonResponse({'error': 'Invalid JSON in request body or unexpected AI model response format.'}, status=400)
+    except Exception as e:
+        logger.exception("[custom_ai_model_async_view] An unexpected error occurred: %s", e)
+        return JsonResponse({'error': 'An unexpected error occurred with the custom AI model'}, status=500)
+
+
+async def aanswer_trivial_input(kind, conversation_history, user_input):
+    """
+    Async answer_trivial_input().
+    """
+    if settings.FAST_PATH_REPLIES == 'llm':
+        try:
+            reply = await acall_codegen_llm(minimal_prompt(conversation_history, user_input))
+            FAST_PATH_REQUESTS.inc(kind=kind, reply='llm')
+            return reply
+        except Exception as e:
+            logger.warning("[aanswer_trivial_input] LLM reply failed, using a canned one: %s", e)
+    FAST_PATH_REQUESTS.inc(kind=kind, reply='canned')
+    return canned_reply(kind, user_input)
+
+
+@csrf_exempt
+@require_POST
+async def codellama_codegen_async_view(request):
+    """
+    Async codellama_codegen_view: same RAG steps, with embedding and LLM calls awaited
+    and Pinecone, tokenizer and database work moved off the event loop.
+    """
+    user_info, error_response = await authenticate(request)
+    if error_response:
+        return error_response
+    return await aidempotent_response(request, user_info.get('sub'), 'codegen', arun_codegen, user_info)
+
+
+async def arun_codegen(request, user_info):
+    """
+    Async run_codegen().
+    """
+    try:
+        data = json.loads(request.body)
+        user_input = data.get('input')
+        if user_input is not None:
+            user_input = user_input.strip()
+        if not user_input:
+            return JsonResponse({'error': 'Input field is required for code generation'}, status=400)
+
+        google_user_id = user_info.get('sub')
+        with span('history'):
+            conversation, conversation_history = await sync_to_async(load_conversation_history)(
+                google_user_id, data.get('conversation_id'), data.get('history', [])
+            )
+
+        # Fast path: greetings, thanks and chit-chat skip URL extraction, embedding and retrieval
+        trivial_kind = classify_input(user_input, conversation_history) if fast_path_enabled(data) else None
+        if trivial_kind:
+            with span('fast_path'):
+                reply = await aanswer_trivial_input(trivial_kind, conversation_history, user_input)
+            with span('db_write'):
+                conversation = await sync_to_async(store_exchange)(conversation, google_user_id, user_input, reply)
+            return JsonResponse(codegen_response_payload(request, reply, [], False, conversation, trivial_kind))
+
+        with span('urls'):
+            url_context_chunks = await run_blocking(collect_url_context, user_input)
+
+        # Step 1: Embed user input
+        try:
+            embedding = await aembed_text(user_input)
+        except UpstreamError as embed_e:
+            return upstream_unavailable_response(embed_e)
+        except Exception as embed_e:
+            logger.error("[codellama_codegen_async_view] Embedding error: %s", embed_e)
+            return JsonResponse({'error': 'Failed to embed user input.'}, status=500)
+
+        # Step 2: Retrieve relevant context from Pinecone (over-fetched; packing picks the best)
+        try:
+            retrieved_chunks = await aquery_pinecone(embedding, top_k=settings.CONTEXT_FETCH_K)
+        except Exception as pinecone_e:
+            logger.error("[codellama_codegen_async_view] Pinecone retrieval error: %s", pinecone_e)
+            retrieved_chunks = []
+
+        # Step 3: Combine context (URL content + Pinecone), packed into the token budget (tokenizer work)
+        all_context_chunks = await run_blocking(pack_context, url_context_chunks + retrieved_chunks)
+
+        # Step 3b: Semantic answer cache
+        semantic_cache = None if cache_bypassed(request, data) else get_semantic_cache()
+        context_fingerprint = fingerprint_chunks(all_context_chunks)
+        history_fingerprint = fingerprint_history(conversation_history)
+        filtered_code = None
+        if semantic_cache is not None:
+            with span('semantic_cache'):
+                filtered_code = await run_blocking(
+                    semantic_cache.lookup, embedding, context_fingerprint, history_fingerprint)
+        cache_hit = filtered_code is not None
+
+        if not cache_hit:
+            # Step 4: Trim conversation history to fit model token limit (CPU-bound tokenizer)
+            try:
+                with span('trim'):
+                    trimmed_history = await run_blocking(
+                        trim_conversation_history_to_fit_tokens, conversation_history, all_context_chunks, user_input
+                    )
+            except Exception as trim_e:
+                logger.error("[codellama_codegen_async_view] History trimming error: %s", trim_e)
+                trimmed_history = conversation_history
+
+            # Step 5: Build prompt
+            try:
+                prompt = build_augmented_prompt(trimmed_history, all_context_chunks, user_input)
+            except Exception as prompt_e:
+                logger.error("[codellama_codegen_async_view] Prompt build error: %s", prompt_e)
+                return JsonResponse({'error': 'Failed to build prompt.'}, status=500)
+
+            # Step 6: Call LLM
+            try:
+                generated_code = await acall_codegen_llm(prompt)
+            except UpstreamError as llm_e:
+                return upstream_unavailable_response(llm_e)
+            except Exception as llm_e:
+                logger.error("[codellama_codegen_async_view] LLM call error: %s", llm_e)
+                return JsonResponse({'error': 'Failed to generate code from LLM.'}, status=500)
+
+            filtered_code = postprocess_generated_code(generated_code, all_context_chunks, user_input)
+            if semantic_cache is not None:
+                await run_blocking(
+                    semantic_cache.store, embedding, context_fingerprint, filtered_code, history_fingerprint)
+
+        with span('db_write'):
+            conversation = await sync_to_async(store_exchange)(conversation, google_user_id, user_input, filtered_code)
+
+        return JsonResponse(codegen_response_payload(request, filtered_code, all_context_chunks, cache_hit, conversation))
+
+    except Exception as e:
+        logger.exception("[codellama_codegen_async_view] Unexpected error: %s", e)
+        return JsonResponse({'error': 'An unexpected error occurred with the CodeLlama CodeGen model'}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def flux_image_async_view(request):
+    """
+    Async flux_image_view (monthly quota, then FLUX.1-dev text-to-image).
+    """
+    user_info, error_response = await authenticate(request)
+    if error_response:
+        return error_response
+    google_user_id = user_info.get('sub')
+    if not google_user_id:
+        return JsonResponse({'error': 'Google user ID not found in token.'}, status=401)
+    return await aidempotent_response(request, google_user_id, 'flux_image', arun_flux_image, google_user_id)
+
+
+async def arun_flux_image(request, google_user_id):
+    """
+    Async run_flux_image().
+    """
+    with span('quota'):
+        quota_ok = await sync_to_async(consume_image_quota)(google_user_id)
+    if not quota_ok:
+        return JsonResponse({'error': 'Monthly image generation limit reached (2 per month).'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        prompt = data.get('prompt')
+        if not prompt:
+            logger.info("[flux_image_async_view] No prompt provided in request body.")
+            return JsonResponse({'error': 'Prompt is required for image generation.'}, status=400)
+
+        from huggingface_hub import AsyncInferenceClient
+        hf_model_id = "black-forest-labs/FLUX.1-dev"
+        try:
+            async with AsyncInferenceClient(
+                model=hf_model_target(hf_model_id), token=settings.HF_API_TOKEN, timeout=get_deadline('hf_image'),
+            ) as inference_client:
+                with span('image'):
+                    image_response = await acall_upstream('hf_image', inference_client.text_to_image, prompt=prompt)
+            # PNG encoding of a PIL image is CPU work; keep it off the loop
+            image_payload = await run_blocking(image_response_payload, image_response)
+            if image_payload is None:
+                logger.error("[flux_image_async_view] Unexpected response from image model: %r", image_response)
+                return JsonResponse({'error': 'Unexpected response from image model.'}, status=500)
+            return JsonResponse(image_payload)
+        except UpstreamError as e:
+            return upstream_unavailable_response(e)
+        except Exception as e:
+            logger.exception("[flux_image_async_view] Error during image generation: %s", e)
+            return JsonResponse({'error': 'Failed to generate image from FLUX.1-dev model.'}, status=500)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)
+    except Exception as e:
+        logger.exception("[flux_image_async_view] An unexpected error occurred: %s", e)
+        return JsonResponse({'error': 'An unexpected error occurred with the image generation'}, status=500)
@@ -0,0 +1,116 @@
+# portfolio_project/portfolio_app/context_packing.py
+"""
+Context packing for the codegen prompt.
+The views over-fetch from Pinecone (CONTEXT_FETCH_K matches) and pass the matches plus the
+URL chunks through pack_context(), which drops near-duplicates (word-shingle Jaccard
+similarity), orders the rest by Maximal Marginal Relevance so the prompt covers different
+aspects of the question, and keeps chunks until CONTEXT_TOKEN_BUDGET is used up. The prompt
+size is then bounded no matter how long the retrieved documents or fetched pages are.
+"""
+import hashlib
+
+from django.conf import settings
+
+from .metrics import span
+
+SHINGLE_SIZE = 5
+# Chunks the user linked to explicitly rank above any vector-store match
+URL_CHUNK_RELEVANCE = 1.0
+# No single chunk (typically a fetched page) may take more than this share of the budget
+MAX_CHUNK_SHARE = 0.5
+# A truncated chunk shorter than this is not worth its share of the budget
+MIN_TRUNCATED_TOKENS = 64
+# Upper bound on characters per token when pre-cutting long texts before tokenizing
+MAX_CHARS_PER_TOKEN = 8
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Set of hashed word n-grams of the (case- and whitespace-normalized) text.
+    """
+    words = text.lower().split()
+    if len(words) <= size:
+        return {hash(' '.join(words))} if words else set()
+    return {hash(' '.join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _chunk_tokens(text):
+    from .rag_pipeline import count_tokens
+    tokens = count_tokens(text)
+    # count_tokens() returns -1 when the tokenizer is unavailable; fall back to ~4 chars/token
+    return tokens if tokens >= 0 else len(text) // 4 + 1
+
+
+def _truncate(text, tokens, max_tokens):
+    # Proportional cut on a word boundary; close enough for budgeting
+    cut = text[:int(len(text) * max_tokens / tokens)]
+    return cut.rsplit(' ', 1)[0] + ' ...'
+
+
+def pack_context(chunks, token_budget=None, mmr_lambda=None, duplicate_threshold=None):
+    """
+    Select and order context chunks for the prompt.
+    chunks: dicts with 'text' and optionally 'score' (vector-store relevance); chunks without
+    a score (fetched URLs) are treated as most relevant. Returns the packed chunk dicts (a
+    chunk cut to fit the budget is a copy with 'truncated': True).
+    """
+    if token_budget is None:
+        token_budget = settings.CONTEXT_TOKEN_BUDGET
+    if mmr_lambda is None:
+        mmr_lambda = settings.CONTEXT_MMR_LAMBDA
+    if duplicate_threshold is None:
+        duplicate_threshold = settings.CONTEXT_DUPLICATE_THRESHOLD
+
+    with span('pack_context'):
+        candidates = []
+        seen_digests = set()
+        for chunk in chunks:
+            text = (chunk.get('text') or '').strip()
+            digest = hashlib.sha256(' '.join(text.lower().split()).encode('utf-8')).digest()
+            if not text or digest in seen_digests:
+                continue
+            seen_digests.add(digest)
+            relevance = chunk.get('score')
+            candidates.append({
+                'chunk': chunk,
+                'relevance': URL_CHUNK_RELEVANCE if relevance is None else relevance,
+                'shingles': shingles(text),
+            })
+
+        packed = []
+        selected_shingles = []
+        remaining = token_budget
+        while candidates and remaining > 0:
+            # MMR: relevance to the question minus redundancy with what is already selected
+            best, best_score, best_redundancy = None, None, 0.0
+            for candidate in candidates:
+                redundancy = max((jaccard(candidate['shingles'], s) for s in selected_shingles), default=0.0)
+                score = mmr_lambda * candidate['relevance'] - (1 - mmr_lambda) * redundancy
+                if best is None or score > best_score:
+                    best, best_score, best_redundancy = candidate, score, redundancy
+            candidates.remove(best)
+            if best_redundancy >= duplicate_threshold:
+                continue  # near-duplicate of a chunk already in the prompt
+
+            chunk = best['chunk']
+            limit = min(remaining, int(token_budget * MAX_CHUNK_SHARE))
+            # A whole fetched page cannot fit anyway; do not tokenize all of it
+            text = chunk['text'][:limit * MAX_CHARS_PER_TOKEN]
+            tokens = _chunk_tokens(text)
+            if tokens > limit or len(text) < len(chunk['text']):
+                if limit < MIN_TRUNCATED_TOKENS:
+                    continue  # a smaller chunk further down may still fit
+                if tokens > limit:
+                    text = _truncate(text, tokens, limit)
+                    tokens = limit
+                chunk = dict(chunk, text=text, truncated=True)
+            packed.append(chunk)
+            selected_shingles.append(best['shingles'])
+            remaining -= tokens
+    return packed
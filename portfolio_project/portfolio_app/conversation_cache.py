@@ -0,0 +1,201 @@
+# portfolio_project/portfolio_app/conversation_cache.py
+"""
+Hot-conversation cache for the codegen endpoint.
+Keeps, per recently used conversation, the Conversation row and its most recent messages
+(with estimated token counts) in process memory, so the next turn of the same conversation
+is built without touching the database. Entries are populated on a history load, updated
+write-through when an exchange is stored and dropped when the conversation is deleted or
+re-summarized.
+
+The cache is per worker process. With several workers (CONVERSATION_CACHE_VALIDATE, on by
+default when WEB_CONCURRENCY > 1) each hit is checked against the conversation's
+updated_at with a primary-key lookup, which is still far cheaper than the history scan.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+from .models import Conversation
+from .summaries import estimate_tokens
+
+
+class ConversationCache:
+    """
+    In-process LRU cache with TTL: conversation_id -> entry dict with the Conversation
+    instance, its total message count and a deque of the last max_messages
+    (sender, content, tokens) tuples.
+    """
+
+    def __init__(self, max_conversations=256, max_messages=50, ttl_seconds=1800):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conversation_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None or now - entry['stored_at'] > self.ttl_seconds:
+                self._entries.pop(conversation_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return entry
+
+    def put(self, conversation, recent_messages, message_count):
+        """
+        Cache a conversation loaded from the database: recent_messages are its last
+        (sender, content) pairs (any number; only the newest max_messages are kept).
+        """
+        messages = deque(
+            ((sender, content, estimate_tokens(content)) for sender, content in recent_messages),
+            maxlen=self.max_messages,
+        )
+        with self._lock:
+            self._entries[conversation.pk] = {
+                'conversation': copy.copy(conversation),
+                'message_count': message_count,
+                'messages': messages,
+                'stored_at': time.monotonic(),
+            }
+            self._entries.move_to_end(conversation.pk)
+            while len(self._entries) > self.max_conversations:
+                self._entries.popitem(last=False)
+
+    def append(self, conversation_id, messages, updated_at):
+        """
+        Write-through for a stored exchange. Conversations not in the cache are left alone
+        (their message count is unknown); the next history load caches them.
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            entry['messages'].extend((sender, content, estimate_tokens(content)) for sender, content in messages)
+            entry['message_count'] += len(messages)
+            entry['conversation'].updated_at = updated_at
+            entry['stored_at'] = time.monotonic()
+
+    def invalidate(self, conversation_id):
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_conversation_cache():
+    """
+    Return the process-wide conversation cache, or None when disabled in settings.
+    """
+    global _cache
+    if not settings.CONVERSATION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ConversationCache(
+                    max_conversations=settings.CONVERSATION_CACHE_MAX_CONVERSATIONS,
+                    max_messages=settings.CONVERSATION_CACHE_MAX_MESSAGES,
+                    ttl_seconds=settings.CONVERSATION_CACHE_TTL_SECONDS,
+                )
+    return _cache
+
+
+def _uncovered(entry):
+    """
+    The cached messages not covered by the conversation summary, or None if some of them
+    fell out of the cached window.
+    """
+    uncovered = entry['message_count'] - entry['conversation'].summarized_message_count
+    messages = entry['messages']
+    if uncovered > len(messages):
+        return None
+    return list(messages)[len(messages) - uncovered:] if uncovered > 0 else []
+
+
+def cached_conversation(conversation_id, google_user_id):
+    """
+    (conversation, prompt history) from the cache for a conversation the user owns, or None
+    on a miss. The history has the same shape as summaries.history_for_prompt().
+    """
+    cache = get_conversation_cache()
+    if cache is None or conversation_id is None:
+        return None
+    entry = cache.get(conversation_id)
+    if entry is None:
+        return None
+    conversation = entry['conversation']
+    if conversation.google_user_id != google_user_id:
+        return None
+    uncovered = _uncovered(entry)
+    if uncovered is None:
+        return None
+    if settings.CONVERSATION_CACHE_VALIDATE:
+        # Another worker may have written to the conversation since it was cached
+        updated_at = Conversation.objects.filter(pk=conversation_id).values_list('updated_at', flat=True).first()
+        if updated_at != conversation.updated_at:
+            cache.invalidate(conversation_id)
+            return None
+    history = []
+    if conversation.summary and conversation.summarized_message_count:
+        history.append({'role': 'summary', 'content': conversation.summary})
+    history.extend({'role': sender, 'content': content} for sender, content, _ in uncovered)
+    return copy.copy(conversation), history
+
+
+def uncovered_tokens(conversation_id):
+    """
+    Estimated tokens of the conversation's messages not covered by its summary, or None if
+    the cache cannot tell (including when other workers may have written to it).
+    """
+    cache = get_conversation_cache()
+    if settings.CONVERSATION_CACHE_VALIDATE:
+        return None
+    entry = cache.get(conversation_id) if cache is not None else None
+    if entry is None:
+        return None
+    uncovered = _uncovered(entry)
+    if uncovered is None:
+        return None
+    return sum(tokens for _, _, tokens in uncovered)
+
+
+def cache_conversation(conversation, history, message_count):
+    cache = get_conversation_cache()
+    if cache is not None:
+        cache.put(conversation, [(msg['role'], msg['content']) for msg in history if msg['role'] != 'summary'], message_count)
+
+
+def cache_exchange(conversation_id, messages, updated_at):
+    cache = get_conversation_cache()
+    if cache is not None:
+        cache.append(conversation_id, messages, updated_at)
+
+
+def invalidate_conversation(conversation_id):
+    cache = get_conversation_cache()
+    if cache is not None:
+        cache.invalidate(conversation_id)
+
+
+def reset_conversation_cache():
+    """
+    Forget the cache inherited from a preloading master (each worker keeps its own).
+    """
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
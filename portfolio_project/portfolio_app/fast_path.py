@@ -0,0 +1,144 @@
+# portfolio_project/portfolio_app/fast_path.py
+"""
+Fast path for trivial codegen inputs.
+Greetings ("hi", "hola"), thanks ("thanks!", "gracias") and short chit-chat ("how are you",
+"ok cool") carry nothing to retrieve, so running them through URL extraction, embedding,
+Pinecone, tokenizer trimming and a full RAG prompt only costs time and upstream quota.
+classify_input() recognises inputs made up entirely of such phrases (word-boundary matches
+over the whole message, not substrings: "this" is not "hi"), and the codegen views answer
+them with a canned reply, or, with FAST_PATH_REPLIES=llm, a minimal prompt without
+retrieved context. The exchange is still stored in the conversation.
+Only greetings take the fast path mid-conversation: after an answer, "ok", "perfect" or
+"thanks" may be a reply to it (or a cue to go on), so they go through the full pipeline.
+"""
+import random
+import re
+
+from django.conf import settings
+
+from .metrics import counter
+
+FAST_PATH_REQUESTS = counter(
+    'portfolio_fast_path_total', 'Codegen inputs answered without retrieval, by kind and reply source.', ('kind', 'reply'),
+)
+
+GREETING_PHRASES = (
+    'hello', 'hi', 'hey', 'heya', 'hiya', 'howdy', 'greetings', 'good morning', 'good afternoon', 'good evening',
+    'yo', 'sup', "what's up", 'whats up', 'hola', 'saludos', 'buenas', 'buenos dias', 'buenas tardes', 'buenas noches',
+)
+THANKS_PHRASES = (
+    'thanks', 'thank you', 'thank you so much', 'thanks a lot', 'thx', 'ty', 'much appreciated', 'appreciate it',
+    'gracias', 'muchas gracias',
+)
+CHITCHAT_PHRASES = (
+    'how are you', 'how are you doing', "how's it going", 'hows it going', 'who are you', 'what are you',
+    'ok', 'okay', 'cool', 'nice', 'great', 'awesome', 'perfect', 'got it', 'sounds good', 'bye', 'goodbye',
+    'see you', 'que tal', 'como estas', 'adios',
+)
+# Words that may accompany a trivial phrase without making the input a question
+FILLER_WORDS = ('there', 'again', 'all', 'bot', 'assistant', 'friend', 'so', 'very', 'much', 'and', 'oh', 'well')
+SPANISH_WORDS = {'hola', 'saludos', 'buenas', 'buenos', 'dias', 'tardes', 'noches', 'gracias', 'muchas', 'que', 'tal', 'como', 'estas', 'adios'}
+
+CANNED_REPLIES = {
+    ('greeting', 'en'): (
+        "Hi! I'm a coding assistant. Ask me about code, frameworks or errors and I'll help.",
+        "Hello! What are you working on? Share a question or a snippet and I'll take a look.",
+    ),
+    ('greeting', 'es'): (
+        "¡Hola! Soy un asistente de programación. Pregúntame sobre código, frameworks o errores.",
+    ),
+    ('thanks', 'en'): (
+        "You're welcome! Let me know if there's anything else you'd like to build or debug.",
+        "Glad to help! Ask away if you have another question.",
+    ),
+    ('thanks', 'es'): (
+        "¡De nada! Avísame si tienes otra pregunta de programación.",
+    ),
+    ('chitchat', 'en'): (
+        "I'm a coding assistant. Send me a programming question or a piece of code and I'll help with it.",
+    ),
+    ('chitchat', 'es'): (
+        "Soy un asistente de programación. Envíame una pregunta o un fragmento de código y te ayudo.",
+    ),
+}
+
+# The minimal prompt used with FAST_PATH_REPLIES=llm: no context, only the last few turns
+MINIMAL_SYSTEM_PROMPT = (
+    "You are a friendly AI coding assistant. The user sent a short greeting, thanks or small talk. "
+    "Reply in one or two sentences, in the user's language, and invite them to ask a programming question."
+)
+MINIMAL_PROMPT_HISTORY = 4
+
+_WORD_RE = re.compile(r"[a-z']+")
+_ACCENTS = str.maketrans('áéíóúñü', 'aeiounu')
+
+
+def _phrase_pattern(phrases):
+    alternatives = sorted(phrases, key=len, reverse=True)  # longest first: "thank you so much" before "thank you"
+    return '|'.join(re.escape(phrase) for phrase in alternatives)
+
+
+_KINDS = (
+    ('thanks', re.compile(rf"\b(?:{_phrase_pattern(THANKS_PHRASES)})\b")),
+    ('greeting', re.compile(rf"\b(?:{_phrase_pattern(GREETING_PHRASES)})\b")),
+    ('chitchat', re.compile(rf"\b(?:{_phrase_pattern(CHITCHAT_PHRASES)})\b")),
+)
+_FILLER_RE = re.compile(rf"\b(?:{_phrase_pattern(FILLER_WORDS)})\b")
+
+
+def _normalize(user_input):
+    text = (user_input or '').lower().translate(_ACCENTS).replace('’', "'")
+    return ' '.join(_WORD_RE.findall(text))
+
+
+# Kinds answered on the fast path when the conversation already has turns
+MID_CONVERSATION_KINDS = ('greeting',)
+
+
+def classify_input(user_input, conversation_history=()):
+    """
+    'greeting', 'thanks' or 'chitchat' when the input consists only of such phrases (plus
+    filler words and punctuation), else None. Thanks wins over a greeting ("hi, thanks!").
+    With a non-empty conversation_history only greetings are classified.
+    """
+    if not user_input or len(user_input) > settings.FAST_PATH_MAX_CHARS:
+        return None
+    text = _normalize(user_input)
+    if not text:
+        return None
+    found = None
+    remainder = text
+    for kind, pattern in _KINDS:
+        remainder, count = pattern.subn(' ', remainder)
+        if count and found is None:
+            found = kind
+    # Anything left over beyond fillers (a name, "can you help with django") is a real request
+    if found is None or _FILLER_RE.sub(' ', remainder).strip():
+        return None
+    if conversation_history and found not in MID_CONVERSATION_KINDS:
+        return None
+    return found
+
+
+def _language(user_input):
+    return 'es' if SPANISH_WORDS & set(_normalize(user_input).split()) else 'en'
+
+
+def canned_reply(kind, user_input):
+    replies = CANNED_REPLIES.get((kind, _language(user_input))) or CANNED_REPLIES[(kind, 'en')]
+    return random.choice(replies)
+
+
+def minimal_prompt(conversation_history, user_input):
+    """
+    Chat messages for a short LLM reply: a small system prompt and the last few plain turns.
+    """
+    turns = [msg for msg in conversation_history if msg.get('role') in ('user', 'assistant')][-MINIMAL_PROMPT_HISTORY:]
+    return [{'role': 'system', 'content': MINIMAL_SYSTEM_PROMPT}, *turns, {'role': 'user', 'content': user_input}]
+
+
+def fast_path_enabled(data):
+    """
+    The fast path is on unless disabled in settings or the request sends "fast_path": false.
+    """
+    return settings.FAST_PATH_ENABLED and data.get('fast_path', True) is not False
@@ -0,0 +1,272 @@
+# portfolio_project/portfolio_app/gemini_client.py
+"""
+Shared HTTP client for the Google Gemini API.
+Keeps one pooled requests.Session per worker process so chat requests reuse
+TLS connections, and provides both the JSON (generateContent) and the
+SSE streaming (streamGenerateContent) call modes. The a-prefixed functions are
+the async equivalents (pooled httpx.AsyncClient per event loop) used in ASGI mode.
+"""
+import asyncio
+import json
+import logging
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .metrics import UPSTREAM_ERRORS
+from .resilience import BulkheadSlot, call_upstream, acall_upstream, get_circuit_breaker, get_deadline
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+# httpx clients are bound to the event loop they were first used on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_gemini_session():
+    """
+    Return the process-wide pooled session for Gemini calls (created lazily).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.GEMINI_POOL_MAXSIZE,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def get_gemini_async_client():
+    """
+    Return the pooled httpx.AsyncClient for the running event loop (created lazily).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.GEMINI_POOL_MAXSIZE,
+                max_keepalive_connections=settings.GEMINI_POOL_MAXSIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def reset_gemini_session():
+    """
+    Drop the pooled session (e.g. after a fork) so the next call opens fresh connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _async_clients.clear()
+
+
+def _gemini_url(method):
+    return f"{settings.GEMINI_API_BASE}/models/{settings.GEMINI_MODEL}:{method}"
+
+
+def _gemini_headers():
+    # Send the key as a header so it never ends up in URLs or request logs
+    return {'x-goog-api-key': settings.GEMINI_API_KEY}
+
+
+# Reply when a candidate's part has no text (the chat endpoint's original 200 response)
+NO_RESPONSE_TEXT = 'No response text found.'
+
+
+def extract_gemini_text(result, missing_text=None):
+    """
+    Pull the first candidate's text out of a Gemini response (or stream chunk).
+    Returns None when the structure is not what we expect, and missing_text when the
+    first part has no text.
+    """
+    if not result or not result.get('candidates'):
+        return None
+    content = result['candidates'][0].get('content') or {}
+    parts = content.get('parts') or []
+    if not parts:
+        return None
+    return parts[0].get('text', missing_text)
+
+
+def _post_generate_content(payload, timeout):
+    response = get_gemini_session().post(
+        _gemini_url('generateContent'),
+        headers=_gemini_headers(),
+        json=payload,
+        timeout=timeout,
+    )
+    logger.debug("Gemini API response status: %s", response.status_code)
+    response.raise_for_status()
+    return response.json()
+
+
+def generate_content(payload, timeout=None):
+    """
+    Call generateContent and return the parsed JSON body.
+    Raises requests.exceptions.RequestException on HTTP/network errors, or a
+    resilience.UpstreamError when the Gemini circuit is open or the deadline passes.
+    """
+    if timeout is None:
+        timeout = get_deadline('gemini')
+    return call_upstream('gemini', _post_generate_content, payload, timeout)
+
+
+async def _apost_generate_content(payload, timeout):
+    response = await get_gemini_async_client().post(
+        _gemini_url('generateContent'),
+        headers=_gemini_headers(),
+        json=payload,
+        timeout=timeout,
+    )
+    logger.debug("Gemini API response status: %s", response.status_code)
+    response.raise_for_status()
+    return response.json()
+
+
+async def agenerate_content(payload, timeout=None):
+    """
+    Async generate_content(). Raises httpx.HTTPError on HTTP/network errors, or a
+    resilience.UpstreamError when the Gemini circuit is open or the deadline passes.
+    """
+    if timeout is None:
+        timeout = get_deadline('gemini')
+    return await acall_upstream('gemini', _apost_generate_content, payload, timeout)
+
+
+def _sse_event(data, event=None):
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_content_as_sse(payload, connect_timeout=10, read_timeout=None, slot=None):
+    """
+    Call streamGenerateContent (alt=sse) and re-emit each text delta to the browser
+    as an SSE event: `data: {"text": "..."}`. Finishes with an `event: done` event,
+    or an `event: error` event if the upstream call fails mid-stream.
+    The stream cannot run on the resilience executor, so it checks and feeds the
+    Gemini circuit breaker directly; read_timeout bounds the gap between chunks.
+    slot is the Gemini bulkhead slot taken by the view (resilience.acquire_bulkhead),
+    held until the stream ends.
+    """
+    slot = slot or BulkheadSlot()
+    api_key = settings.GEMINI_API_KEY or ''
+    if read_timeout is None:
+        read_timeout = get_deadline('gemini')
+    breaker = get_circuit_breaker('gemini')
+    if not breaker.allow():
+        slot.release()
+        UPSTREAM_ERRORS.inc(dependency='gemini', kind='circuit_open')
+        yield _sse_event({'error': 'AI model temporarily unavailable'}, event='error')
+        return
+    response = None
+    try:
+        response = get_gemini_session().post(
+            _gemini_url('streamGenerateContent'),
+            params={'alt': 'sse'},
+            headers=_gemini_headers(),
+            json=payload,
+            stream=True,
+            timeout=(connect_timeout, read_timeout),
+        )
+        response.raise_for_status()
+        # Record health as soon as the stream opens so a client disconnect mid-stream
+        # cannot leave a half-open probe unresolved
+        breaker.record_success()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            try:
+                chunk = json.loads(line[len('data:'):].strip())
+            except json.JSONDecodeError:
+                logger.warning("Skipping malformed Gemini stream chunk")
+                continue
+            text = extract_gemini_text(chunk)
+            if text:
+                yield _sse_event({'text': text})
+        yield _sse_event({}, event='done')
+    except requests.exceptions.RequestException as e:
+        breaker.record_failure()
+        UPSTREAM_ERRORS.inc(dependency='gemini', kind='error')
+        sanitized_error_message = str(e).replace(api_key, "[REDACTED_API_KEY]") if api_key else str(e)
+        logger.error("Error streaming from Gemini API: %s", sanitized_error_message)
+        yield _sse_event({'error': 'Failed to connect to AI model'}, event='error')
+    finally:
+        if response is not None:
+            response.close()
+        slot.release()
+
+
+async def astream_content_as_sse(payload, connect_timeout=10, read_timeout=None, slot=None):
+    """
+    Async stream_content_as_sse(): same events, same circuit-breaker and bulkhead handling,
+    but the upstream stream is read on the event loop instead of tying up a worker thread.
+    """
+    import httpx
+    slot = slot or BulkheadSlot()
+    api_key = settings.GEMINI_API_KEY or ''
+    if read_timeout is None:
+        read_timeout = get_deadline('gemini')
+    breaker = get_circuit_breaker('gemini')
+    if not breaker.allow():
+        slot.release()
+        UPSTREAM_ERRORS.inc(dependency='gemini', kind='circuit_open')
+        yield _sse_event({'error': 'AI model temporarily unavailable'}, event='error')
+        return
+    recorded = False
+    try:
+        async with get_gemini_async_client().stream(
+            'POST',
+            _gemini_url('streamGenerateContent'),
+            params={'alt': 'sse'},
+            headers=_gemini_headers(),
+            json=payload,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        ) as response:
+            response.raise_for_status()
+            breaker.record_success()
+            recorded = True
+            async for line in response.aiter_lines():
+                if not line or not line.startswith('data:'):
+                    continue
+                try:
+                    chunk = json.loads(line[len('data:'):].strip())
+                except json.JSONDecodeError:
+                    logger.warning("Skipping malformed Gemini stream chunk")
+                    continue
+                text = extract_gemini_text(chunk)
+                if text:
+                    yield _sse_event({'text': text})
+        yield _sse_event({}, event='done')
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        UPSTREAM_ERRORS.inc(dependency='gemini', kind='error')
+        sanitized_error_message = str(e).replace(api_key, "[REDACTED_API_KEY]") if api_key else str(e)
+        logger.error("Error streaming from Gemini API: %s", sanitized_error_message)
+        yield _sse_event({'error': 'Failed to connect to AI model'}, event='error')
+    except asyncio.CancelledError:
+        # Client went away before the stream opened
+        if not recorded:
+            breaker.abandon()
+        raise
+    finally:
+        slot.release()
@@ -1,13 +1,41 @@
+import logging
+
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 from django.conf import settings
 
+from .metrics import span
+from .resilience import call_upstream, get_deadline
+
+logger = logging.getLogger(__name__)
+
+_GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Reuse one transport (and its pooled session) for fetching Google's signing certs
+_transport = google_requests.Request()
+
+
+def _guarded_transport(*args, **kwargs):
+    # Only the certs fetch goes through the breaker, so invalid user tokens never trip it
+    kwargs.setdefault('timeout', get_deadline('google_auth'))
+    return call_upstream('google_auth', _transport, *args, **kwargs)
+
+
 def verify_google_token(token):
     try:
         # Specify the CLIENT_ID of the app that accesses the backend
-        idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), settings.GOOGLE_CLIENT_ID)
+        with span('auth'):
+            # Same checks as id_token.verify_oauth2_token, but with a configurable certs URL
+            idinfo = id_token.verify_token(
+                token,
+                _guarded_transport,
+                audience=settings.GOOGLE_CLIENT_ID,
+                certs_url=settings.GOOGLE_OAUTH2_CERTS_URL,
+            )
+            if idinfo.get('iss') not in _GOOGLE_ISSUERS:
+                raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
         # ID token is valid. Get the user's Google Account ID from the decoded token.
         return idinfo  # Contains user info (sub, email, etc.)
     except Exception as e:
-        print(f"Google token verification failed: {e}")
+        logger.info("Google token verification failed: %s", e)
         return None
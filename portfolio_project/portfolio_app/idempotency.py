@@ -0,0 +1,160 @@
+# portfolio_project/portfolio_app/idempotency.py
+"""
+Idempotency-Key support for the expensive POST endpoints (codegen, image generation).
+A client that sends the same Idempotency-Key again (a retry, a double click) gets the
+response of the first request instead of starting another LLM or image generation (and,
+for images, using up monthly quota twice).
+
+Keys are stored per (Google user, key) in the IdempotencyKey table, so every worker sees
+them. The first request claims the key (an INSERT, made unique by the database) and runs;
+duplicates arriving meanwhile poll until it completes (up to IDEMPOTENCY_WAIT_SECONDS),
+and later duplicates replay the stored response. Server errors are not stored: the key is
+released so the retry runs again. A key reused with a different request (path, query
+string or body) is rejected, and keys expire after IDEMPOTENCY_TTL_HOURS (see
+`manage.py purge_idempotency_keys`).
+"""
+import asyncio
+import hashlib
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .metrics import counter
+from .models import IdempotencyKey
+
+IDEMPOTENT_REQUESTS = counter(
+    'portfolio_idempotent_requests_total', 'Requests carrying an Idempotency-Key, by endpoint and outcome.', ('endpoint', 'outcome'),
+)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.25
+
+
+class IdempotencyKeyMismatch(Exception):
+    """
+    The key was already used for a different request (other body or endpoint).
+    """
+
+
+class IdempotencyKeyBusy(Exception):
+    """
+    The request that first used the key is still running after IDEMPOTENCY_WAIT_SECONDS.
+    """
+
+
+def request_key(request):
+    """
+    The Idempotency-Key header (stripped), '' if absent. Raises ValueError if it is too long.
+    """
+    key = (request.headers.get(HEADER) or '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"{HEADER} is limited to {MAX_KEY_LENGTH} characters.")
+    return key
+
+
+def request_hash(request):
+    """
+    Fingerprint of what the key may be reused for: path, query string (which shapes the
+    response, e.g. ?fields=) and body.
+    """
+    digest = hashlib.sha256(request.get_full_path().encode())
+    digest.update(b'\n')
+    digest.update(request.body or b'')
+    return digest.hexdigest()
+
+
+def _attempt(google_user_id, key, endpoint, body_hash):
+    """
+    One try at claiming the key. Returns (record, None) if this request now owns it,
+    (None, (status, body)) if a stored response should be replayed, or (None, None) if
+    another request is still processing it.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                google_user_id=google_user_id, key=key, endpoint=endpoint, request_hash=body_hash, locked_at=now,
+            )
+        return record, None
+    except IntegrityError:
+        pass
+    record = IdempotencyKey.objects.filter(google_user_id=google_user_id, key=key).first()
+    if record is None:
+        return None, None  # released in the meantime; the next attempt claims it
+    if record.created_at < now - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS):
+        IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+        return _attempt(google_user_id, key, endpoint, body_hash)
+    if record.endpoint != endpoint or record.request_hash != body_hash:
+        raise IdempotencyKeyMismatch()
+    if record.status == IdempotencyKey.COMPLETED:
+        return None, (record.response_status, record.response_body)
+    # The owner went quiet (its worker died or it is far past every upstream deadline): take over
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    if record.locked_at < stale and IdempotencyKey.objects.filter(
+        pk=record.pk, status=IdempotencyKey.PROCESSING, locked_at=record.locked_at,
+    ).update(locked_at=now):
+        record.locked_at = now
+        return record, None
+    return None, None
+
+
+def begin(google_user_id, key, endpoint, request):
+    """
+    Claim the key or wait for the request that holds it. Returns (record, None) when the
+    caller should run the request and then call complete(), or (None, (status, body)) to
+    replay. Raises IdempotencyKeyMismatch or IdempotencyKeyBusy.
+    """
+    body_hash = request_hash(request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record, stored = _attempt(google_user_id, key, endpoint, body_hash)
+        if record is not None or stored is not None:
+            return record, stored
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyBusy()
+        time.sleep(POLL_SECONDS)
+
+
+async def abegin(google_user_id, key, endpoint, request):
+    """
+    Async begin(): polls without blocking the event loop.
+    """
+    body_hash = request_hash(request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record, stored = await sync_to_async(_attempt)(google_user_id, key, endpoint, body_hash)
+        if record is not None or stored is not None:
+            return record, stored
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyBusy()
+        await asyncio.sleep(POLL_SECONDS)
+
+
+def complete(record, status, body):
+    """
+    Store the owner's response for replay, or release the key if there is nothing to
+    replay (server errors, streaming responses) so a retry runs the request again.
+    """
+    owned = IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at)
+    if body is None or status >= 500:
+        owned.delete()
+    else:
+        owned.update(status=IdempotencyKey.COMPLETED, response_status=status, response_body=body)
+
+
+def release(record):
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).delete()
+
+
+def purge_expired_keys(older_than=None):
+    """
+    Delete keys past IDEMPOTENCY_TTL_HOURS. Returns how many were deleted.
+    """
+    older_than = older_than or timezone.now() - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=older_than).delete()
+    return deleted
@@ -0,0 +1,298 @@
+# portfolio_project/portfolio_app/ingestion.py
+"""
+Bulk ingestion of documents into the Pinecone index (used by `manage.py ingest`).
+Sources (files, directories, URLs) are split into token-sized chunks. A chunk's vector ID
+is the hash of its content, so unchanged text is never embedded twice: chunks recorded in
+the checkpoint file, or already present in the index, are skipped before embedding. New
+chunks are embedded in batches and upserted by a small pool of concurrent requests, and
+the checkpoint is rewritten as batches land so an interrupted run resumes where it stopped.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from .resilience import call_upstream
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTENSIONS = ('.md', '.txt', '.rst', '.py', '.html', '.htm')
+# Without the tokenizer, chunks are cut by words (~0.75 words per token)
+WORDS_PER_TOKEN = 0.75
+# Pinecone's fetch endpoint takes the IDs in the query string; keep requests small
+FETCH_BATCH_SIZE = 100
+
+
+def content_hash(text):
+    """
+    SHA-256 of the whitespace-normalized text; used as the chunk's vector ID.
+    """
+    return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+# --- Sources ---
+def iter_sources(paths, extensions=DEFAULT_EXTENSIONS):
+    """
+    Expand the given files, directories and URLs into individual sources, in a stable order.
+    """
+    for path in paths:
+        if re.match(r'https?://', path):
+            yield path
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in sorted(files):
+                    if name.lower().endswith(tuple(extensions)):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+        else:
+            logger.warning("[ingest] Skipping missing source: %s", path)
+
+
+def load_source(source):
+    """
+    Return the plain text of a file or URL, or None if it could not be read.
+    """
+    if re.match(r'https?://', source):
+        from .rag_pipeline import fetch_and_clean_url_content
+        return fetch_and_clean_url_content(source, use_cache=False)
+    try:
+        text = Path(source).read_text(encoding='utf-8', errors='replace')
+    except OSError as e:
+        logger.warning("[ingest] Could not read %s: %s", source, e)
+        return None
+    if source.lower().endswith(('.html', '.htm')):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(text, 'lxml')
+        for tag in soup(['script', 'style']):
+            tag.decompose()
+        text = soup.get_text(separator=' ', strip=True)
+    return text
+
+
+# --- Chunking ---
+def load_chunk_tokenizer():
+    """
+    The embedding model's tokenizer, or None (chunking then falls back to word counts).
+    """
+    from .rag_pipeline import get_tokenizer, EMBEDDING_MODEL
+    try:
+        return get_tokenizer(EMBEDDING_MODEL)
+    except Exception as e:
+        logger.warning("[ingest] Tokenizer unavailable, chunking by words: %s", e)
+        return None
+
+
+def chunk_text(text, chunk_tokens=256, overlap_tokens=32, tokenizer=None):
+    """
+    Split text into windows of chunk_tokens tokens overlapping by overlap_tokens.
+    Windows are cut at token boundaries of the original text (no detokenization).
+    """
+    if tokenizer is not None:
+        spans = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+    else:
+        spans = [match.span() for match in re.finditer(r'\S+', text)]
+        chunk_tokens = max(1, int(chunk_tokens * WORDS_PER_TOKEN))
+        overlap_tokens = int(overlap_tokens * WORDS_PER_TOKEN)
+    step = max(1, chunk_tokens - overlap_tokens)
+    chunks = []
+    for start in range(0, len(spans), step):
+        window = spans[start:start + chunk_tokens]
+        chunk = text[window[0][0]:window[-1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+        if start + chunk_tokens >= len(spans):
+            break
+    return chunks
+
+
+# --- Checkpoint ---
+class Checkpoint:
+    """
+    Progress file: hashes of chunks known to be in the index, and the content hash of each
+    source whose chunks have all been indexed. Written atomically (temp file + rename).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.indexed = set()
+        self.sources = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.indexed = set(data.get('indexed', []))
+            self.sources = data.get('sources', {})
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'sources': self.sources, 'indexed': sorted(self.indexed)}, f)
+        os.replace(tmp_path, self.path)
+
+
+# --- Ingestion ---
+class Ingestor:
+    """
+    Chunks sources, embeds new chunks embed_batch_size at a time (across source boundaries)
+    and keeps up to `concurrency` upserts of upsert_batch_size vectors in flight.
+    Call add() per source, then finish() (also after an interruption, to save progress).
+    """
+
+    def __init__(self, index, checkpoint, namespace='', chunk_tokens=256, overlap_tokens=32, tokenizer=None,
+                 embed_batch_size=32, upsert_batch_size=100, concurrency=4, check_index=True, retries=3,
+                 checkpoint_interval=5.0):
+        self.index = index
+        self.checkpoint = checkpoint
+        self.namespace = namespace
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = tokenizer
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.concurrency = concurrency
+        self.check_index = check_index
+        self.retries = retries
+        self.checkpoint_interval = checkpoint_interval
+        self.stats = {
+            'sources': 0, 'sources_unchanged': 0, 'chunks': 0, 'skipped_checkpoint': 0,
+            'skipped_index': 0, 'embedded': 0, 'upserted': 0, 'failed': 0,
+        }
+        self.started = time.monotonic()
+        self._to_embed = []   # (vector_id, text, metadata) waiting for an embedding batch
+        self._to_upsert = []  # (vector_id, values, metadata) waiting for an upsert batch
+        self._queued = set()
+        self._in_flight = set()
+        self._pending_sources = {}  # source -> (content hash, chunk ids) until all ids are indexed
+        self._last_save = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ingest')
+
+    def add(self, source, text):
+        """
+        Queue the new chunks of one source. Returns False if the source is unchanged since
+        it was last fully indexed.
+        """
+        self.stats['sources'] += 1
+        digest = content_hash(text)
+        if self.checkpoint.sources.get(source) == digest:
+            self.stats['sources_unchanged'] += 1
+            return False
+        ids = set()
+        for position, chunk in enumerate(chunk_text(text, self.chunk_tokens, self.overlap_tokens, self.tokenizer)):
+            vector_id = content_hash(chunk)
+            ids.add(vector_id)
+            self.stats['chunks'] += 1
+            if vector_id in self.checkpoint.indexed or vector_id in self._queued:
+                self.stats['skipped_checkpoint'] += 1
+                continue
+            self._queued.add(vector_id)
+            self._to_embed.append((vector_id, chunk, {'text': chunk, 'source': source, 'chunk': position}))
+            if len(self._to_embed) >= self.embed_batch_size:
+                self._embed_pending()
+        self._pending_sources[source] = (digest, ids)
+        self._collect(block=False)
+        return True
+
+    def finish(self):
+        """
+        Flush the buffers, wait for every upsert and write the checkpoint. Returns the stats.
+        """
+        try:
+            if self._to_embed:
+                self._embed_pending()
+            if self._to_upsert:
+                self._submit_upsert()
+        finally:
+            # Also reached on Ctrl-C: let in-flight upserts land so their progress is kept
+            while self._in_flight:
+                self._collect(block=True)
+            self._executor.shutdown()
+            self._save()
+        return self.stats
+
+    def throughput(self):
+        """
+        Upserted chunks per second since the ingestor was created.
+        """
+        elapsed = time.monotonic() - self.started
+        return self.stats['upserted'] / elapsed if elapsed > 0 else 0.0
+
+    def _existing_ids(self, ids):
+        existing = set()
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            response = call_upstream(
+                'pinecone', self.index.fetch, ids=ids[start:start + FETCH_BATCH_SIZE], namespace=self.namespace,
+                bulkhead='pinecone_batch',
+            )
+            existing.update(response.get('vectors', {}).keys())
+        return existing
+
+    def _embed_pending(self):
+        from .rag_pipeline import embed_texts
+
+        batch, self._to_embed = self._to_embed, []
+        if self.check_index:
+            existing = self._existing_ids([vector_id for vector_id, _, _ in batch])
+            if existing:
+                self.stats['skipped_index'] += len(existing)
+                self.checkpoint.indexed.update(existing)
+                batch = [item for item in batch if item[0] not in existing]
+        if not batch:
+            return
+        vectors = embed_texts([text for _, text, _ in batch])
+        self.stats['embedded'] += len(batch)
+        for (vector_id, _, metadata), values in zip(batch, vectors):
+            self._to_upsert.append((vector_id, values, metadata))
+            if len(self._to_upsert) >= self.upsert_batch_size:
+                self._submit_upsert()
+
+    def _submit_upsert(self):
+        batch, self._to_upsert = self._to_upsert, []
+        # Bounded: at most `concurrency` batches of vectors are held in memory at once
+        while len(self._in_flight) >= self.concurrency:
+            self._collect(block=True)
+        self._in_flight.add(self._executor.submit(self._upsert, batch))
+
+    def _upsert(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                call_upstream('pinecone', self.index.upsert, vectors=batch, namespace=self.namespace, bulkhead='pinecone_batch')
+                return [vector_id for vector_id, _, _ in batch]
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("[ingest] Upsert of %d vectors failed (%s); retrying in %ss", len(batch), e, delay)
+                time.sleep(delay)
+
+    def _collect(self, block):
+        if not self._in_flight:
+            return
+        done, self._in_flight = wait(self._in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                ids = future.result()
+            except Exception as e:
+                # Chunks of a failed batch stay out of the checkpoint and are retried next run
+                logger.error("[ingest] Upsert batch failed: %s", e)
+                self.stats['failed'] += 1
+                continue
+            self.stats['upserted'] += len(ids)
+            self.checkpoint.indexed.update(ids)
+        if time.monotonic() - self._last_save >= self.checkpoint_interval:
+            self._save()
+
+    def _save(self):
+        # A source is complete once every one of its chunks is in the index
+        for source, (digest, ids) in list(self._pending_sources.items()):
+            if ids <= self.checkpoint.indexed:
+                self.checkpoint.sources[source] = digest
+                del self._pending_sources[source]
+        self.checkpoint.save()
+        self._last_save = time.monotonic()
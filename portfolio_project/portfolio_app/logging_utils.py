@@ -0,0 +1,142 @@
+# portfolio_project/portfolio_app/logging_utils.py
+"""
+Non-blocking structured logging.
+Request threads only put log records on an in-memory queue; a QueueListener thread
+formats them (lazily, as JSON, with large payloads truncated) and does the actual I/O.
+Wired up through the LOGGING dict in project/settings.py.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def truncate(value, limit):
+    """
+    Shorten a string to `limit` characters, noting how much was cut.
+    """
+    if limit and len(value) > limit:
+        return f"{value[:limit]}... [truncated {len(value) - limit} chars]"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. The message (and any extra fields) are truncated to
+    max_field_chars so prompts, histories and generated code cannot flood the log.
+    """
+
+    def __init__(self, max_field_chars=2000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_field_chars = max_field_chars
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': truncate(record.getMessage(), self.max_field_chars),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = truncate(value, self.max_field_chars) if isinstance(value, str) else value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of DEBUG/INFO records per logger, e.g. {'portfolio_app.rag_pipeline': 0.1}.
+    Rates apply to the named logger and its children; WARNING and above are never dropped.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def _rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingHandler(logging.Handler):
+    """
+    Queue-backed handler (QueueHandler semantics) that owns its QueueListener and a
+    StreamHandler target. The queue is bounded; when it is full, records are dropped
+    (and counted) instead of making the request thread wait.
+    Deliberately not a QueueHandler subclass: Python 3.12+ dictConfig rewires those.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._target = logging.StreamHandler(stream or sys.stdout)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._listener_pid = None
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, so the target gets the formatter
+        self._target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Unlike the stock QueueHandler, do not format here: the listener thread does it.
+        # Tracebacks are rendered now, since the frames may not outlive the request.
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record):
+        if self._listener_pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # The listener thread does not survive fork() (e.g. gunicorn --preload), so each
+        # process starts its own on first use.
+        with self._listener_lock:
+            if self._listener_pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self._listener = logging.handlers.QueueListener(self.queue, self._target, respect_handler_level=False)
+                self._listener.start()
+                self._listener_pid = os.getpid()
+
+    def close(self):
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                self._listener.stop()  # drains everything already queued
+                self._listener_pid = None
+        super().close()
@@ -0,0 +1,57 @@
+# portfolio_project/portfolio_app/management/commands/archive_conversations.py
+"""
+Move the messages of idle conversations into compressed per-conversation archives.
+
+    python manage.py archive_conversations                   # idle longer than CONVERSATION_ARCHIVE_IDLE_DAYS
+    python manage.py archive_conversations --idle-days 30 --codec lzma
+    python manage.py archive_conversations --dry-run         # only count
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from portfolio_app.archive import CODECS, archive_conversation, idle_conversations
+
+
+class Command(BaseCommand):
+    help = "Compress the messages of conversations idle for longer than a given age into one archive blob each."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=settings.CONVERSATION_ARCHIVE_IDLE_DAYS,
+                            help="Archive conversations not updated for this many days")
+        parser.add_argument('--codec', choices=sorted(CODECS), default=settings.CONVERSATION_ARCHIVE_CODEC)
+        parser.add_argument('--limit', type=int, default=None, help="Archive at most this many conversations")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be archived without changing anything")
+
+    def handle(self, *args, **options):
+        idle_before = timezone.now() - timedelta(days=options['idle_days'])
+        candidates = idle_conversations(idle_before).order_by('updated_at')
+        if options['limit']:
+            candidates = candidates[:options['limit']]
+
+        if options['dry_run']:
+            counted = candidates.annotate(message_total=Count('messages')).values_list('message_total', flat=True)
+            totals = list(counted)
+            self.stdout.write(f"Would archive {len(totals)} conversations ({sum(totals)} messages) idle since {idle_before:%Y-%m-%d}")
+            return
+
+        conversations = messages = raw_bytes = stored_bytes = 0
+        # One transaction per conversation: a failure or interruption loses no progress
+        for conversation_id in list(candidates.values_list('pk', flat=True)):
+            result = archive_conversation(conversation_id, idle_before, codec=options['codec'])
+            if result is None:
+                continue  # written to since the candidates were selected
+            moved, raw_size, compressed_size = result
+            conversations += 1
+            messages += moved
+            raw_bytes += raw_size
+            stored_bytes += compressed_size
+
+        ratio = raw_bytes / stored_bytes if stored_bytes else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {messages} messages from {conversations} conversations "
+            f"({raw_bytes} bytes -> {stored_bytes} bytes with {options['codec']}, {ratio:.1f}x)"
+        ))
@@ -0,0 +1,107 @@
+# portfolio_project/portfolio_app/management/commands/ingest.py
+"""
+Index files, directories and URLs into the Pinecone index used by the codegen endpoint.
+
+    python manage.py ingest docs/ https://docs.djangoproject.com/en/5.0/topics/db/queries/
+    python manage.py ingest docs/ --checkpoint .ingest-checkpoint.json   # rerun to resume
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio_app.resilience import UpstreamError
+from portfolio_app.ingestion import (
+    DEFAULT_EXTENSIONS, Checkpoint, Ingestor, iter_sources, load_chunk_tokenizer, load_source,
+)
+
+PROGRESS_INTERVAL_SECONDS = 5
+
+
+class Command(BaseCommand):
+    help = "Chunk, embed and upsert documents into the vector index (resumable, skips already-indexed chunks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help="Files, directories or http(s) URLs")
+        parser.add_argument('--extensions', default=','.join(DEFAULT_EXTENSIONS),
+                            help="File extensions picked up when walking directories")
+        parser.add_argument('--chunk-tokens', type=int, default=256, help="Tokens per chunk")
+        parser.add_argument('--overlap-tokens', type=int, default=32, help="Tokens shared by consecutive chunks")
+        parser.add_argument('--embed-batch-size', type=int, default=32)
+        parser.add_argument('--upsert-batch-size', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Upsert requests in flight (capped below BULKHEAD_LIMITS['pinecone_batch'])")
+        parser.add_argument('--namespace', default='')
+        parser.add_argument('--checkpoint', default='.ingest-checkpoint.json',
+                            help="Progress file; an interrupted run resumes from it ('' to disable)")
+        parser.add_argument('--no-index-check', action='store_true',
+                            help="Do not ask the index which chunks it already has (trust the checkpoint only)")
+
+    def handle(self, *args, **options):
+        from portfolio_app.rag_pipeline import get_pinecone_index
+
+        if options['overlap_tokens'] >= options['chunk_tokens']:
+            raise CommandError("--overlap-tokens must be smaller than --chunk-tokens")
+        try:
+            index = get_pinecone_index()
+        except Exception as e:
+            raise CommandError(f"Could not connect to Pinecone: {e}")
+
+        concurrency = options['concurrency']
+        limit = settings.BULKHEAD_LIMITS.get('pinecone_batch') if settings.BULKHEAD_ENABLED else None
+        if limit is not None and concurrency >= limit:
+            # Upserts share the batch Pinecone bulkhead with this command's index checks (and
+            # the project index thread), so one slot is left for those
+            concurrency = max(1, limit - 1)
+            self.stderr.write(f"--concurrency capped to {concurrency} (BULKHEAD_LIMIT_PINECONE_BATCH={limit})")
+
+        checkpoint = Checkpoint(options['checkpoint'] or None)
+        if checkpoint.indexed:
+            self.stdout.write(f"Resuming: {len(checkpoint.indexed)} chunks already recorded in {options['checkpoint']}")
+        ingestor = Ingestor(
+            index,
+            checkpoint,
+            namespace=options['namespace'],
+            chunk_tokens=options['chunk_tokens'],
+            overlap_tokens=options['overlap_tokens'],
+            tokenizer=load_chunk_tokenizer(),
+            embed_batch_size=options['embed_batch_size'],
+            upsert_batch_size=options['upsert_batch_size'],
+            concurrency=concurrency,
+            check_index=not options['no_index_check'],
+        )
+        extensions = tuple(ext.strip() for ext in options['extensions'].split(',') if ext.strip())
+        last_progress = time.monotonic()
+        try:
+            for source in iter_sources(options['sources'], extensions):
+                text = load_source(source)
+                if not text:
+                    self.stderr.write(f"Skipped (no content): {source}")
+                    continue
+                ingestor.add(source, text)
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                    last_progress = time.monotonic()
+                    self._progress(ingestor)
+        except KeyboardInterrupt:
+            self.stderr.write("Interrupted; waiting for in-flight upserts and saving the checkpoint...")
+        except UpstreamError as e:
+            raise CommandError(f"{e} (progress saved; rerun to resume)")
+        finally:
+            stats = ingestor.finish()
+
+        elapsed = time.monotonic() - ingestor.started
+        self.stdout.write(
+            f"Sources: {stats['sources']} ({stats['sources_unchanged']} unchanged) | "
+            f"chunks: {stats['chunks']} | skipped: {stats['skipped_checkpoint']} (checkpoint) + "
+            f"{stats['skipped_index']} (already indexed) | embedded: {stats['embedded']} | "
+            f"upserted: {stats['upserted']} | failed batches: {stats['failed']}"
+        )
+        style = self.style.WARNING if stats['failed'] else self.style.SUCCESS
+        self.stdout.write(style(f"Done in {elapsed:.1f}s: {ingestor.throughput():.1f} chunks/s upserted"))
+
+    def _progress(self, ingestor):
+        stats = ingestor.stats
+        self.stdout.write(
+            f"... {stats['sources']} sources, {stats['chunks']} chunks, {stats['upserted']} upserted "
+            f"({ingestor.throughput():.1f} chunks/s)"
+        )
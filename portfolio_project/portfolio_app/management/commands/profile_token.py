@@ -0,0 +1,31 @@
+# portfolio_project/portfolio_app/management/commands/profile_token.py
+"""
+Issue a signed token that turns on CPU profiling for the requests that carry it.
+
+    python manage.py profile_token --mode sampling --issued-to alice
+    curl -H "X-Profile: <token>" ...   (or append ?profile=<token> to the URL)
+
+The response carries X-Profile-Id; the profile is listed under Request Profiles in the admin.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portfolio_app.profiling import HEADER, MODES, make_token
+from portfolio_app.models import RequestProfile
+
+
+class Command(BaseCommand):
+    help = "Print a profiling token (valid for PROFILING_TOKEN_MAX_AGE_SECONDS) for the X-Profile header."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default=RequestProfile.CPROFILE,
+                            help="cprofile (pstats) or sampling (collapsed stacks for flame graphs)")
+        parser.add_argument('--issued-to', default='', help="Recorded with every profile taken with this token")
+
+    def handle(self, *args, **options):
+        token = make_token(options['mode'], options['issued_to'])
+        self.stdout.write(token)
+        self.stderr.write(
+            f"Send it as '{HEADER}: <token>' or ?profile=<token>; "
+            f"valid for {settings.PROFILING_TOKEN_MAX_AGE_SECONDS} s."
+        )
@@ -0,0 +1,54 @@
+# portfolio_project/portfolio_app/management/commands/purge_conversations.py
+"""
+Delete conversations for retention, in bounded batches.
+
+    python manage.py purge_conversations                        # finish pending (soft) deletions
+    python manage.py purge_conversations --older-than-days 365  # plus everything idle for a year
+    python manage.py purge_conversations --older-than-days 365 --dry-run
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from portfolio_app.models import Conversation
+from portfolio_app.purge import purge_conversation
+
+
+class Command(BaseCommand):
+    help = "Purge soft-deleted conversations and, with --older-than-days, conversations idle longer than that."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.CONVERSATION_RETENTION_DAYS,
+                            help="Also delete conversations not updated for this many days")
+        parser.add_argument('--batch-size', type=int, default=settings.CONVERSATION_PURGE_BATCH_SIZE,
+                            help="Messages removed per DELETE statement")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted without changing anything")
+
+    def handle(self, *args, **options):
+        expired = Conversation.objects.none()
+        if options['older_than_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+            expired = Conversation.objects.filter(deleted_at__isnull=True, updated_at__lt=cutoff)
+
+        if options['dry_run']:
+            pending = Conversation.objects.filter(deleted_at__isnull=False).count()
+            totals = list(expired.annotate(message_total=Count('messages')).values_list('message_total', flat=True))
+            self.stdout.write(
+                f"Pending deletions: {pending} | expired conversations: {len(totals)} "
+                f"({sum(totals)} messages in the table)"
+            )
+            return
+
+        # Hide the expired conversations first (one UPDATE), then purge them like user deletions
+        now = timezone.now()
+        hidden = expired.update(deleted_at=now)
+        conversations = messages = 0
+        for conversation_id in list(Conversation.objects.filter(deleted_at__isnull=False).values_list('pk', flat=True)):
+            messages += purge_conversation(conversation_id, batch_size=options['batch_size'])
+            conversations += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {conversations} conversations ({hidden} expired by age) and {messages} messages"
+        ))
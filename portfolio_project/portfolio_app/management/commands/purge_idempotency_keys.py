@@ -0,0 +1,31 @@
+# portfolio_project/portfolio_app/management/commands/purge_idempotency_keys.py
+"""
+Delete Idempotency-Key records (and their stored responses) past IDEMPOTENCY_TTL_HOURS.
+
+    python manage.py purge_idempotency_keys
+    python manage.py purge_idempotency_keys --dry-run
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from portfolio_app.idempotency import purge_expired_keys
+from portfolio_app.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records; run it periodically (e.g. daily from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-hours', type=int, default=settings.IDEMPOTENCY_TTL_HOURS,
+                            help="Delete keys created longer ago than this")
+        parser.add_argument('--dry-run', action='store_true', help="Report how many keys would be deleted")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['ttl_hours'])
+        if options['dry_run']:
+            self.stdout.write(f"Expired idempotency keys: {IdempotencyKey.objects.filter(created_at__lt=cutoff).count()}")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Deleted {purge_expired_keys(cutoff)} expired idempotency keys"))
@@ -0,0 +1,96 @@
+# portfolio_project/portfolio_app/management/commands/reconcile_project_index.py
+"""
+Repair drift between Project records and their vectors in the Pinecone index.
+
+    python manage.py reconcile_project_index            # fix missing/outdated/orphaned vectors
+    python manage.py reconcile_project_index --dry-run  # only report
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio_app.ingestion import FETCH_BATCH_SIZE, content_hash
+from portfolio_app.models import Project
+from portfolio_app.project_index import VECTOR_ID_PREFIX, index_projects, project_documents, vector_id
+from portfolio_app.resilience import call_upstream
+
+
+class Command(BaseCommand):
+    help = "Compare Project records with the vector index and re-embed, re-upsert or delete vectors to match."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without changing anything")
+        parser.add_argument('--batch-size', type=int, default=32, help="Projects embedded per request")
+
+    def handle(self, *args, **options):
+        from portfolio_app.rag_pipeline import get_pinecone_index
+
+        try:
+            index = get_pinecone_index()
+        except Exception as e:
+            raise CommandError(f"Could not connect to Pinecone: {e}")
+
+        projects = list(Project.objects.prefetch_related('technologies'))
+        expected = {}  # vector id -> (project, field, content hash)
+        for project in projects:
+            for field, text in project_documents(project).items():
+                expected[vector_id(project.pk, field)] = (project, field, content_hash(text))
+
+        # What the index actually holds for those ids
+        indexed_hashes = {}
+        ids = list(expected)
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            response = call_upstream('pinecone', index.fetch, ids=ids[start:start + FETCH_BATCH_SIZE], bulkhead='pinecone_batch')
+            for found_id, vector in response.get('vectors', {}).items():
+                indexed_hashes[found_id] = (vector.get('metadata') or {}).get('content_hash')
+
+        missing = [vid for vid in expected if vid not in indexed_hashes]
+        outdated = [vid for vid, (_, _, digest) in expected.items() if vid in indexed_hashes and indexed_hashes[vid] != digest]
+        orphans = self._orphans(index, expected)
+
+        self.stdout.write(
+            f"Projects: {len(projects)} | vectors expected: {len(expected)} | missing: {len(missing)} | "
+            f"outdated: {len(outdated)} | orphaned: {'unknown' if orphans is None else len(orphans)}"
+        )
+        if options['dry_run']:
+            return
+
+        # The index is the source of truth: stored hashes become exactly what it holds and matches,
+        # so index_projects() re-embeds every missing or outdated field
+        for project in projects:
+            confirmed = {
+                field: digest
+                for vid, (owner, field, digest) in expected.items()
+                if owner.pk == project.pk and indexed_hashes.get(vid) == digest
+            }
+            if confirmed != (project.index_hashes or {}):
+                project.index_hashes = confirmed
+                Project.objects.filter(pk=project.pk).update(index_hashes=confirmed)
+
+        upserted = 0
+        for start in range(0, len(projects), options['batch_size']):
+            upserted += index_projects(projects[start:start + options['batch_size']], index)
+        for start in range(0, len(orphans or []), 1000):
+            call_upstream('pinecone', index.delete, ids=orphans[start:start + 1000], bulkhead='pinecone_batch')
+        self.stdout.write(self.style.SUCCESS(
+            f"Upserted {upserted} vectors, deleted {len(orphans or [])} orphaned vectors"
+        ))
+
+    def _orphans(self, index, expected):
+        """
+        Project vector ids in the index with no matching project field, or None if the index
+        cannot list ids (only serverless indexes support listing).
+        """
+        orphans = []
+        pagination_token = None
+        try:
+            while True:
+                kwargs = {'prefix': VECTOR_ID_PREFIX}
+                if pagination_token:
+                    kwargs['pagination_token'] = pagination_token
+                page = call_upstream('pinecone', index.list_paginated, bulkhead='pinecone_batch', **kwargs)
+                orphans.extend(v.id for v in page.vectors if v.id not in expected)
+                pagination_token = page.pagination.next if page.pagination else None
+                if not pagination_token:
+                    return orphans
+        except Exception as e:
+            self.stderr.write(f"Could not list project vectors ({e}); skipping orphan cleanup")
+            return None
@@ -0,0 +1,247 @@
+# portfolio_project/portfolio_app/memory.py
+"""
+Per-request memory accounting, allocation-site reports and RSS-based worker recycling.
+
+With MEMORY_TRACKING_ENABLED, each worker runs tracemalloc (MEMORY_TRACE_FRAMES frames
+per allocation) and records the peak of traced Python memory above its starting level
+for every request (portfolio_request_memory_peak_bytes) and every span() stage
+(portfolio_stage_memory_peak_bytes). tracemalloc traces the whole process, so when
+several requests run in one worker a peak also includes what the others allocated
+meanwhile. Tracing slows allocation-heavy code noticeably, hence off by default.
+
+/metrics/memory (METRICS_AUTH_TOKEN) reports the worker's RSS and, while tracing, its top
+allocation sites; ?diff=1 shows the growth per site since the previous ?diff=1 report of
+the same worker, which is how a leak shows up.
+
+With MEMORY_RSS_LIMIT_MB, a gunicorn worker whose RSS passes the limit logs why and sends
+itself SIGTERM: gunicorn's graceful shutdown lets in-flight requests finish and the
+master starts a replacement.
+"""
+import itertools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from .metrics import counter, histogram, set_memory_tracker
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUCKETS = tuple(2 ** power for power in range(16, 32, 2))  # 64 KiB .. 1 GiB
+REQUEST_MEMORY_PEAK = histogram(
+    'portfolio_request_memory_peak_bytes', 'Peak traced Python memory above the level at request start.',
+    ('view',), buckets=MEMORY_BUCKETS,
+)
+STAGE_MEMORY_PEAK = histogram(
+    'portfolio_stage_memory_peak_bytes', 'Peak traced Python memory above the level at stage start.',
+    ('stage',), buckets=MEMORY_BUCKETS,
+)
+WORKER_RECYCLES = counter('portfolio_worker_recycles_total', 'Workers recycled by this process, by reason.', ('reason',))
+
+# Left out of allocation reports: the bookkeeping of tracemalloc and the import system
+REPORT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class PeakTracker:
+    """
+    Peaks of traced memory over overlapping windows (requests and their stages).
+    tracemalloc keeps a single process-wide peak; every begin() and end() folds the peak
+    reached since the last reset into all open windows and resets it, so each window gets
+    the highest level reached while it was open.
+    """
+
+    def __init__(self):
+        self._open = {}  # window id -> [traced bytes at start, highest traced bytes]
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _fold(self):
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for window in self._open.values():
+            if peak > window[1]:
+                window[1] = peak
+        return current
+
+    def begin(self):
+        if not tracemalloc.is_tracing():
+            return None
+        with self._lock:
+            current = self._fold()
+            window_id = next(self._ids)
+            self._open[window_id] = [current, current]
+        return window_id
+
+    def end(self, window_id):
+        """
+        Peak bytes above the window's starting level, or None if it was not tracked.
+        """
+        if window_id is None:
+            return None
+        with self._lock:
+            if window_id not in self._open or not tracemalloc.is_tracing():
+                self._open.pop(window_id, None)
+                return None
+            self._fold()
+            start, peak = self._open.pop(window_id)
+        return max(0, peak - start)
+
+    def end_stage(self, window_id, stage):
+        peak = self.end(window_id)
+        if peak is not None:
+            STAGE_MEMORY_PEAK.observe(peak, stage=stage)
+
+
+_tracker = PeakTracker()
+_baseline = None  # snapshot of the previous diff report
+_baseline_lock = threading.Lock()
+
+_recycling_enabled = False
+_recycle_requested = False
+_last_rss_check = 0.0
+
+
+def start_tracking():
+    """
+    Start tracemalloc (if MEMORY_TRACKING_ENABLED) and per-stage accounting in span().
+    """
+    if not settings.MEMORY_TRACKING_ENABLED:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+    set_memory_tracker(_tracker)
+
+
+def begin_request_memory():
+    return _tracker.begin()
+
+
+def end_request_memory(window_id, view):
+    peak = _tracker.end(window_id)
+    if peak is not None:
+        REQUEST_MEMORY_PEAK.observe(peak, view=view)
+    return peak
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes, or None if it cannot be read.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # No /proc (macOS): the peak RSS is the closest figure available (bytes there, KiB on Linux)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def top_allocations(limit=10, group_by='lineno', diff=False):
+    """
+    The largest allocation sites as dicts (site, size_bytes, count, plus size_diff_bytes
+    and count_diff with diff=True), or None when tracemalloc is not running.
+    diff=True compares with the previous diff=True report taken in this process (and makes
+    this one the baseline of the next); plain reports leave the baseline alone.
+    """
+    global _baseline
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces(REPORT_FILTERS)
+    baseline = None
+    if diff:
+        with _baseline_lock:
+            baseline, _baseline = _baseline, snapshot
+    if diff and baseline is not None:
+        stats = snapshot.compare_to(baseline, group_by)
+    else:
+        stats = snapshot.statistics(group_by)
+    sites = []
+    for stat in stats[:limit]:
+        site = {
+            'site': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            'size_bytes': stat.size,
+            'count': stat.count,
+        }
+        if diff and baseline is not None:
+            site['size_diff_bytes'] = stat.size_diff
+            site['count_diff'] = stat.count_diff
+        sites.append(site)
+    return sites
+
+
+def memory_report(limit=10, group_by='lineno', diff=False):
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    return {
+        'pid': os.getpid(),
+        'rss_bytes': current_rss(),
+        'rss_limit_bytes': settings.MEMORY_RSS_LIMIT_MB * 1024 * 1024 or None,
+        'tracing': tracemalloc.is_tracing(),
+        'traced_bytes': traced,
+        'top_allocations': top_allocations(limit, group_by, diff),
+    }
+
+
+def enable_worker_recycling():
+    """
+    Allow check_rss() to recycle this process; called from gunicorn's post_fork, as only a
+    gunicorn worker has a master to replace it.
+    """
+    global _recycling_enabled
+    _recycling_enabled = True
+
+
+def check_rss():
+    """
+    At most every MEMORY_RSS_CHECK_SECONDS: if RSS is over MEMORY_RSS_LIMIT_MB, log why
+    and ask gunicorn to shut this worker down gracefully.
+    """
+    global _last_rss_check, _recycle_requested
+    limit_mb = settings.MEMORY_RSS_LIMIT_MB
+    if not limit_mb or not _recycling_enabled or _recycle_requested:
+        return
+    now = time.monotonic()
+    if now - _last_rss_check < settings.MEMORY_RSS_CHECK_SECONDS:
+        return
+    _last_rss_check = now
+    rss = current_rss()
+    if rss is None or rss <= limit_mb * 1024 * 1024:
+        return
+    _recycle_requested = True
+    WORKER_RECYCLES.inc(reason='rss_limit')
+    sites = top_allocations(limit=5) or []
+    logger.warning(
+        "[check_rss] Recycling worker %d: RSS %.0f MiB is over MEMORY_RSS_LIMIT_MB=%d.%s",
+        os.getpid(), rss / (1024 * 1024), limit_mb,
+        ''.join(f" {site['site'][0]} {site['size_bytes'] / (1024 * 1024):.1f} MiB;" for site in sites),
+    )
+    # Gunicorn workers treat SIGTERM as a graceful shutdown: in-flight requests finish first
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def reset_memory_tracking():
+    """
+    Forget the windows, baseline and locks inherited from a preloading master.
+    """
+    global _tracker, _baseline, _baseline_lock, _recycle_requested, _last_rss_check
+    _tracker = PeakTracker()
+    _baseline = None
+    _baseline_lock = threading.Lock()
+    _recycle_requested = False
+    _last_rss_check = 0.0
+    if tracemalloc.is_tracing():
+        set_memory_tracker(_tracker)
@@ -0,0 +1,285 @@
+# portfolio_project/portfolio_app/message_writer.py
+"""
+Conversation message persistence for the AI endpoints.
+persist_exchanges() writes any number of exchanges with one bulk INSERT of the messages
+and one timestamp UPDATE per conversation; callers run it inside a transaction.
+
+With MESSAGE_WRITE_BEHIND=True the views hand exchanges to a per-process MessageWriter
+instead and respond without waiting for the database. A background thread writes them in
+batches, retrying failed batches with backoff for as long as the process runs. Nothing is
+dropped:
+- a full queue makes the request write synchronously (backpressure);
+- shutdown (gunicorn worker_exit hook, or atexit) drains the queue;
+- batches that still cannot be written at shutdown are spooled to
+  MESSAGE_WRITE_BEHIND_SPOOL_DIR and replayed by the next writer that starts.
+Messages that are queued but not yet written are still visible to history loading in the
+same process (pending_messages()). Only a hard kill (SIGKILL, OOM) can lose the queue.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .metrics import counter
+from .models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_MESSAGES = counter(
+    'portfolio_write_behind_messages_total', 'Messages handled by the write-behind queue by outcome.', ('result',),
+)
+
+MAX_RETRY_DELAY_SECONDS = 30
+SHUTDOWN_RETRIES = 3
+
+
+def persist_exchanges(exchanges):
+    """
+    Write exchanges, given as (conversation_id, [(sender, content), ...], timestamp) tuples:
+    one bulk_create for all messages and one update of each conversation's updated_at.
+    """
+    Message.objects.bulk_create([
+        Message(conversation_id=conversation_id, sender=sender, content=content)
+        for conversation_id, messages, _ in exchanges
+        for sender, content in messages
+    ])
+    latest = {}
+    for conversation_id, _, timestamp in exchanges:
+        latest[conversation_id] = max(timestamp, latest.get(conversation_id, timestamp))
+    for conversation_id, timestamp in latest.items():
+        Conversation.objects.filter(pk=conversation_id).update(updated_at=timestamp)
+
+
+class MessageWriter:
+    """
+    Background batch writer for conversation messages (see module docstring).
+    """
+
+    def __init__(self, batch_size, flush_seconds, max_queue, spool_dir):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spool_dir = spool_dir
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = {}  # conversation_id -> [(sender, content), ...] not yet committed
+        self._pending_lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Guards _closed: once shutdown() sets it, submit() never queues again, so nothing
+        # can be queued after the thread has drained the queue and exited
+        self._state_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, conversation_id, messages):
+        """
+        Queue an exchange; returns the timestamp its conversation's updated_at will get.
+        """
+        exchange = (conversation_id, list(messages), timezone.now())
+        with self._pending_lock:
+            self._pending.setdefault(conversation_id, []).extend(exchange[1])
+        with self._state_lock:
+            try:
+                if self._closed:
+                    raise queue.Full
+                self._queue.put_nowait(exchange)
+                queued = True
+            except queue.Full:
+                queued = False
+        if not queued:
+            # Queue full (or shut down): write in the request rather than drop
+            WRITE_BEHIND_MESSAGES.inc(len(exchange[1]), result='sync_fallback')
+            self._write([exchange], retries=SHUTDOWN_RETRIES)
+        return exchange[2]
+
+    def pending_messages(self, conversation_id):
+        with self._pending_lock:
+            return list(self._pending.get(conversation_id, ()))
+
+    def shutdown(self, timeout=30):
+        """
+        Stop accepting work, write everything queued and stop the thread.
+        """
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        self._replay_spool()
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Collect more exchanges for up to flush_seconds (none of the wait when stopping)
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Only reachable if spooling itself failed; keep the thread alive for the rest
+                logger.critical("[message_writer] Lost %d exchanges: %s", len(batch), e)
+        close_old_connections()
+
+    def _write(self, batch, retries=None):
+        """
+        Persist a batch; retried with backoff (indefinitely unless stopping or retries is
+        given). A batch that cannot be written during shutdown is spooled to disk.
+        """
+        from .summaries import schedule_summary_update
+
+        attempt = 0
+        written = False
+        while not written:
+            try:
+                with transaction.atomic():
+                    persist_exchanges(batch)
+                written = True
+            except Exception as e:
+                if isinstance(e, IntegrityError):
+                    # Usually a conversation deleted after its exchange was queued: drop just those
+                    kept = self._without_deleted_conversations(batch)
+                    if len(kept) < len(batch):
+                        logger.warning("[message_writer] Dropping %d exchanges of deleted conversations", len(batch) - len(kept))
+                        self._forget([exchange for exchange in batch if exchange not in kept])
+                        batch = kept
+                        written = not batch
+                        continue
+                attempt += 1
+                close_old_connections()
+                limit = SHUTDOWN_RETRIES if self._stopping.is_set() else retries
+                if limit is not None and attempt >= limit:
+                    logger.error("[message_writer] Giving up on %d exchanges after %d attempts: %s", len(batch), attempt, e)
+                    self._spool(batch)
+                    break
+                delay = min(0.5 * 2 ** (attempt - 1), MAX_RETRY_DELAY_SECONDS)
+                logger.warning("[message_writer] Write of %d exchanges failed (%s); retrying in %.1fs", len(batch), e, delay)
+                time.sleep(delay)
+        # Written or spooled: either way no longer this process's to hold
+        self._forget(batch)
+        if written:
+            WRITE_BEHIND_MESSAGES.inc(sum(len(messages) for _, messages, _ in batch), result='written')
+            for conversation_id in {conversation_id for conversation_id, _, _ in batch}:
+                schedule_summary_update(conversation_id)
+
+    def _without_deleted_conversations(self, batch):
+        try:
+            existing = set(Conversation.objects.filter(
+                pk__in={conversation_id for conversation_id, _, _ in batch}
+            ).values_list('pk', flat=True))
+        except Exception:
+            return batch  # database unavailable; handled as an ordinary failed write
+        return [exchange for exchange in batch if exchange[0] in existing]
+
+    def _forget(self, batch):
+        with self._pending_lock:
+            for conversation_id, messages, _ in batch:
+                pending = self._pending.get(conversation_id)
+                if pending is None:
+                    continue
+                del pending[:len(messages)]
+                if not pending:
+                    del self._pending[conversation_id]
+
+    # --- Spool (last resort when the database is unavailable at shutdown) ---
+    def _spool(self, batch):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}.jsonl")
+        with open(f"{path}.tmp", 'w') as f:
+            for conversation_id, messages, timestamp in batch:
+                f.write(json.dumps({'conversation_id': conversation_id, 'messages': messages,
+                                    'timestamp': timestamp.isoformat()}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        WRITE_BEHIND_MESSAGES.inc(sum(len(messages) for _, messages, _ in batch), result='spooled')
+        logger.error("[message_writer] Spooled %d exchanges to %s", len(batch), path)
+
+    def _replay_spool(self):
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, '*.jsonl'))):
+            claimed = f"{path}.{os.getpid()}.replaying"
+            try:
+                os.rename(path, claimed)  # atomic: only one worker replays a file
+            except OSError:
+                continue
+            with open(claimed) as f:
+                batch = [
+                    (entry['conversation_id'], [tuple(m) for m in entry['messages']], parse_datetime(entry['timestamp']))
+                    for entry in map(json.loads, f)
+                ]
+            try:
+                with transaction.atomic():
+                    persist_exchanges(batch)
+            except Exception as e:
+                os.rename(claimed, path)
+                logger.error("[message_writer] Could not replay %s: %s", path, e)
+                continue
+            os.remove(claimed)
+            logger.info("[message_writer] Replayed %d spooled exchanges from %s", len(batch), path)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_message_writer():
+    """
+    The process-wide writer, or None when MESSAGE_WRITE_BEHIND is off.
+    """
+    global _writer
+    if not settings.MESSAGE_WRITE_BEHIND:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = MessageWriter(
+                    batch_size=settings.MESSAGE_WRITE_BEHIND_BATCH_SIZE,
+                    flush_seconds=settings.MESSAGE_WRITE_BEHIND_FLUSH_SECONDS,
+                    max_queue=settings.MESSAGE_WRITE_BEHIND_MAX_QUEUE,
+                    spool_dir=settings.MESSAGE_WRITE_BEHIND_SPOOL_DIR,
+                )
+    return _writer
+
+
+def pending_messages(conversation_id):
+    """
+    Messages of the conversation queued in this process but not yet written.
+    """
+    writer = _writer
+    return writer.pending_messages(conversation_id) if writer is not None else []
+
+
+@atexit.register
+def shutdown_message_writer():
+    """
+    Drain the write-behind queue (called from gunicorn's worker_exit hook and at exit).
+    """
+    writer = _writer
+    if writer is not None:
+        writer.shutdown()
+
+
+def reset_message_writer():
+    """
+    Forget the writer inherited from a preloading master (its thread did not survive fork()).
+    """
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
@@ -0,0 +1,294 @@
+# portfolio_project/portfolio_app/metrics.py
+"""
+Lightweight in-process metrics: a span() timer for pipeline stages, latency histograms,
+counters, Server-Timing header support and Prometheus text exposition.
+
+Each gunicorn worker keeps its own registry. When METRICS_MULTIPROCESS_DIR is set,
+every worker also snapshots its registry to that directory and /metrics merges the
+snapshots of all live workers, so a scrape sees the whole server, not one worker.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Spans recorded during the current request: list of (name, seconds), or None outside a request
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+# Per-stage memory accounting (memory.PeakTracker), set while tracemalloc is tracing
+_memory_tracker = None
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by a tuple of label values.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket_counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): list(series) for key, series in self._series.items()}
+
+    def reset(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._series.items()}
+
+    def reset(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def reset_registry():
+    """
+    Zero every metric (e.g. in a freshly forked worker, so observations made by the
+    preloading master are not counted again by each worker).
+    """
+    for metric in _registry:
+        metric.reset()
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+REQUEST_DURATION = histogram(
+    'portfolio_request_duration_seconds', 'End-to-end request latency.', ('view', 'method', 'status'),
+)
+STAGE_DURATION = histogram(
+    'portfolio_stage_duration_seconds', 'Duration of individual request/pipeline stages.', ('stage',),
+)
+UPSTREAM_DURATION = histogram(
+    'portfolio_upstream_duration_seconds', 'Latency of calls to upstream services.', ('dependency',),
+)
+UPSTREAM_ERRORS = counter(
+    'portfolio_upstream_errors_total', 'Failed or rejected upstream calls.', ('dependency', 'kind'),
+)
+
+
+def set_memory_tracker(tracker):
+    global _memory_tracker
+    _memory_tracker = tracker
+
+
+@contextmanager
+def span(name):
+    """
+    Time a stage. The duration goes into the stage histogram and, inside a request,
+    into that request's Server-Timing header. While memory tracking is on (memory.py),
+    the stage's peak memory is recorded too.
+    """
+    tracker = _memory_tracker
+    window = tracker.begin() if tracker is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, duration))
+        if window is not None:
+            tracker.end_stage(window, name)
+
+
+def begin_request():
+    """
+    Start collecting spans for the current request; returns a token for end_request().
+    """
+    return _request_spans.set([])
+
+
+def end_request(token):
+    """
+    Stop collecting spans and return the (name, seconds) list recorded for the request.
+    """
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def server_timing_header(spans):
+    """
+    Render spans as a Server-Timing header value; repeated stages are summed.
+    """
+    totals = {}
+    for name, duration in spans:
+        totals[name] = totals.get(name, 0.0) + duration
+    return ', '.join(f"{name};dur={duration * 1000:.1f}" for name, duration in totals.items())
+
+
+# --- Multi-process aggregation ---
+_last_dump = 0.0
+_dump_lock = threading.Lock()
+
+
+def _snapshot_path(pid):
+    return os.path.join(settings.METRICS_MULTIPROCESS_DIR, f"metrics-{pid}.json")
+
+
+def _registry_snapshot():
+    return {metric.name: metric.snapshot() for metric in _registry}
+
+
+def dump_snapshot(force=False):
+    """
+    Write this worker's registry to the multiprocess directory (throttled unless forced).
+    """
+    global _last_dump
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_dump < settings.METRICS_DUMP_INTERVAL_SECONDS:
+        return
+    with _dump_lock:
+        _last_dump = now
+        os.makedirs(directory, exist_ok=True)
+        path = _snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(_registry_snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _collect_snapshots():
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    if not directory:
+        return [_registry_snapshot()]
+    dump_snapshot(force=True)
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        pid = int(filename[len('metrics-'):-len('.json')])
+        path = os.path.join(directory, filename)
+        if not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _merge(metric, snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.get(metric.name, {}).items():
+            if metric.kind == 'counter':
+                merged[key] = merged.get(key, 0) + value
+            else:
+                current = merged.setdefault(key, [0] * len(value))
+                for i, item in enumerate(value):
+                    current[i] += item
+    return merged
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def render_prometheus():
+    """
+    Render all registered metrics in the Prometheus text exposition format.
+    """
+    snapshots = _collect_snapshots()
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in sorted(_merge(metric, snapshots).items()):
+            label_values = json.loads(key)
+            if metric.kind == 'counter':
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, label_values)} {value}")
+                continue
+            for bound, count in zip(metric.buckets, value):
+                labels = _format_labels(metric.labelnames, label_values, ('le', repr(float(bound))))
+                lines.append(f"{metric.name}_bucket{labels} {count}")
+            labels = _format_labels(metric.labelnames, label_values, ('le', '+Inf'))
+            lines.append(f"{metric.name}_bucket{labels} {value[-1]}")
+            lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, label_values)} {value[-2]}")
+            lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, label_values)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,249 @@
+# portfolio_project/portfolio_app/middleware.py
+"""
+Custom middleware for the portfolio app.
+All classes work in sync (WSGI) and async (ASGI) mode, so an async view is never
+forced through a thread just because a middleware above it is sync-only.
+"""
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .memory import begin_request_memory, check_rss, end_request_memory, start_tracking
+from .metrics import REQUEST_DURATION, begin_request, counter, end_request, server_timing_header, dump_snapshot
+from .profiling import RequestProfiler, requested_profile, save_profile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_BYTES = counter(
+    'portfolio_response_bytes_total', 'Compressed response body bytes before and after encoding.', ('encoding', 'kind'),
+)
+ACCEPTS_BROTLI = re.compile(r'\bbr\b')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+# Only text bodies are worth compressing; images, archives and binary downloads (e.g. stored
+# profiles in the admin) are already compressed or incompressible
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain')
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the spans recorded while handling a request, adds them to the response
+    as a Server-Timing header and records the total request latency.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = begin_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            spans = end_request(token)
+        return self._finish(request, response, spans, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        token = begin_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            spans = end_request(token)
+        return self._finish(request, response, spans, time.perf_counter() - start)
+
+    def _finish(self, request, response, spans, duration):
+        spans.append(('total', duration))
+        response['Server-Timing'] = server_timing_header(spans)
+        match = getattr(request, 'resolver_match', None)
+        REQUEST_DURATION.observe(
+            duration,
+            view=match.view_name if match else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+        dump_snapshot()
+        return response
+
+
+class MemoryMiddleware:
+    """
+    Records each request's peak traced memory while MEMORY_TRACKING_ENABLED, and checks
+    the worker's RSS against MEMORY_RSS_LIMIT_MB after each request (see memory.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        start_tracking()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        window = begin_request_memory()
+        try:
+            return self.get_response(request)
+        finally:
+            self._finish(request, window)
+
+    async def __acall__(self, request):
+        window = begin_request_memory()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._finish(request, window)
+
+    def _finish(self, request, window):
+        match = getattr(request, 'resolver_match', None)
+        end_request_memory(window, match.view_name if match else 'unmatched')
+        check_rss()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request that carries a signed profiling token (X-Profile header or
+    ?profile=, see profiling.py), stores the profile and returns its id in X-Profile-Id.
+    Requests without a token go straight through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = requested_profile(request)
+        if requested is None:
+            return self.get_response(request)
+        profiler = RequestProfiler(requested[0])
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        profile = save_profile(request, response, profiler, requested[1], time.perf_counter() - start)
+        return self._finish(response, profile)
+
+    async def __acall__(self, request):
+        requested = requested_profile(request)
+        if requested is None:
+            return await self.get_response(request)
+        profiler = RequestProfiler(requested[0])
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        profile = await sync_to_async(save_profile)(request, response, profiler, requested[1], time.perf_counter() - start)
+        return self._finish(response, profile)
+
+    def _finish(self, response, profile):
+        if profile is not None:
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+class AsyncCapableWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise 6.x is sync-only; in ASGI mode that would push every request below it
+    onto a thread. Static lookups are in-memory, so the async path can do them inline.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class CompressionMiddleware:
+    """
+    Brotli (if the brotli package is installed) or gzip for JSON, HTML and plain-text
+    responses (COMPRESSIBLE_TYPES) of at least RESPONSE_COMPRESSION_MIN_BYTES. Streaming responses (SSE) are left alone so every
+    event still reaches the client as soon as it is written; static files never get here
+    (WhiteNoise, above, serves its own pre-compressed copies).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
+
+    def _compress(self, request, response):
+        if (
+            not settings.RESPONSE_COMPRESSION_ENABLED
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or response.get('Content-Type', '').split(';')[0].strip().lower() not in COMPRESSIBLE_TYPES
+            or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        if brotli is not None and ACCEPTS_BROTLI.search(accept_encoding):
+            encoding = 'br'
+            compressed = brotli.compress(response.content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        elif ACCEPTS_GZIP.search(accept_encoding):
+            encoding = 'gzip'
+            compressed = compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+        RESPONSE_BYTES.inc(len(response.content), encoding=encoding, kind='original')
+        RESPONSE_BYTES.inc(len(compressed), encoding=encoding, kind='sent')
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The body differs per encoding, so a strong ETag would no longer be accurate
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0004_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='index_hashes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
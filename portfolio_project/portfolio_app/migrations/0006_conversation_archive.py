@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0005_project_index_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationArchive',
+            fields=[
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='portfolio_app.conversation')),
+                ('codec', models.CharField(choices=[('zlib', 'zlib'), ('lzma', 'lzma')], max_length=8)),
+                ('data', models.BinaryField(help_text='Compressed JSON list of [sender, content, created_at, token_count]')),
+                ('message_count', models.PositiveIntegerField()),
+                ('raw_size', models.PositiveIntegerField(help_text='Size in bytes before compression')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Conversation Archive',
+                'verbose_name_plural': 'Conversation Archives',
+            },
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
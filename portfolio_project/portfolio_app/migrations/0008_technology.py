@@ -0,0 +1,81 @@
+# Generated by Django 5.0.6 on 2026-10-19 20:10
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def _split(text):
+    names = {}
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        if name and name.lower() not in names:
+            names[name.lower()] = name
+    return list(names.values())
+
+
+def _slug(name):
+    return (slugify(name.replace('+', 'plus').replace('#', 'sharp')) or name.lower())[:100]
+
+
+def technologies_to_rows(apps, schema_editor):
+    Project = apps.get_model('portfolio_app', 'Project')
+    Technology = apps.get_model('portfolio_app', 'Technology')
+    by_slug = {}
+    for project in Project.objects.all():
+        technologies = []
+        for name in _split(project.technologies):
+            slug = _slug(name)
+            if slug not in by_slug:
+                by_slug[slug], _ = Technology.objects.get_or_create(slug=slug, defaults={'name': name[:100]})
+            technologies.append(by_slug[slug])
+        project.technology_set.set(technologies)
+
+
+def rows_to_technologies(apps, schema_editor):
+    Project = apps.get_model('portfolio_app', 'Project')
+    for project in Project.objects.all():
+        project.technologies = ', '.join(tech.name for tech in project.technology_set.order_by('name'))[:500]
+        project.save(update_fields=['technologies'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0007_conversation_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Technology',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(blank=True, help_text='Filled in from the name when left blank', max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Technologies',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='technology_set',
+            field=models.ManyToManyField(blank=True, related_name='projects', to='portfolio_app.technology'),
+        ),
+        # Reversible: the comma-separated column is rebuilt from the rows when migrating back
+        migrations.AlterField(
+            model_name='project',
+            name='technologies',
+            field=models.CharField(blank=True, default='', help_text='Comma-separated list of technologies used', max_length=500),
+        ),
+        migrations.RunPython(technologies_to_rows, rows_to_technologies),
+        migrations.RemoveField(
+            model_name='project',
+            name='technologies',
+        ),
+        migrations.RenameField(
+            model_name='project',
+            old_name='technology_set',
+            new_name='technologies',
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-19 20:40
+
+from django.db import migrations, models
+
+# PostgreSQL only: generated tsvector columns (kept current by the database on every write)
+# with GIN indexes, used by portfolio_app/search.py. The columns are not model fields.
+# Adding a stored generated column rewrites the table; the indexes are built CONCURRENTLY.
+# Message content is capped at 100k characters for indexing (tsvector is limited to 1MB).
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE portfolio_app_message ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english'::regconfig, left(coalesce(content, ''), 100000))) STORED
+    """,
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS portfolio_app_message_search_idx ON portfolio_app_message USING GIN (search_vector)",
+    """
+    ALTER TABLE portfolio_app_project ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS portfolio_app_project_search_idx ON portfolio_app_project USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX CONCURRENTLY IF EXISTS portfolio_app_message_search_idx",
+    "ALTER TABLE portfolio_app_message DROP COLUMN IF EXISTS search_vector",
+    "DROP INDEX CONCURRENTLY IF EXISTS portfolio_app_project_search_idx",
+    "ALTER TABLE portfolio_app_project DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return  # other databases use the icontains fallback in search.py
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('portfolio_app', '0008_technology'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['google_user_id', '-updated_at'], name='conversation_user_updated_idx'),
+        ),
+        migrations.RunPython(_run_on_postgres(POSTGRES_FORWARD), _run_on_postgres(POSTGRES_BACKWARD), atomic=False),
+    ]
@@ -1,6 +1,61 @@
 # portfolio_project/portfolio_app/models.py
 
 from django.db import models
+from django.utils.text import slugify
+
+
+def split_technologies(text):
+    """
+    Names from a comma-separated technologies string, stripped and de-duplicated
+    (case-insensitively, first spelling wins).
+    """
+    names = {}
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        if name and name.lower() not in names:
+            names[name.lower()] = name
+    return list(names.values())
+
+
+def technology_slug(name):
+    # Keep C, C++ and C# apart (slugify would reduce all three to "c")
+    return (slugify(name.replace('+', 'plus').replace('#', 'sharp')) or name.lower())[:100]
+
+
+class Technology(models.Model):
+    """
+    A technology used by portfolio projects (Django, React, ...); the slug is what
+    /api/projects/?technology= filters on.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=100, unique=True, blank=True, help_text="Filled in from the name when left blank")
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = "Technologies"
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = technology_slug(self.name)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def for_names(cls, names):
+        """
+        Technology rows for the given names (matched by slug), creating the missing ones.
+        """
+        slugs = {name: technology_slug(name) for name in names}
+        existing = {tech.slug: tech for tech in cls.objects.filter(slug__in=slugs.values())}
+        technologies = []
+        for name, slug in slugs.items():
+            if slug not in existing:
+                existing[slug], _ = cls.objects.get_or_create(slug=slug, defaults={'name': name})
+            technologies.append(existing[slug])
+        return technologies
+
 
 class Project(models.Model):
     """
@@ -12,9 +67,11 @@ class Project(models.Model):
     live_link = models.URLField(blank=True, null=True)
     # New field for project image
     image = models.ImageField(upload_to='project_images/', blank=True, null=True)
-    technologies = models.CharField(max_length=500, help_text="Comma-separated list of technologies used")
+    technologies = models.ManyToManyField(Technology, related_name='projects', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # {field: content hash} of what is in the vector index (maintained by project_index.py)
+    index_hashes = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ['-created_at'] # Order projects by most recent first
@@ -22,6 +79,13 @@ class Project(models.Model):
     def __str__(self):
         return self.title
 
+    @property
+    def technologies_text(self):
+        """
+        Comma-separated technology names (uses prefetched technologies when available).
+        """
+        return ', '.join(tech.name for tech in self.technologies.all())
+
 class ImageGenerationUsage(models.Model):
     """
     Tracks how many times a user (by Google user ID) has generated images in a given month/year.
@@ -48,9 +112,19 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     title = models.CharField(max_length=255, blank=True, null=True, help_text="Optional title or topic for the conversation")
+    # Rolling summary of the oldest messages, sent to the LLM in place of them (see summaries.py)
+    summary = models.TextField(blank=True, default='')
+    summarized_message_count = models.PositiveIntegerField(default=0, help_text="Number of oldest messages covered by the summary")
+    summary_updated_at = models.DateTimeField(blank=True, null=True)
+    # Set while the conversation's messages are in ConversationArchive (see archive.py)
+    archived_at = models.DateTimeField(blank=True, null=True)
+    # Set when the user deletes the conversation: hidden at once, rows removed later (see purge.py)
+    deleted_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ['-updated_at']
+        # A user's conversations: the list endpoint, the 12-hour fallback and search scoping
+        indexes = [models.Index(fields=['google_user_id', '-updated_at'], name='conversation_user_updated_idx')]
         verbose_name = "Conversation"
         verbose_name_plural = "Conversations"
 
@@ -73,4 +147,77 @@ class Message(models.Model):
         verbose_name_plural = "Messages"
 
     def __str__(self):
-        return f"{self.sender} ({self.created_at}): {self.content[:40]}..."
\ No newline at end of file
+        return f"{self.sender} ({self.created_at}): {self.content[:40]}..."
+
+class ConversationArchive(models.Model):
+    """
+    The messages of an idle conversation, moved out of the messages table as one compressed blob.
+    """
+    conversation = models.OneToOneField(Conversation, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    codec = models.CharField(max_length=8, choices=[('zlib', 'zlib'), ('lzma', 'lzma')])
+    data = models.BinaryField(help_text="Compressed JSON list of [sender, content, created_at, token_count]")
+    message_count = models.PositiveIntegerField()
+    raw_size = models.PositiveIntegerField(help_text="Size in bytes before compression")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Conversation Archive"
+        verbose_name_plural = "Conversation Archives"
+
+    def __str__(self):
+        return f"Archive of conversation {self.conversation_id} ({self.message_count} messages, {self.codec})"
+
+class IdempotencyKey(models.Model):
+    """
+    An Idempotency-Key sent by a user to an expensive endpoint (codegen, image generation),
+    with the response of the request that first used it (see idempotency.py).
+    """
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+
+    google_user_id = models.CharField(max_length=128)
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=32)
+    request_hash = models.CharField(max_length=64, help_text="SHA-256 of the request body")
+    status = models.CharField(max_length=16, choices=[(PROCESSING, 'Processing'), (COMPLETED, 'Completed')], default=PROCESSING)
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the current owner claimed the key; a processing key not finished within
+    # IDEMPOTENCY_LOCK_SECONDS (e.g. its worker died) may be claimed again
+    locked_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("google_user_id", "key")
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+
+    def __str__(self):
+        return f"{self.google_user_id} - {self.endpoint} {self.key}: {self.status}"
+
+
+class RequestProfile(models.Model):
+    """
+    CPU profile of one request, recorded on demand by ProfilingMiddleware (see profiling.py).
+    """
+    CPROFILE = 'cprofile'
+    SAMPLING = 'sampling'
+
+    method = models.CharField(max_length=8)
+    path = models.CharField(max_length=2048)
+    mode = models.CharField(max_length=16, choices=[(CPROFILE, 'cProfile'), (SAMPLING, 'Sampling')])
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    issued_by = models.CharField(max_length=150, blank=True, help_text="Who the profiling token was issued to")
+    summary = models.TextField(blank=True)
+    # pstats dump (cprofile) or collapsed stacks (sampling)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Request Profile"
+        verbose_name_plural = "Request Profiles"
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.mode}, {self.duration_ms:.0f} ms)"
@@ -0,0 +1,45 @@
+# portfolio_project/portfolio_app/payloads.py
+"""
+Response shaping for the heavy JSON endpoints (codegen, conversation history, projects).
+?fields=a,b keeps only the listed top-level keys of a response (sparse fieldsets), and the
+codegen endpoint returns its retrieved context as previews of CONTEXT_PREVIEW_CHARS
+characters unless ?context=full is given.
+"""
+from django.conf import settings
+
+
+def requested_fields(request):
+    """
+    The set of field names from ?fields=, or None when the client did not restrict them.
+    """
+    raw = request.GET.get('fields')
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(',') if name.strip()} or None
+
+
+def wants(fields, name):
+    return fields is None or name in fields
+
+
+def sparse(payload, fields):
+    """
+    The payload restricted to the requested top-level keys (unchanged if none were requested).
+    """
+    if fields is None:
+        return payload
+    return {key: value for key, value in payload.items() if key in fields}
+
+
+def context_previews(request, chunks):
+    """
+    Texts of the context chunks for a response: truncated previews by default, the full
+    text with ?context=full.
+    """
+    if request.GET.get('context') == 'full':
+        return [chunk['text'] for chunk in chunks]
+    limit = settings.CONTEXT_PREVIEW_CHARS
+    return [
+        chunk['text'] if len(chunk['text']) <= limit else chunk['text'][:limit].rstrip() + '…'
+        for chunk in chunks
+    ]
@@ -0,0 +1,204 @@
+# portfolio_project/portfolio_app/profiling.py
+"""
+On-demand CPU profiling of single requests (see ProfilingMiddleware).
+
+A request is profiled only when it carries a signed profiling token, in the X-Profile
+header or the ?profile= query parameter. Tokens are issued to staff with
+`manage.py profile_token` and expire after PROFILING_TOKEN_MAX_AGE_SECONDS. Other
+requests only pay for one header and one query-string lookup.
+
+Two modes:
+  cprofile - deterministic cProfile of the request's thread; stored as a pstats dump
+             (open with `python -m pstats` or snakeviz)
+  sampling - a background thread samples the request thread's stack every
+             PROFILING_SAMPLE_INTERVAL_MS; stored as collapsed stacks, ready for
+             flamegraph.pl or speedscope. Wall-clock samples, so time spent waiting on
+             upstreams shows up too.
+
+Both see the thread that runs the view: work handed to other threads (upstream calls on
+the resilience pool, sync_to_async calls in ASGI mode) is not included, and in ASGI mode
+the event loop also runs other requests meanwhile. Streaming bodies are produced after
+the profile ends. Profiles are stored as RequestProfile rows (newest PROFILING_MAX_STORED
+kept) and listed in the admin.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+from .metrics import counter
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILED_REQUESTS = counter(
+    'portfolio_profiled_requests_total', 'Requests profiled on demand, by mode.', ('mode',),
+)
+
+HEADER = 'X-Profile'
+QUERY_PARAM = 'profile'
+SIGNING_SALT = 'portfolio_app.profiling'
+MODES = (RequestProfile.CPROFILE, RequestProfile.SAMPLING)
+SUMMARY_LINES = 40
+
+
+def make_token(mode=RequestProfile.CPROFILE, issued_by=''):
+    """
+    A signed, timestamped profiling token (valid for PROFILING_TOKEN_MAX_AGE_SECONDS).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}'")
+    return signing.dumps({'mode': mode, 'by': issued_by}, salt=SIGNING_SALT, compress=True)
+
+
+def requested_profile(request):
+    """
+    (mode, issued_by) if the request carries a valid profiling token, otherwise None.
+    """
+    token = request.headers.get(HEADER) or request.GET.get(QUERY_PARAM)
+    if not token or not settings.PROFILING_ENABLED:
+        return None
+    try:
+        claims = signing.loads(token, salt=SIGNING_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE_SECONDS)
+    except signing.BadSignature:
+        logger.warning("[requested_profile] Invalid or expired profiling token for %s", request.path)
+        return None
+    if claims.get('mode') not in MODES:
+        return None
+    return claims['mode'], claims.get('by', '')
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval from a daemon thread and counts
+    the collapsed stacks ("outer;...;inner").
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.samples[';'.join(reversed(labels))] += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self):
+        """
+        Functions with the most samples on top of the stack (self time), then in the stack
+        at all (total time).
+        """
+        total = sum(self.samples.values())
+        if not total:
+            return "No samples (the request finished within one sampling interval)."
+        leaf, inclusive = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            leaf[frames[-1]] += count
+            for label in set(frames):
+                inclusive[label] += count
+        lines = [f"{total} samples every {self.interval * 1000:g} ms", '', 'self%   function']
+        lines += [f"{count / total:6.1%}  {label}" for label, count in leaf.most_common(SUMMARY_LINES // 2)]
+        lines += ['', 'total%  function']
+        lines += [f"{count / total:6.1%}  {label}" for label, count in inclusive.most_common(SUMMARY_LINES // 2)]
+        return '\n'.join(lines)
+
+
+class RequestProfiler:
+    """
+    Profiles the calling thread between start() and stop() in one of MODES.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._profiler = None
+        self._sampler = None
+
+    def start(self):
+        if self.mode == RequestProfile.SAMPLING:
+            self._sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+            self._sampler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        if self._sampler is not None:
+            self._sampler.stop()
+        else:
+            self._profiler.disable()
+
+    def result(self):
+        """
+        (data bytes, text summary)
+        """
+        if self._sampler is not None:
+            return self._sampler.collapsed().encode('utf-8'), self._sampler.summary()
+        self._profiler.create_stats()
+        stream = io.StringIO()
+        pstats.Stats(self._profiler, stream=stream).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        # Same format as Profile.dump_stats(), so the download opens with pstats
+        return marshal.dumps(self._profiler.stats), stream.getvalue()
+
+
+def _recorded_path(request):
+    # Without the token itself
+    query = request.GET.copy()
+    query.pop(QUERY_PARAM, None)
+    return f"{request.path}?{query.urlencode()}" if query else request.path
+
+
+def save_profile(request, response, profiler, issued_by, duration):
+    """
+    Store the profile of a finished request and drop the oldest beyond PROFILING_MAX_STORED.
+    Returns the RequestProfile, or None if it could not be stored.
+    """
+    try:
+        data, summary = profiler.result()
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=_recorded_path(request)[:2048],
+            mode=profiler.mode,
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            issued_by=issued_by[:150],
+            summary=summary,
+            data=data,
+        )
+        stale = RequestProfile.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[settings.PROFILING_MAX_STORED:]
+        RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    except Exception as e:
+        logger.error("[save_profile] Could not store the profile of %s: %s", request.path, e)
+        return None
+    PROFILED_REQUESTS.inc(mode=profiler.mode)
+    return profile
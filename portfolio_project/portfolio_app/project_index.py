@@ -0,0 +1,178 @@
+# portfolio_project/portfolio_app/project_index.py
+"""
+Keeps Project records in the Pinecone index used by the codegen RAG pipeline.
+Each project is indexed as one vector per field (project-<id>-<field>). Saving or deleting a
+project (see signals.py) only queues its id; a background thread drains the queue in
+batches after a short delay, re-embeds just the fields whose content hash differs from
+Project.index_hashes, and deletes the vectors of deleted projects. `manage.py
+reconcile_project_index` compares the index itself with the database and repairs drift.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .ingestion import content_hash
+from .models import Project
+from .resilience import call_upstream
+
+logger = logging.getLogger(__name__)
+
+VECTOR_ID_PREFIX = 'project-'
+INDEXED_FIELDS = ('description', 'technologies')
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending_index = set()
+_pending_delete = set()
+_pending_lock = threading.Lock()
+_flush_scheduled = False
+
+
+def vector_id(project_id, field):
+    return f"{VECTOR_ID_PREFIX}{project_id}-{field}"
+
+
+def project_documents(project):
+    """
+    {field: text} for the indexed fields of a project (empty fields are left out).
+    """
+    documents = {}
+    if project.description:
+        documents['description'] = f"Portfolio project \"{project.title}\": {project.description}"
+    technologies = project.technologies_text
+    if technologies:
+        documents['technologies'] = f"Portfolio project \"{project.title}\" uses these technologies: {technologies}"
+    return documents
+
+
+def _metadata(project, field, text, digest):
+    return {'text': text, 'source': 'project', 'project_id': project.pk, 'field': field, 'content_hash': digest}
+
+
+def index_projects(projects, index):
+    """
+    Embed and upsert the fields of the given projects whose text no longer matches
+    Project.index_hashes, in one batch, then record the new hashes. Fields that became
+    empty have their vectors deleted. Returns the number of vectors upserted.
+    """
+    from .rag_pipeline import embed_texts
+
+    to_embed = []      # (project, field, text, digest)
+    stale_ids = []
+    new_hashes = {}
+    for project in projects:
+        documents = project_documents(project)
+        stored = project.index_hashes or {}
+        hashes = {}
+        for field, text in documents.items():
+            digest = content_hash(text)
+            hashes[field] = digest
+            if stored.get(field) != digest:
+                to_embed.append((project, field, text, digest))
+        stale_ids.extend(vector_id(project.pk, field) for field in stored if field not in documents)
+        if hashes != stored:
+            new_hashes[project.pk] = hashes
+
+    if to_embed:
+        vectors = embed_texts([text for _, _, text, _ in to_embed])
+        call_upstream('pinecone', index.upsert, vectors=[
+            (vector_id(project.pk, field), values, _metadata(project, field, text, digest))
+            for (project, field, text, digest), values in zip(to_embed, vectors)
+        ], bulkhead='pinecone_batch')
+    if stale_ids:
+        call_upstream('pinecone', index.delete, ids=stale_ids, bulkhead='pinecone_batch')
+    # Queryset update: no post_save signal, so this does not queue the project again
+    for project_id, hashes in new_hashes.items():
+        Project.objects.filter(pk=project_id).update(index_hashes=hashes)
+    return len(to_embed)
+
+
+def delete_project_vectors(project_ids, index):
+    ids = [vector_id(project_id, field) for project_id in project_ids for field in INDEXED_FIELDS]
+    if ids:
+        call_upstream('pinecone', index.delete, ids=ids, bulkhead='pinecone_batch')
+
+
+# --- Background queue ---
+def auto_index_enabled():
+    return settings.PROJECT_INDEX_ENABLED and bool(settings.PINECONE_API_KEY)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # One thread: batches are applied in order
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='project-index')
+    return _executor
+
+
+def _schedule_flush():
+    global _flush_scheduled
+    with _pending_lock:
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+    _get_executor().submit(_flush)
+
+
+def _flush():
+    global _flush_scheduled
+    from .rag_pipeline import get_pinecone_index
+
+    # Let a burst of saves (bulk admin edits, imports) collect into one batch
+    time.sleep(settings.PROJECT_INDEX_DELAY_SECONDS)
+    with _pending_lock:
+        to_index = set(_pending_index)
+        to_delete = set(_pending_delete)
+        _pending_index.clear()
+        _pending_delete.clear()
+        _flush_scheduled = False
+    try:
+        index = get_pinecone_index()
+        if to_delete:
+            delete_project_vectors(sorted(to_delete), index)
+        if to_index:
+            upserted = index_projects(Project.objects.filter(pk__in=to_index).prefetch_related('technologies'), index)
+            logger.info("[project_index] Indexed %d projects (%d vectors upserted)", len(to_index), upserted)
+    except Exception as e:
+        # Hashes were not updated for the failed batch; the next save or a reconcile run repairs it
+        logger.error("[project_index] Failed to sync %d projects: %s", len(to_index) + len(to_delete), e)
+    finally:
+        close_old_connections()
+
+
+def schedule_project_index(project_id):
+    if not auto_index_enabled():
+        return
+    with _pending_lock:
+        _pending_index.add(project_id)
+        _pending_delete.discard(project_id)
+    _schedule_flush()
+
+
+def schedule_project_delete(project_id):
+    if not auto_index_enabled():
+        return
+    with _pending_lock:
+        _pending_delete.add(project_id)
+        _pending_index.discard(project_id)
+    _schedule_flush()
+
+
+def reset_project_index_queue():
+    """
+    Forget the background thread and queued work (threads do not survive fork()).
+    """
+    global _executor, _executor_lock, _pending_lock, _flush_scheduled
+    _executor = None
+    _executor_lock = threading.Lock()
+    _pending_index.clear()
+    _pending_delete.clear()
+    _pending_lock = threading.Lock()
+    _flush_scheduled = False
@@ -0,0 +1,94 @@
+# portfolio_project/portfolio_app/purge.py
+"""
+Removal of deleted conversations.
+Deleting a conversation only sets Conversation.deleted_at, which hides it from every
+endpoint at once. The rows are removed by purge_conversation(): messages first, in raw
+DELETE statements of at most CONVERSATION_PURGE_BATCH_SIZE rows, each its own short
+transaction, then the conversation row itself (and its archive). This keeps Django's cascade
+collector from loading thousands of messages into memory and avoids one long-running DELETE.
+
+The delete view queues the purge on a background thread; `manage.py purge_conversations`
+purges anything left soft-deleted (e.g. by a worker restart) and applies retention by age.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _batch_delete_sql():
+    quote = connection.ops.quote_name
+    table = quote(Message._meta.db_table)
+    pk = quote(Message._meta.pk.column)
+    fk = quote(Message._meta.get_field('conversation').column)
+    return f"DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM {table} WHERE {fk} = %s LIMIT %s)"
+
+
+def purge_conversation(conversation_id, batch_size=None, pause_seconds=None):
+    """
+    Delete a soft-deleted conversation: its messages in bounded batches, then the row.
+    Returns the number of messages deleted. Conversations not marked deleted are left alone.
+    """
+    batch_size = batch_size or settings.CONVERSATION_PURGE_BATCH_SIZE
+    pause_seconds = settings.CONVERSATION_PURGE_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    if not Conversation.objects.filter(pk=conversation_id, deleted_at__isnull=False).exists():
+        return 0
+    sql = _batch_delete_sql()
+    deleted = 0
+    while True:
+        # Autocommit: every batch is its own transaction, so row locks are held only briefly
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [conversation_id, batch_size])
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            break
+        if pause_seconds:
+            time.sleep(pause_seconds)  # let other writers in between batches
+    # Only the conversation, its archive and any stragglers (late write-behind messages) remain
+    Conversation.objects.filter(pk=conversation_id, deleted_at__isnull=False).delete()
+    return deleted
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # One thread: purges of large conversations never compete with each other
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='conversation-purge')
+    return _executor
+
+
+def _run_purge(conversation_id):
+    try:
+        deleted = purge_conversation(conversation_id)
+        logger.info("[purge_conversation] Conversation %s purged (%d messages)", conversation_id, deleted)
+    except Exception as e:
+        # Still soft-deleted, so still hidden; `manage.py purge_conversations` finishes the job
+        logger.error("[purge_conversation] Conversation %s: %s", conversation_id, e)
+    finally:
+        close_old_connections()
+
+
+def schedule_conversation_purge(conversation_id):
+    _get_executor().submit(_run_purge, conversation_id)
+
+
+def reset_purge_executor():
+    """
+    Forget the background thread inherited from a preloading master (threads do not survive fork()).
+    """
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
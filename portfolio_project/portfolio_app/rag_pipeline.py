@@ -3,25 +3,54 @@
 """
 RAG pipeline logic for code generation assistant.
 Handles embedding, Pinecone retrieval, prompt augmentation, and LLM inference.
+The a-prefixed functions are async equivalents used by the ASGI views.
 """
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+import hashlib
 import logging
 import re
-from pysafebrowsing  import SafeBrowsing
-from bs4 import BeautifulSoup
+import threading
 
-# You may need to install pinecone-client and huggingface_hub if not already present
-import pinecone
-from huggingface_hub import InferenceClient
-from transformers import AutoTokenizer
+# pinecone, huggingface_hub, transformers, bs4 and pysafebrowsing are imported inside the
+# functions that use them: they take seconds to import, and most workers/endpoints
+# (health check, projects, conversations) never need them. See warmup.py for preloading.
+
+from .fast_path import classify_input
+from .metrics import span
+from .resilience import call_upstream, acall_upstream, get_deadline, UpstreamError
+from .tiered_cache import CacheNamespace
+
+logger = logging.getLogger(__name__)
 
 pinecone_api_key = settings.PINECONE_API_KEY
 pinecone_index_name = getattr(settings, 'PINECONE_INDEX', 'codegen-demo')  # Default index name if not set
 
+# Use a 768-dim model for Pinecone index compatibility
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+CODEGEN_MODEL = "mistralai/Mistral-7B-Instruct-v0.3"
+CODEGEN_GENERATION_PARAMETERS = {
+    "max_tokens": 400,
+    "temperature": 0.7,
+    "top_p": 0.9,
+}
+
+# Optional overrides so the pipeline can target self-hosted or local stand-in services
+hf_inference_base_url = getattr(settings, 'HF_INFERENCE_BASE_URL', None)
+pinecone_controller_host = getattr(settings, 'PINECONE_CONTROLLER_HOST', None)
+pinecone_index_host = getattr(settings, 'PINECONE_HOST', None)
+
 # Initialize Pinecone client (singleton pattern)
 _pinecone_initialized = False
 _index = None
+# Data-plane host resolved on first connect; kept across reset_pinecone_index() so a
+# forked worker reconnects without going back to the control plane
+_resolved_index_host = None
+
+# Tokenizers are loaded once per process (per model) instead of on every count_tokens() call
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
 
 # --- RAG Fallback Utility ---
 def enforce_rag_fallback(generated_code, all_context_chunks, user_input):
@@ -37,13 +66,8 @@ def enforce_rag_fallback(generated_code, all_context_chunks, user_input):
     ):
         context_is_empty = True
 
-    # Greeting detection (simple)
-    GREETING_KEYWORDS = [
-        'hello', 'hi', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening',
-        'how are you', "what's up", 'sup', 'yo', 'hola', 'saludos', 'buenos dias', 'buenas tardes', 'buenas noches'
-    ]
-    user_input_lower = (user_input or '').strip().lower()
-    is_greeting = any(kw in user_input_lower for kw in GREETING_KEYWORDS)
+    # Greeting detection (pure greetings normally never get here: see fast_path.py)
+    is_greeting = classify_input(user_input) == 'greeting'
 
 
 
@@ -51,47 +75,147 @@ def enforce_rag_fallback(generated_code, all_context_chunks, user_input):
     return generated_code
 
 def get_pinecone_index():
-    global _pinecone_initialized, _index
-    pc = pinecone.Pinecone(api_key=pinecone_api_key)
-    indexes = [idx['name'] for idx in pc.list_indexes()]
+    global _pinecone_initialized, _index, _resolved_index_host
     if not _pinecone_initialized:
-        # Use new Pinecone class API
-        pc = pinecone.Pinecone(api_key=pinecone_api_key)
-        # Check if index exists and is healthy
-        indexes = [idx['name'] for idx in pc.list_indexes()]
-        if pinecone_index_name not in indexes:
-            raise RuntimeError(f"Pinecone index '{pinecone_index_name}' does not exist. Available: {indexes}")
-        _index = pc.Index(pinecone_index_name)
-        # Optionally, check index status/health
-        try:
-            _index.describe_index_stats()
-        except Exception as e:
-            raise RuntimeError(f"Could not connect to Pinecone index '{pinecone_index_name}': {e}")
-        _pinecone_initialized = True
+        import pinecone
+        with span('pinecone_connect'):
+            # Use new Pinecone class API
+            if pinecone_controller_host:
+                pc = pinecone.Pinecone(api_key=pinecone_api_key, host=pinecone_controller_host)
+            else:
+                pc = pinecone.Pinecone(api_key=pinecone_api_key)
+            if _resolved_index_host:
+                # Already verified by this process (or the preloading master) before a reset
+                _index = pc.Index(pinecone_index_name, host=_resolved_index_host)
+            else:
+                # Check if index exists and is healthy
+                indexes = [idx['name'] for idx in call_upstream('pinecone', pc.list_indexes)]
+                if pinecone_index_name not in indexes:
+                    raise RuntimeError(f"Pinecone index '{pinecone_index_name}' does not exist. Available: {indexes}")
+                # A known index host skips the describe_index lookup
+                if pinecone_index_host:
+                    index_host = pinecone_index_host
+                else:
+                    index_host = call_upstream('pinecone', pc.describe_index, pinecone_index_name)['host']
+                _index = pc.Index(pinecone_index_name, host=index_host)
+                # Optionally, check index status/health
+                try:
+                    call_upstream('pinecone', _index.describe_index_stats)
+                except Exception as e:
+                    raise RuntimeError(f"Could not connect to Pinecone index '{pinecone_index_name}': {e}")
+                _resolved_index_host = index_host
+            _pinecone_initialized = True
     return _index
 
+def reset_pinecone_index():
+    """
+    Drop the index handle (e.g. after a fork, since its connection pool must not be shared
+    between processes). The resolved host is kept, so reconnecting is a local operation.
+    """
+    global _pinecone_initialized, _index
+    _pinecone_initialized = False
+    _index = None
+
+def hf_model_target(model_id):
+    """
+    Model argument for InferenceClient: the plain model id, or a full URL when
+    HF_INFERENCE_BASE_URL points at a self-hosted or local inference server.
+    """
+    if hf_inference_base_url:
+        return f"{hf_inference_base_url.rstrip('/')}/models/{model_id}"
+    return model_id
+
 # --- Embedding ---
+# Shared across workers (tiered_cache.py): repeated questions skip the embedding call
+EMBEDDING_CACHE = CacheNamespace('embeddings', timeout=settings.EMBEDDING_CACHE_SECONDS)
+
+def _embedding_cache_key(text):
+    return f"{EMBEDDING_MODEL}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+def _as_vector(embedding):
+    emb = embedding[0] if isinstance(embedding, list) and len(embedding) > 0 else embedding
+    if hasattr(emb, 'tolist'):
+        emb = emb.tolist()
+    return emb
+
+def _embed_text_uncached(text):
+    from huggingface_hub import InferenceClient
+    hf_api_token = settings.HF_API_TOKEN
+    client = InferenceClient(token=hf_api_token, timeout=get_deadline('hf_embedding'))
+    try:
+        # Embedding is idempotent, so a slow attempt may be hedged
+        with span('embed'):
+            embedding = call_upstream(
+                'hf_embedding',
+                client.feature_extraction,
+                text,
+                model=hf_model_target(EMBEDDING_MODEL),
+                hedge=True,
+            )
+        return _as_vector(embedding)
+    except UpstreamError:
+        raise
+    except Exception as e:
+        logger.error("[embed_text] Hugging Face InferenceClient error: %s", e)
+        raise RuntimeError(f"Failed to embed text: {e}")
+
 def embed_text(text):
     """
-    Embed text using Hugging Face InferenceClient feature_extraction.
+    Embed text using Hugging Face InferenceClient feature_extraction (cached).
     Returns embedding vector (list of floats).
     """
-    hf_api_token = settings.HF_API_TOKEN
-    # Use a 768-dim model for Pinecone index compatibility
-    embedding_model = "sentence-transformers/all-mpnet-base-v2"
-    client = InferenceClient(token=hf_api_token)
-    try:
-        embedding = client.feature_extraction(
-            text,
-            model=embedding_model,
+    return EMBEDDING_CACHE.get_or_set(_embedding_cache_key(text), lambda: _embed_text_uncached(text))
+
+def embed_texts(texts):
+    """
+    Embed a batch of texts in one feature_extraction request (used by ingestion and the
+    project index, so it takes the batch embedding bulkhead).
+    Returns one embedding vector per text, in order.
+    """
+    from huggingface_hub import InferenceClient
+    client = InferenceClient(token=settings.HF_API_TOKEN, timeout=get_deadline('hf_embedding'))
+    with span('embed_batch'):
+        # The API accepts a list of inputs and returns a (len(texts), dim) matrix
+        embeddings = call_upstream(
+            'hf_embedding',
+            client.feature_extraction,
+            list(texts),
+            model=hf_model_target(EMBEDDING_MODEL),
+            bulkhead='hf_embedding_batch',
         )
-        emb = embedding[0] if isinstance(embedding, list) and len(embedding) > 0 else embedding
-        if hasattr(emb, 'tolist'):
-            emb = emb.tolist()
-        return emb
+    vectors = embeddings.tolist() if hasattr(embeddings, 'tolist') else list(embeddings)
+    if len(vectors) != len(texts):
+        raise RuntimeError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+    return vectors
+
+async def aembed_text(text):
+    """
+    Async embed_text() using AsyncInferenceClient.
+    """
+    cache_key = _embedding_cache_key(text)
+    # The cache does file/network I/O, so it runs off the event loop
+    cached = await sync_to_async(EMBEDDING_CACHE.get, thread_sensitive=False)(cache_key)
+    if cached is not None:
+        return cached
+    from huggingface_hub import AsyncInferenceClient
+    try:
+        async with AsyncInferenceClient(token=settings.HF_API_TOKEN, timeout=get_deadline('hf_embedding')) as client:
+            with span('embed'):
+                embedding = await acall_upstream(
+                    'hf_embedding',
+                    client.feature_extraction,
+                    text,
+                    model=hf_model_target(EMBEDDING_MODEL),
+                    hedge=True,
+                )
+        vector = _as_vector(embedding)
+    except UpstreamError:
+        raise
     except Exception as e:
-        logging.error(f"[embed_text] Hugging Face InferenceClient error: {e}")
+        logger.error("[aembed_text] Hugging Face AsyncInferenceClient error: %s", e)
         raise RuntimeError(f"Failed to embed text: {e}")
+    await sync_to_async(EMBEDDING_CACHE.set, thread_sensitive=False)(cache_key, vector)
+    return vector
 
 # --- Pinecone Retrieval ---
 def query_pinecone(embedding, top_k=3):
@@ -101,17 +225,57 @@ def query_pinecone(embedding, top_k=3):
     try:
         index = get_pinecone_index()
         namespace = ""
-        query_response = index.query(vector=embedding, top_k=top_k, include_metadata=True, namespace=namespace)
-        results = []
-        for match in query_response.get('matches', []):
-            text = match['metadata'].get('text', '')
-            metadata = match['metadata']
-            results.append({"text": text, "metadata": metadata})
-        return results
+        with span('retrieve'):
+            query_response = call_upstream(
+                'pinecone',
+                index.query,
+                vector=embedding,
+                top_k=top_k,
+                include_metadata=True,
+                namespace=namespace,
+                hedge=True,
+            )
+        return _matches_to_chunks(query_response)
+    except UpstreamError:
+        raise
     except Exception as e:
-        logging.error(f"[query_pinecone] Pinecone query error: {e}")
+        logger.error("[query_pinecone] Pinecone query error: %s", e)
         raise RuntimeError(f"Failed to query Pinecone: {e}")
 
+async def aquery_pinecone(embedding, top_k=3):
+    """
+    Async query_pinecone(). pinecone-client has no asyncio API, so the query runs on the
+    upstream thread pool while the event loop keeps serving other requests.
+    """
+    from asgiref.sync import sync_to_async
+    try:
+        index = _index if _pinecone_initialized else await sync_to_async(get_pinecone_index, thread_sensitive=False)()
+        with span('retrieve'):
+            query_response = await acall_upstream(
+                'pinecone',
+                index.query,
+                vector=embedding,
+                top_k=top_k,
+                include_metadata=True,
+                namespace="",
+                hedge=True,
+            )
+        return _matches_to_chunks(query_response)
+    except UpstreamError:
+        raise
+    except Exception as e:
+        logger.error("[aquery_pinecone] Pinecone query error: %s", e)
+        raise RuntimeError(f"Failed to query Pinecone: {e}")
+
+def _matches_to_chunks(query_response):
+    results = []
+    for match in query_response.get('matches', []):
+        text = match['metadata'].get('text', '')
+        metadata = match['metadata']
+        # The similarity score drives relevance ranking in context_packing.pack_context()
+        results.append({"text": text, "metadata": metadata, "score": match.get('score')})
+    return results
+
 # --- Prompt Augmentation ---
 def build_augmented_prompt(conversation_history, retrieved_chunks, user_input):
     """
@@ -131,14 +295,16 @@ def build_augmented_prompt(conversation_history, retrieved_chunks, user_input):
     if not context.strip():
         context = "There is no relevant additional context for this question"
     # Add clear delimiters to the context section (use non-Markdown symbols)
-    print("\n[DEBUG] ===== Conversation History Start =====")
-    for i, msg in enumerate(conversation_history):
-        print(f"[DEBUG] [{i}] {msg['role']}: {msg['content']}")
-    print("[DEBUG] ===== Conversation History End =====\n")
-    print(f"[DEBUG] User input: {user_input}")
+    # Arguments are only formatted (and truncated) by the log listener if DEBUG is enabled
+    logger.debug("[build_augmented_prompt] Conversation history (%d messages): %s", len(conversation_history), conversation_history)
+    logger.debug("[build_augmented_prompt] User input: %s", user_input)
     # Build a structured messages list for chat-based LLMs
     # First message: system with context
     system_message = f"{system_instruction}\n{context}"
+    # A rolling summary (see summaries.py) stands in for the older turns it covers
+    summary = "\n".join(msg['content'] for msg in conversation_history if msg['role'] == 'summary')
+    if summary:
+        system_message += f"\n\nSummary of the earlier conversation:\n{summary}"
     messages = [
         {"role": "system", "content": system_message}
     ]
@@ -150,7 +316,7 @@ def build_augmented_prompt(conversation_history, retrieved_chunks, user_input):
             messages.append({"role": "assistant", "content": msg['content']})
     # Add the current user input as the last user message
     messages.append({"role": "user", "content": user_input})
-    print("[DEBUG] LLM Messages:", messages)
+    logger.debug("[build_augmented_prompt] LLM messages: %s", messages)
     return messages
 
 # --- LLM Inference ---
@@ -158,23 +324,40 @@ def call_codegen_llm(prompt):
     """
     Call the codegen LLM (e.g., Mistral) via Hugging Face Inference API.
     """
-    hf_model_id = "mistralai/Mistral-7B-Instruct-v0.3"
+    from huggingface_hub import InferenceClient
     hf_api_token = settings.HF_API_TOKEN
-    inference_client = InferenceClient(model=hf_model_id, token=hf_api_token)
+    inference_client = InferenceClient(model=hf_model_target(CODEGEN_MODEL), token=hf_api_token, timeout=get_deadline('hf_llm'))
     # Here, prompt is now a list of messages (system, user, assistant, ...)
     messages = prompt
-    generation_parameters = {
-        "max_tokens": 400,
-        "temperature": 0.7,
-        "top_p": 0.9,
-    }
-    chat_completion_response = inference_client.chat_completion(
-        messages=messages,
-        **generation_parameters
-    )
+    with span('llm'):
+        chat_completion_response = call_upstream(
+            'hf_llm',
+            inference_client.chat_completion,
+            messages=messages,
+            **CODEGEN_GENERATION_PARAMETERS
+        )
+    return _clean_completion(chat_completion_response)
+
+async def acall_codegen_llm(prompt):
+    """
+    Async call_codegen_llm() using AsyncInferenceClient.
+    """
+    from huggingface_hub import AsyncInferenceClient
+    async with AsyncInferenceClient(
+        model=hf_model_target(CODEGEN_MODEL), token=settings.HF_API_TOKEN, timeout=get_deadline('hf_llm'),
+    ) as inference_client:
+        with span('llm'):
+            chat_completion_response = await acall_upstream(
+                'hf_llm',
+                inference_client.chat_completion,
+                messages=prompt,
+                **CODEGEN_GENERATION_PARAMETERS
+            )
+    return _clean_completion(chat_completion_response)
+
+def _clean_completion(chat_completion_response):
     generated_code = chat_completion_response.choices[0].message.content if chat_completion_response.choices else "No response generated."
     # Aggressive post-processing: remove leading Markdown headings (e.g., lines starting with #, ##, etc.)
-    import re
     lines = generated_code.splitlines()
     # Remove all leading lines that are only Markdown headings
     while lines and re.match(r'^\s*#+\s', lines[0]):
@@ -183,50 +366,72 @@ def call_codegen_llm(prompt):
     while lines and not lines[0].strip():
         lines.pop(0)
     generated_code = '\n'.join(lines)
-    print(f"[DEBUG] Generated code: {generated_code}")
+    logger.debug("[call_codegen_llm] Generated code: %s", generated_code)
     return generated_code
 
+def get_tokenizer(model_name="mistralai/Mistral-7B-Instruct-v0.3"):
+    """
+    Return the (process-wide, lazily loaded) tokenizer for model_name.
+    Passes Hugging Face API token if available for gated models.
+    """
+    tokenizer = _tokenizers.get(model_name)
+    if tokenizer is None:
+        with _tokenizers_lock:
+            tokenizer = _tokenizers.get(model_name)
+            if tokenizer is None:
+                from transformers import AutoTokenizer
+                hf_api_token = getattr(settings, 'HF_API_TOKEN', None)
+                with span('tokenizer_load'):
+                    if hf_api_token:
+                        tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_api_token)
+                    else:
+                        tokenizer = AutoTokenizer.from_pretrained(model_name)
+                _tokenizers[model_name] = tokenizer
+    return tokenizer
+
 def count_tokens(text, model_name="mistralai/Mistral-7B-Instruct-v0.3"):
     """
     Count the number of tokens in a text string using the specified model's tokenizer.
-    Passes Hugging Face API token if available for gated models.
     """
     try:
-        hf_api_token = getattr(settings, 'HF_API_TOKEN', None)
-        if hf_api_token:
-            tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_api_token)
-        else:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-        tokens = tokenizer.encode(text, add_special_tokens=False)
+        tokenizer = get_tokenizer(model_name)
+        with span('tokenize'):
+            tokens = tokenizer.encode(text, add_special_tokens=False)
         return len(tokens)
     except Exception as e:
-        logging.error(f"[count_tokens] Token counting error: {e}")
+        logger.error("[count_tokens] Token counting error: %s", e)
         return -1
 
 def trim_conversation_history_to_fit_tokens(conversation_history, retrieved_chunks, user_input, max_tokens=8192, model_name="mistralai/Mistral-7B-Instruct-v0.3"):
     """
     Trims the conversation history so that the full prompt fits within max_tokens.
-    Removes oldest messages first.
+    Removes oldest messages first; the conversation summary (if any) is always kept.
     """
-    trimmed_history = conversation_history[:]
+    summary = [msg for msg in conversation_history if msg['role'] == 'summary']
+    trimmed_history = [msg for msg in conversation_history if msg['role'] != 'summary']
     while True:
-        prompt = build_augmented_prompt(trimmed_history, retrieved_chunks, user_input)
+        prompt = build_augmented_prompt(summary + trimmed_history, retrieved_chunks, user_input)
         num_tokens = count_tokens(prompt, model_name=model_name)
         if num_tokens <= max_tokens or not trimmed_history:
             break
         trimmed_history = trimmed_history[1:]  # Remove oldest message
-    return trimmed_history
+    return summary + trimmed_history
 
 # --- Summarization ---
+def _post_summarization(url, headers, payload, timeout):
+    # HTTP errors are raised inside the upstream call, so 5xx/429 count against the breaker
+    response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
 def summarize_text_with_pegasus(text, min_length=20, max_length=60):
-    system_instruction += "Do NOT use Markdown headings (lines starting with #, ##, etc.) in your response."
     """
     Summarize text using the Pegasus-XSum model via Hugging Face Inference API.
-    Returns the summary string.
+    Returns the summary string, or None if summarization failed.
     """
     hf_api_token = settings.HF_API_TOKEN
     summarization_model = "google/pegasus-xsum"
-    url = f"https://api-inference.huggingface.co/models/{summarization_model}"
+    url = f"{(hf_inference_base_url or 'https://api-inference.huggingface.co').rstrip('/')}/models/{summarization_model}"
     headers = {"Authorization": f"Bearer {hf_api_token}"}
     payload = {
         "inputs": text,
@@ -234,18 +439,19 @@ def summarize_text_with_pegasus(text, min_length=20, max_length=60):
         "options": {"wait_for_model": True}
     }
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
-        print(f"[DEBUG] Pegasus summarization raw output: {result}")
+        with span('summarize'):
+            result = call_upstream(
+                'hf_summarization', _post_summarization, url, headers, payload, get_deadline('hf_summarization'),
+            )
+        logger.debug("[summarize_text_with_pegasus] Raw output: %s", result)
         if isinstance(result, list) and len(result) > 0 and 'summary_text' in result[0]:
             return result[0]['summary_text']
         else:
-            logging.warning(f"[summarize_text_with_pegasus] Unexpected response: {result}")
-            return "[Summary unavailable]"
+            logger.warning("[summarize_text_with_pegasus] Unexpected response: %s", result)
+            return None
     except Exception as e:
-        logging.error(f"[summarize_text_with_pegasus] Summarization error: {e}")
-        return "[Summary error]"
+        logger.error("[summarize_text_with_pegasus] Summarization error: %s", e)
+        return None
 
 def extract_urls(text):
     """
@@ -256,6 +462,26 @@ def extract_urls(text):
 
 # Use the Google Safe Browsing API key from Django settings
 safe_browsing_api_key = getattr(settings, 'GOOGLE_SAFE_BROWSING_API_KEY', None)
+safe_browsing_api_url = getattr(settings, 'GOOGLE_SAFE_BROWSING_API_URL', None)
+
+
+# Verdicts and page text are shared across workers (tiered_cache.py); only successful
+# lookups and fetches are cached, so errors are retried on the next request
+URL_SAFETY_CACHE = CacheNamespace('url_safety', timeout=settings.URL_SAFETY_CACHE_SECONDS)
+URL_CONTENT_CACHE = CacheNamespace('url_content', timeout=settings.URL_CONTENT_CACHE_SECONDS)
+
+
+def _lookup_url_safety(url, api_key):
+    from pysafebrowsing import SafeBrowsing
+    if safe_browsing_api_url:
+        s = SafeBrowsing(api_key, api_url=safe_browsing_api_url)
+    else:
+        s = SafeBrowsing(api_key)
+    # pysafebrowsing expects a list of URLs (as str)
+    with span('safebrowsing'):
+        result = call_upstream('safebrowsing', s.lookup_urls, [url], hedge=True)
+    # result[url] is a dict, 'malicious' is True if unsafe
+    return not result.get(url, {}).get('malicious', True)
 
 
 def is_url_safe(url, api_key=None):
@@ -266,21 +492,29 @@ def is_url_safe(url, api_key=None):
     if api_key is None:
         api_key = safe_browsing_api_key
     try:
-        s = SafeBrowsing(api_key)
-        # pysafebrowsing expects a list of URLs (as str)
-        result = s.lookup_urls([url])
-        # result[url] is a dict, 'malicious' is True if unsafe
-        return not result.get(url, {}).get('malicious', True)
+        return URL_SAFETY_CACHE.get_or_set(url, lambda: _lookup_url_safety(url, api_key))
     except Exception as e:
-        logging.error(f"[is_url_safe] Error checking URL: {e}")
+        logger.error("[is_url_safe] Error checking URL: %s", e)
         return False  # Be safe by default
 
 
+def _fetch_url_text(url, timeout):
+    with span('url_fetch'):
+        resp = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+        resp.raise_for_status()
+    with span('html_parse'):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(resp.text, 'lxml')
+        for tag in soup(['script', 'style']):
+            tag.decompose()
+        return soup.get_text(separator=' ', strip=True)
 
-def fetch_and_clean_url_content(url, api_key=None, timeout=10):
+
+def fetch_and_clean_url_content(url, api_key=None, timeout=10, use_cache=True):
     """
     Check URL safety, fetch the page, and extract visible text.
-    Returns cleaned text or None if unsafe/error.
+    Returns cleaned text or None if unsafe/error. use_cache=False always fetches the
+    page again (ingestion wants the current content).
     """
     if api_key is None:
         api_key = safe_browsing_api_key
@@ -288,17 +522,13 @@ def fetch_and_clean_url_content(url, api_key=None, timeout=10):
         return None
     # Check URL safety using pysafebrowsing
     if not is_url_safe(url, api_key):
-        logging.warning(f"[fetch_and_clean_url_content] Unsafe URL blocked: {url}")
+        logger.warning("[fetch_and_clean_url_content] Unsafe URL blocked: %s", url)
         return None
     try:
-        resp = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, 'lxml')
-        for tag in soup(['script', 'style']):
-            tag.decompose()
-        text = soup.get_text(separator=' ', strip=True)
-        return text
+        if not use_cache:
+            return _fetch_url_text(url, timeout)
+        return URL_CONTENT_CACHE.get_or_set(url, lambda: _fetch_url_text(url, timeout))
     except Exception as e:
-        logging.error(f"[fetch_and_clean_url_content] Error fetching/parsing URL: {e}")
+        logger.error("[fetch_and_clean_url_content] Error fetching/parsing URL: %s", e)
         return None
 
@@ -0,0 +1,527 @@
+# portfolio_project/portfolio_app/resilience.py
+"""
+Resilience layer for upstream AI/API calls (Hugging Face, Pinecone, Gemini, Google).
+Every upstream call goes through call_upstream() (or acall_upstream() from async views),
+which enforces a per-dependency deadline, fails fast while the dependency's circuit breaker
+is open, limits concurrent calls per dependency (bulkheads, rejecting at once when one is
+saturated), and can optionally hedge idempotent calls (fire a second attempt if the first is
+slow and take whichever wins).
+"""
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: bulkheads are disabled
+    fcntl = None
+
+from .metrics import UPSTREAM_DURATION, UPSTREAM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(RuntimeError):
+    """
+    Base error for upstream calls rejected or abandoned by the resilience layer.
+    """
+
+    def __init__(self, dependency, message):
+        super().__init__(f"[{dependency}] {message}")
+        self.dependency = dependency
+
+
+class CircuitOpenError(UpstreamError):
+    """
+    Raised without calling the upstream while its circuit breaker is open.
+    """
+
+    def __init__(self, dependency, retry_after):
+        super().__init__(dependency, f"circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class UpstreamTimeoutError(UpstreamError):
+    """
+    Raised when an upstream call does not finish within its deadline.
+    """
+
+
+class BulkheadFullError(UpstreamError):
+    """
+    Raised without calling the upstream when its bulkhead has no free slot and no room (or
+    no time left) in its queue.
+    """
+
+    def __init__(self, dependency, retry_after):
+        super().__init__(dependency, "too many concurrent calls")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. CLOSED counts consecutive failures; after
+    failure_threshold it goes OPEN and rejects calls for reset_timeout seconds;
+    then HALF_OPEN lets a single probe through, which closes or re-opens it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, dependency, failure_threshold=5, reset_timeout=30.0):
+        self.dependency = dependency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        """
+        Return True if a call may proceed right now.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # HALF_OPEN: only one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit for %s closed", self.dependency)
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit for %s opened after %d failure(s)", self.dependency, self._failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def abandon(self):
+        """
+        A call ended without an outcome (e.g. the client disconnected and the task was
+        cancelled): free the half-open probe slot without counting success or failure.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class BulkheadSlot:
+    """
+    A held bulkhead slot (an exclusively locked slot file). release() may be called more
+    than once; the lock also goes away with the file (garbage collection, process exit).
+    """
+
+    def __init__(self, file=None):
+        self._file = file
+
+    def release(self):
+        file, self._file = self._file, None
+        if file is not None:
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class Bulkhead:
+    """
+    Limits concurrent calls to one dependency across every worker process of the machine:
+    `limit` slot files and `queue_size` queue files in `directory`, each held with an
+    exclusive flock() that the kernel drops if the holder dies. A caller that finds no free
+    slot takes a queue file and polls for a slot for up to `queue_timeout` seconds; when the
+    queue is full too it is rejected at once.
+    """
+    POLL_SECONDS = 0.05
+
+    def __init__(self, dependency, limit, queue_size, queue_timeout, directory):
+        self.dependency = dependency
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _lock_one(self, kind, count):
+        for index in range(count):
+            file = open(os.path.join(self.directory, f"{self.dependency}.{kind}{index}"), 'ab')
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return file
+            except BlockingIOError:
+                file.close()
+        return None
+
+    def try_acquire(self):
+        file = self._lock_one('slot', self.limit)
+        return None if file is None else BulkheadSlot(file)
+
+    def _rejected(self, kind):
+        UPSTREAM_ERRORS.inc(dependency=self.dependency, kind=kind)
+        return BulkheadFullError(self.dependency, settings.BULKHEAD_RETRY_AFTER_SECONDS)
+
+    def acquire(self):
+        """
+        Return a BulkheadSlot, waiting in the queue if there is room. Raises BulkheadFullError.
+        """
+        slot = self.try_acquire()
+        if slot is not None:
+            return slot
+        ticket = self._lock_one('queue', self.queue_size)
+        if ticket is None:
+            raise self._rejected('bulkhead_full')
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.POLL_SECONDS)
+                slot = self.try_acquire()
+                if slot is not None:
+                    return slot
+        finally:
+            ticket.close()
+        raise self._rejected('bulkhead_timeout')
+
+    async def aacquire(self):
+        """
+        Async acquire(): waits in the queue without blocking the event loop.
+        """
+        slot = self.try_acquire()
+        if slot is not None:
+            return slot
+        ticket = self._lock_one('queue', self.queue_size)
+        if ticket is None:
+            raise self._rejected('bulkhead_full')
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.POLL_SECONDS)
+                slot = self.try_acquire()
+                if slot is not None:
+                    return slot
+        finally:
+            ticket.close()
+        raise self._rejected('bulkhead_timeout')
+
+
+class _Attempts:
+    """
+    Keeps a call's bulkhead slot until the caller is done and every attempt has finished:
+    an attempt abandoned at the deadline is still in flight upstream (and holds a pool
+    thread) until its client-level timeout fires.
+    """
+
+    def __init__(self, slot):
+        self._slot = slot
+        self._running = 1  # the caller
+        self._lock = threading.Lock()
+
+    def track(self, future):
+        with self._lock:
+            self._running += 1
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _=None):
+        with self._lock:
+            self._running -= 1
+            idle = self._running == 0
+        if idle:
+            self._slot.release()
+
+    def close(self):
+        self._finished()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+_bulkheads = {}
+_bulkheads_lock = threading.Lock()
+
+# Upstream calls run on this pool so the request thread can stop waiting at the deadline.
+# A call that overruns keeps its pool thread until the client-level timeout fires.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_circuit_breaker(dependency):
+    breaker = _breakers.get(dependency)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(dependency)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    dependency,
+                    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS,
+                )
+                _breakers[dependency] = breaker
+    return breaker
+
+
+def get_bulkhead(dependency):
+    """
+    The dependency's Bulkhead, or None if it is not limited (not in BULKHEAD_LIMITS,
+    BULKHEAD_ENABLED off, or no flock() on this platform).
+    """
+    limit = settings.BULKHEAD_LIMITS.get(dependency)
+    if not settings.BULKHEAD_ENABLED or fcntl is None or limit is None:
+        return None
+    bulkhead = _bulkheads.get(dependency)
+    if bulkhead is None:
+        with _bulkheads_lock:
+            bulkhead = _bulkheads.get(dependency)
+            if bulkhead is None:
+                bulkhead = Bulkhead(
+                    dependency,
+                    limit=limit,
+                    queue_size=settings.BULKHEAD_QUEUE_SIZE,
+                    queue_timeout=settings.BULKHEAD_QUEUE_TIMEOUT,
+                    directory=settings.BULKHEAD_DIR,
+                )
+                _bulkheads[dependency] = bulkhead
+    return bulkhead
+
+
+def acquire_bulkhead(dependency):
+    """
+    Take a slot of the dependency's bulkhead (a no-op slot if it is not limited).
+    Raises BulkheadFullError when it is saturated.
+    """
+    bulkhead = get_bulkhead(dependency)
+    return BulkheadSlot() if bulkhead is None else bulkhead.acquire()
+
+
+async def aacquire_bulkhead(dependency):
+    bulkhead = get_bulkhead(dependency)
+    return BulkheadSlot() if bulkhead is None else await bulkhead.aacquire()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.UPSTREAM_MAX_THREADS,
+                    thread_name_prefix='upstream',
+                )
+    return _executor
+
+
+def reset_executor():
+    """
+    Forget the upstream thread pool. Threads do not survive fork(), so a worker forked
+    from a master that already made upstream calls must build its own pool.
+    """
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+def get_deadline(dependency):
+    """
+    Deadline in seconds for one call to the dependency (also used as the client-level timeout).
+    """
+    return settings.UPSTREAM_DEADLINES.get(dependency, settings.UPSTREAM_DEFAULT_DEADLINE)
+
+
+def is_client_error(error):
+    """
+    True for an HTTP 4xx other than 429 from the upstream (requests, httpx, huggingface_hub
+    and Pinecone errors): the request was at fault (an over-long prompt, a bad token), not
+    the dependency, so it must not count against the circuit breaker.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+def _client_error(breaker, dependency, started, error):
+    # The dependency answered, so a half-open probe is freed without recording an outcome
+    breaker.abandon()
+    UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+    UPSTREAM_ERRORS.inc(dependency=dependency, kind='client_error')
+    return error
+
+
+def call_upstream(dependency, fn, *args, hedge=False, bulkhead=None, **kwargs):
+    """
+    Run fn(*args, **kwargs) against an upstream dependency with a deadline and circuit breaker.
+
+    hedge=True is only for idempotent calls: if the first attempt has not finished after the
+    dependency's hedge delay, a second attempt is started and the first successful result wins.
+
+    bulkhead names the bulkhead to take a slot from (default: the dependency's own). Batch
+    jobs use their own ('pinecone_batch', ...) so they never take the slots of live requests.
+
+    Raises CircuitOpenError, BulkheadFullError, UpstreamTimeoutError, or the upstream's own exception.
+    Timeouts, connection errors, 5xx and 429 count against the breaker; other 4xx errors
+    (is_client_error()) are raised at once without touching it.
+    """
+    breaker = get_circuit_breaker(dependency)
+    if not breaker.allow():
+        UPSTREAM_ERRORS.inc(dependency=dependency, kind='circuit_open')
+        raise CircuitOpenError(dependency, breaker.retry_after())
+    try:
+        attempts = _Attempts(acquire_bulkhead(bulkhead or dependency))
+    except BulkheadFullError:
+        breaker.abandon()
+        raise
+
+    try:
+        executor = _get_executor()
+        started = time.monotonic()
+        deadline = started + get_deadline(dependency)
+        pending = {attempts.track(executor.submit(fn, *args, **kwargs))}
+        hedge_delay = settings.UPSTREAM_HEDGE_DELAYS.get(dependency) if hedge and settings.UPSTREAM_HEDGING_ENABLED else None
+        last_error = None
+
+        if hedge_delay is not None:
+            done, pending = wait(pending, timeout=min(hedge_delay, max(0.0, deadline - time.monotonic())))
+            for future in done:
+                if future.exception() is None:
+                    breaker.record_success()
+                    UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+                    return future.result()
+                last_error = future.exception()
+                if is_client_error(last_error):
+                    raise _client_error(breaker, dependency, started, last_error)
+            if time.monotonic() < deadline:
+                logger.info("Hedging slow %s call", dependency)
+                pending.add(attempts.track(executor.submit(fn, *args, **kwargs)))
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    breaker.record_success()
+                    UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+                    return future.result()
+                last_error = future.exception()
+                if is_client_error(last_error):
+                    raise _client_error(breaker, dependency, started, last_error)
+
+        breaker.record_failure()
+        UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+        if pending:
+            UPSTREAM_ERRORS.inc(dependency=dependency, kind='timeout')
+            for future in pending:
+                future.cancel()
+            raise UpstreamTimeoutError(dependency, f"no response within {get_deadline(dependency):.1f}s")
+        UPSTREAM_ERRORS.inc(dependency=dependency, kind='error')
+        raise last_error
+    finally:
+        attempts.close()
+
+
+async def acall_upstream(dependency, fn, *args, hedge=False, bulkhead=None, **kwargs):
+    """
+    Async counterpart of call_upstream(), sharing its breakers, deadlines and metrics.
+    fn may be a coroutine function (awaited on the event loop) or a plain blocking
+    callable (run on the upstream thread pool without blocking the loop).
+
+    Raises CircuitOpenError, BulkheadFullError, UpstreamTimeoutError, or the upstream's own exception.
+    """
+    breaker = get_circuit_breaker(dependency)
+    if not breaker.allow():
+        UPSTREAM_ERRORS.inc(dependency=dependency, kind='circuit_open')
+        raise CircuitOpenError(dependency, breaker.retry_after())
+    try:
+        attempts = _Attempts(await aacquire_bulkhead(bulkhead or dependency))
+    except (BulkheadFullError, asyncio.CancelledError):
+        breaker.abandon()
+        raise
+
+    if inspect.iscoroutinefunction(fn):
+        def attempt():
+            return attempts.track(asyncio.ensure_future(fn(*args, **kwargs)))
+    else:
+        executor = _get_executor()
+
+        def attempt():
+            # Tracked on the pool future: a cancelled wrapper does not stop a running call
+            return asyncio.wrap_future(attempts.track(executor.submit(fn, *args, **kwargs)))
+
+    pending = set()
+    try:
+        started = time.monotonic()
+        deadline = started + get_deadline(dependency)
+        pending = {attempt()}
+        hedge_delay = settings.UPSTREAM_HEDGE_DELAYS.get(dependency) if hedge and settings.UPSTREAM_HEDGING_ENABLED else None
+        last_error = None
+        if hedge_delay is not None:
+            done, pending = await asyncio.wait(pending, timeout=min(hedge_delay, max(0.0, deadline - time.monotonic())))
+            for task in done:
+                if task.exception() is None:
+                    breaker.record_success()
+                    UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+                    return task.result()
+                last_error = task.exception()
+                if is_client_error(last_error):
+                    raise _client_error(breaker, dependency, started, last_error)
+            if time.monotonic() < deadline:
+                logger.info("Hedging slow %s call", dependency)
+                pending.add(attempt())
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    breaker.record_success()
+                    UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+                    return task.result()
+                last_error = task.exception()
+                if is_client_error(last_error):
+                    raise _client_error(breaker, dependency, started, last_error)
+
+        breaker.record_failure()
+        UPSTREAM_DURATION.observe(time.monotonic() - started, dependency=dependency)
+        if pending:
+            UPSTREAM_ERRORS.inc(dependency=dependency, kind='timeout')
+            raise UpstreamTimeoutError(dependency, f"no response within {get_deadline(dependency):.1f}s")
+        UPSTREAM_ERRORS.inc(dependency=dependency, kind='error')
+        raise last_error
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    finally:
+        # Losing hedges and timed-out attempts are not awaited any further
+        for task in pending:
+            task.cancel()
+        attempts.close()
@@ -0,0 +1,130 @@
+# portfolio_project/portfolio_app/search.py
+"""
+Full-text search over portfolio projects and a user's conversation messages (/api/search/).
+On PostgreSQL both tables carry a generated tsvector column (search_vector, migration
+0009) with a GIN index, so the database keeps them current on every INSERT/UPDATE and a
+search is an index lookup plus ranking of the matches. The columns are not on the Django
+models; queries here are raw SQL. Snippets (ts_headline) are computed for the returned
+page only.
+
+Other databases (SQLite in development and the benchmarks) fall back to unranked
+icontains matching, newest first.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from .models import Conversation, Message, Project
+
+# Must match the configuration the generated columns were built with (migration 0009)
+SEARCH_CONFIG = 'english'
+HEADLINE_OPTIONS = 'MaxFragments=2, MaxWords=18, MinWords=6, StartSel=<<, StopSel=>>'
+FALLBACK_SNIPPET_CHARS = 160
+
+
+def fts_available():
+    return connection.vendor == 'postgresql'
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def search_messages(google_user_id, query, limit, offset=0):
+    """
+    The user's messages matching the query, best match first (newest first without FTS).
+    Soft-deleted conversations are excluded, as are archived messages (archive.py), which
+    are no longer in the messages table.
+    """
+    if not fts_available():
+        return _fallback_messages(google_user_id, query, limit, offset)
+    message, conversation = _table(Message), _table(Conversation)
+    # The tsquery is written inline (immutable, folded to a constant) so the planner uses
+    # the GIN index; all of the user's matches are ranked in the inner query (id and rank
+    # only) and headlines are built for the returned page alone
+    sql = f"""
+        SELECT m.conversation_id, m.id AS message_id, m.sender AS role, m.created_at,
+               c.title AS conversation_title, hits.rank,
+               ts_headline(%s::regconfig, m.content, websearch_to_tsquery(%s::regconfig, %s), %s) AS snippet
+        FROM (
+            SELECT m.id, ts_rank_cd(m.search_vector, websearch_to_tsquery(%s::regconfig, %s)) AS rank
+            FROM {message} m
+            JOIN {conversation} c ON c.id = m.conversation_id
+            WHERE c.google_user_id = %s AND c.deleted_at IS NULL
+              AND m.search_vector @@ websearch_to_tsquery(%s::regconfig, %s)
+            ORDER BY rank DESC, m.id DESC
+            LIMIT %s OFFSET %s
+        ) hits
+        JOIN {message} m ON m.id = hits.id
+        JOIN {conversation} c ON c.id = m.conversation_id
+        ORDER BY hits.rank DESC, m.id DESC
+    """
+    return _fetch(sql, [
+        SEARCH_CONFIG, SEARCH_CONFIG, query, HEADLINE_OPTIONS,
+        SEARCH_CONFIG, query, google_user_id, SEARCH_CONFIG, query, limit, offset,
+    ])
+
+
+def search_projects(query, limit, offset=0):
+    """
+    Projects matching the query (title weighted above description), best match first.
+    """
+    if not fts_available():
+        return _fallback_projects(query, limit, offset)
+    project = _table(Project)
+    sql = f"""
+        SELECT p.id AS project_id, p.title, hits.rank,
+               ts_headline(%s::regconfig, p.description, websearch_to_tsquery(%s::regconfig, %s), %s) AS snippet
+        FROM (
+            SELECT p.id, ts_rank_cd(p.search_vector, websearch_to_tsquery(%s::regconfig, %s)) AS rank
+            FROM {project} p
+            WHERE p.search_vector @@ websearch_to_tsquery(%s::regconfig, %s)
+            ORDER BY rank DESC, p.id DESC
+            LIMIT %s OFFSET %s
+        ) hits
+        JOIN {project} p ON p.id = hits.id
+        ORDER BY hits.rank DESC, p.id DESC
+    """
+    return _fetch(sql, [
+        SEARCH_CONFIG, SEARCH_CONFIG, query, HEADLINE_OPTIONS,
+        SEARCH_CONFIG, query, SEARCH_CONFIG, query, limit, offset,
+    ])
+
+
+# --- Fallback without PostgreSQL ---
+def _excerpt(text, query):
+    position = text.lower().find(query.lower())
+    start = max(0, position - FALLBACK_SNIPPET_CHARS // 2) if position >= 0 else 0
+    excerpt = text[start:start + FALLBACK_SNIPPET_CHARS]
+    return ('…' if start else '') + excerpt + ('…' if start + FALLBACK_SNIPPET_CHARS < len(text) else '')
+
+
+def _fallback_messages(google_user_id, query, limit, offset):
+    rows = Message.objects.filter(
+        conversation__google_user_id=google_user_id,
+        conversation__deleted_at__isnull=True,
+        content__icontains=query,
+    ).order_by('-created_at', '-id').values_list(
+        'conversation_id', 'id', 'sender', 'created_at', 'conversation__title', 'content',
+    )[offset:offset + limit]
+    return [
+        {'conversation_id': conversation_id, 'message_id': message_id, 'role': sender, 'created_at': created_at,
+         'conversation_title': title, 'rank': None, 'snippet': _excerpt(content, query)}
+        for conversation_id, message_id, sender, created_at, title, content in rows
+    ]
+
+
+def _fallback_projects(query, limit, offset):
+    rows = Project.objects.filter(
+        Q(title__icontains=query) | Q(description__icontains=query)
+    ).order_by('-created_at', '-id').values_list('id', 'title', 'description')[offset:offset + limit]
+    return [
+        {'project_id': project_id, 'title': title, 'rank': None, 'snippet': _excerpt(description, query)}
+        for project_id, title, description in rows
+    ]
@@ -0,0 +1,129 @@
+# portfolio_project/portfolio_app/semantic_cache.py
+"""
+Semantic answer cache for the codegen endpoint.
+Stores (question embedding, retrieved-context fingerprint, answer) and returns a cached
+answer when a new question is close enough (cosine similarity) to one already answered
+with the same retrieved context and an empty or equivalent conversation history. Answers
+live in the shared cache, so they are reused across workers.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+from .tiered_cache import CacheNamespace
+
+
+def fingerprint_chunks(chunks):
+    """
+    Stable fingerprint of the retrieved context (Pinecone + URL chunks) used to build a prompt.
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.get('text', '').encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def fingerprint_history(conversation_history):
+    """
+    Fingerprint of the conversation history. Empty history always maps to the same value,
+    so fresh conversations can share answers.
+    """
+    if not conversation_history:
+        return ''
+    normalized = [(msg.get('role'), (msg.get('content') or '').strip()) for msg in conversation_history]
+    return hashlib.sha256(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return None
+    return [x / norm for x in vector]
+
+
+class SemanticCache:
+    """
+    Answers bucketed by (context fingerprint, history fingerprint) in the shared cache
+    (tiered_cache.py), so a lookup only scans candidates answered with the same context and
+    every worker reuses the answers of the others. A bucket keeps its newest max_entries
+    answers; embeddings are stored as float32 arrays.
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=32):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.namespace = CacheNamespace('semantic', timeout=ttl_seconds, stale_timeout=0)
+
+    @staticmethod
+    def _bucket(context_fingerprint, history_fingerprint):
+        return f"{context_fingerprint}:{history_fingerprint or 'none'}"
+
+    def _entries(self, bucket, now):
+        return [entry for entry in self.namespace.get(bucket, ()) if now - entry[2] <= self.ttl_seconds]
+
+    def lookup(self, embedding, context_fingerprint, history_fingerprint=''):
+        """
+        Return the best cached answer above the similarity threshold, or None.
+        """
+        unit = _normalize(embedding)
+        if unit is None:
+            return None
+        best_answer, best_score = None, self.threshold
+        for cached_unit, answer, _ in self._entries(self._bucket(context_fingerprint, history_fingerprint), time.time()):
+            score = sum(a * b for a, b in zip(unit, cached_unit))
+            if score >= best_score:
+                best_answer, best_score = answer, score
+        return best_answer
+
+    def store(self, embedding, context_fingerprint, answer, history_fingerprint=''):
+        unit = _normalize(embedding)
+        if unit is None or not answer:
+            return
+        bucket = self._bucket(context_fingerprint, history_fingerprint)
+        now = time.time()
+        # Read-modify-write: two workers storing into one bucket at once may lose an answer,
+        # which only costs a later cache miss
+        entries = self._entries(bucket, now)
+        entries.append((array('f', unit), answer, now))
+        self.namespace.set(bucket, entries[-self.max_entries:])
+
+    def clear(self):
+        self.namespace.invalidate()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Return the process-wide semantic cache, or None when disabled in settings.
+    """
+    global _cache
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    threshold=settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+                    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+                    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                )
+    return _cache
+
+
+def cache_bypassed(request, data):
+    """
+    Per-request bypass: body field "cache": false or a Cache-Control: no-cache header.
+    """
+    if data.get('cache') is False:
+        return True
+    return 'no-cache' in request.headers.get('Cache-Control', '').lower()
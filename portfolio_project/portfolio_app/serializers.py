@@ -1,7 +1,24 @@
 # portfolio_project/portfolio_app/serializers.py
 
 from rest_framework import serializers
-from .models import Project
+from .models import Project, Technology, split_technologies
+from .payloads import requested_fields
+
+
+class TechnologiesField(serializers.Field):
+    """
+    Project technologies as the comma-separated string the API has always returned
+    ("Django, React"); writes accept the same format.
+    """
+
+    def to_representation(self, value):
+        return ', '.join(tech.name for tech in value.all())  # prefetched by ProjectViewSet
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            raise serializers.ValidationError("Expected a comma-separated list of technologies.")
+        return split_technologies(data)
+
 
 class ProjectSerializer(serializers.ModelSerializer):
     """
@@ -10,10 +27,39 @@ class ProjectSerializer(serializers.ModelSerializer):
     """
     # Define 'image' as a SerializerMethodField to control its URL generation
     image = serializers.SerializerMethodField()
+    technologies = TechnologiesField()
+    # Slugs accepted by the ?technology= filter
+    technology_slugs = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
-        fields = '__all__' # Include all fields from the Project model
+        exclude = ['index_hashes'] # All fields except the internal vector-index bookkeeping
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets: GET /api/projects/?fields=id,title returns only those fields
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            fields = requested_fields(request)
+            if fields:
+                for name in set(self.fields) - fields:
+                    self.fields.pop(name)
+
+    def create(self, validated_data):
+        names = validated_data.pop('technologies', [])
+        project = super().create(validated_data)
+        project.technologies.set(Technology.for_names(names))
+        return project
+
+    def update(self, instance, validated_data):
+        names = validated_data.pop('technologies', None)
+        project = super().update(instance, validated_data)
+        if names is not None:
+            project.technologies.set(Technology.for_names(names))
+        return project
+
+    def get_technology_slugs(self, obj):
+        return [tech.slug for tech in obj.technologies.all()]
 
     def get_image(self, obj):
         """
@@ -0,0 +1,67 @@
+# portfolio_project/portfolio_app/signals.py
+"""
+Model signal receivers (connected in PortfolioAppConfig.ready()).
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .conversation_cache import invalidate_conversation
+from .models import Conversation, Project, Technology
+from .project_index import schedule_project_index, schedule_project_delete
+from .tiered_cache import invalidate_namespace
+
+
+def invalidate_project_list():
+    # After commit, so no worker caches the list again before the change is visible
+    transaction.on_commit(lambda: invalidate_namespace('projects'))
+
+
+@receiver(post_save, sender=Project)
+def queue_project_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return  # loaddata: fixtures are indexed by reconcile_project_index
+    invalidate_project_list()
+    # Only after commit, so the background thread reads the saved row
+    transaction.on_commit(lambda: schedule_project_index(instance.pk))
+
+
+@receiver(m2m_changed, sender=Project.technologies.through)
+def queue_project_index_for_technologies(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # post_clear gets no pk_set: remember which projects are about to lose this technology
+        instance._cleared_project_ids = list(instance.projects.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear' and reverse:
+        project_ids = instance.__dict__.pop('_cleared_project_ids', [])
+    else:
+        # Reverse side (technology.projects.add(...)): pk_set holds the affected projects
+        project_ids = list(pk_set or ()) if reverse else [instance.pk]
+    invalidate_project_list()
+
+    def schedule():
+        for project_id in project_ids:
+            schedule_project_index(project_id)
+    transaction.on_commit(schedule)
+
+
+@receiver(post_delete, sender=Project)
+def queue_project_vector_delete(sender, instance, **kwargs):
+    project_id = instance.pk
+    invalidate_project_list()
+    transaction.on_commit(lambda: schedule_project_delete(project_id))
+
+
+@receiver(post_save, sender=Technology)
+@receiver(post_delete, sender=Technology)
+def invalidate_project_list_for_technology(sender, instance, raw=False, **kwargs):
+    # Technology names are part of every project in the list
+    if not raw:
+        invalidate_project_list()
+
+
+@receiver(post_delete, sender=Conversation)
+def drop_cached_conversation(sender, instance, **kwargs):
+    invalidate_conversation(instance.pk)
@@ -0,0 +1,167 @@
+# portfolio_project/portfolio_app/summaries.py
+"""
+Rolling conversation summaries for the codegen endpoint.
+Once the part of a conversation not yet covered by its summary grows past
+CONVERSATION_SUMMARY_TRIGGER_TOKENS, a background job folds all but the most recent
+messages into Conversation.summary (Pegasus, via summarize_text_with_pegasus). Prompts are
+then built from the summary plus the recent messages instead of the full history.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .archive import conversation_messages
+from .metrics import counter
+from .models import Conversation
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_UPDATES = counter(
+    'portfolio_conversation_summary_updates_total', 'Background conversation summary jobs by outcome.', ('result',),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Conversations with a job queued or running; a second request does not queue another
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token); only used to decide when to summarize,
+    so the request path never has to load the tokenizer for it.
+    """
+    return len(text) // 4 + 1
+
+
+def history_for_prompt(conversation):
+    """
+    Prompt history for a stored conversation: a 'summary' entry (if there is one) followed
+    by the messages it does not cover. Only the uncovered messages are read from the database
+    (or the archive, see archive.py).
+    """
+    history = []
+    covered = 0
+    if conversation.summary and conversation.summarized_message_count:
+        history.append({'role': 'summary', 'content': conversation.summary})
+        covered = conversation.summarized_message_count
+    for sender, content, _ in conversation_messages(conversation, covered):
+        history.append({'role': sender, 'content': content})
+    return history
+
+
+def _transcript_batches(messages, max_chars):
+    """
+    Split (sender, content) pairs into transcripts of at most ~max_chars, yielding
+    (number_of_messages, transcript). Over-long single messages are truncated.
+    """
+    lines = []
+    size = 0
+    for sender, content in messages:
+        line = f"{sender.capitalize()}: {' '.join(content.split())}"[:max_chars]
+        if lines and size + len(line) > max_chars:
+            yield len(lines), "\n".join(lines)
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        yield len(lines), "\n".join(lines)
+
+
+def update_conversation_summary(conversation_id):
+    """
+    Fold the conversation's older unsummarized messages into its summary if they pass the
+    token threshold. Returns True if the summary was updated.
+    """
+    from .conversation_cache import invalidate_conversation
+    from .rag_pipeline import summarize_text_with_pegasus
+
+    conversation = Conversation.objects.filter(id=conversation_id).first()
+    if conversation is None:
+        return False
+    covered = conversation.summarized_message_count
+    pending = [(sender, content) for sender, content, _ in conversation_messages(conversation, covered)]
+    keep_recent = settings.CONVERSATION_SUMMARY_KEEP_RECENT
+    if len(pending) <= keep_recent:
+        return False
+    if sum(estimate_tokens(content) for _, content in pending) < settings.CONVERSATION_SUMMARY_TRIGGER_TOKENS:
+        return False
+
+    summary = conversation.summary
+    folded = 0
+    for count, transcript in _transcript_batches(pending[:len(pending) - keep_recent], settings.CONVERSATION_SUMMARY_INPUT_CHARS):
+        text = f"{summary}\n{transcript}" if summary else transcript
+        new_summary = summarize_text_with_pegasus(text, max_length=settings.CONVERSATION_SUMMARY_MAX_LENGTH)
+        if not new_summary:
+            break  # keep what was folded so far; the next exchange retries the rest
+        summary = new_summary
+        folded += count
+    if not folded:
+        return False
+
+    # Only apply on top of the summary this job started from (a concurrent job may have won)
+    updated = Conversation.objects.filter(id=conversation_id, summarized_message_count=covered).update(
+        summary=summary,
+        summarized_message_count=covered + folded,
+        summary_updated_at=timezone.now(),
+    )
+    if updated:
+        invalidate_conversation(conversation_id)
+    return bool(updated)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='summaries')
+    return _executor
+
+
+def _run_update(conversation_id):
+    try:
+        result = 'updated' if update_conversation_summary(conversation_id) else 'skipped'
+    except Exception as e:
+        result = 'failed'
+        logger.warning("[update_conversation_summary] Conversation %s: %s", conversation_id, e)
+    finally:
+        with _scheduled_lock:
+            _scheduled.discard(conversation_id)
+        close_old_connections()
+    SUMMARY_UPDATES.inc(result=result)
+
+
+def schedule_summary_update(conversation_id):
+    """
+    Queue a background summary check for the conversation (no-op if disabled or already queued).
+    """
+    from .conversation_cache import uncovered_tokens
+
+    if not settings.CONVERSATION_SUMMARY_ENABLED or conversation_id is None:
+        return
+    # A hot conversation's unsummarized size is known without a query: skip jobs that would do nothing
+    tokens = uncovered_tokens(conversation_id)
+    if tokens is not None and tokens < settings.CONVERSATION_SUMMARY_TRIGGER_TOKENS:
+        return
+    with _scheduled_lock:
+        if conversation_id in _scheduled:
+            return
+        _scheduled.add(conversation_id)
+    _get_executor().submit(_run_update, conversation_id)
+
+
+def reset_summary_executor():
+    """
+    Forget the background pool and queued jobs (threads do not survive fork()).
+    """
+    global _executor, _executor_lock, _scheduled_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+    _scheduled.clear()
+    _scheduled_lock = threading.Lock()
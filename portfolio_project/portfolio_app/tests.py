@@ -1,3 +1,886 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import context_packing, idempotency, memory, profiling, resilience
+from .archive import archive_conversation, conversation_messages
+from .conversation_cache import (
+    ConversationCache, cache_conversation, cache_exchange, cached_conversation, reset_conversation_cache,
+)
+from .fast_path import classify_input
+from .gemini_client import extract_gemini_text
+from .ingestion import Checkpoint, Ingestor
+from .message_writer import MessageWriter
+from .middleware import CompressionMiddleware
+from .models import Conversation, Message, Project, RequestProfile, Technology
+from .purge import purge_conversation
+from .rag_pipeline import summarize_text_with_pegasus
+from .resilience import BulkheadFullError, acquire_bulkhead, call_upstream, get_circuit_breaker
+from .search import search_messages, search_projects
+from .semantic_cache import SemanticCache, cache_bypassed, fingerprint_history
+from .summaries import history_for_prompt, update_conversation_summary
+from .tiered_cache import CacheNamespace
+from .views import PROJECT_LIST_CACHE
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CACHE_LOCK_SECONDS=30)
+class CacheNamespaceGetOrSetTests(SimpleTestCase):
+    def setUp(self):
+        self.namespace = CacheNamespace('tests', timeout=60, stale_timeout=0)
+        self.namespace.invalidate()
+
+    def test_stores_the_computed_value(self):
+        self.assertEqual(self.namespace.get_or_set('key', lambda: 'value'), 'value')
+        self.assertEqual(self.namespace.get_or_set('key', lambda: 'other'), 'value')
+
+    def test_failed_compute_releases_the_claim(self):
+        def fail():
+            raise RuntimeError('upstream down')
+
+        with self.assertRaises(RuntimeError):
+            self.namespace.get_or_set('key', fail)
+        started = time.monotonic()
+        self.assertEqual(self.namespace.get_or_set('key', lambda: 'value'), 'value')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_waiter_gets_the_value_of_the_running_compute(self):
+        release = threading.Event()
+        computed = []
+
+        def slow():
+            release.wait(5)
+            computed.append('slow')
+            return 'value'
+
+        def waiter():
+            computed.append('waiter')
+            return 'other'
+
+        thread = threading.Thread(target=self.namespace.get_or_set, args=('key', slow))
+        thread.start()
+        time.sleep(0.1)
+        threading.Timer(0.1, release.set).start()
+        self.assertEqual(self.namespace.get_or_set('key', waiter), 'value')
+        thread.join()
+        self.assertEqual(computed, ['slow'])
+
+    def test_waiter_takes_over_at_once_when_the_compute_fails(self):
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError('upstream down')
+
+        def run_failing():
+            with self.assertRaises(RuntimeError):
+                self.namespace.get_or_set('key', fail)
+
+        thread = threading.Thread(target=run_failing)
+        thread.start()
+        time.sleep(0.1)
+        threading.Timer(0.1, release.set).start()
+        started = time.monotonic()
+        self.assertEqual(self.namespace.get_or_set('key', lambda: 'value'), 'value')
+        self.assertLess(time.monotonic() - started, 2)
+        thread.join()
+
+    def test_waiter_takes_over_when_another_process_drops_its_lock(self):
+        # Another process holds the L2 lock, then fails without storing anything
+        lock_key = f"{self.namespace.key('key')}:lock"
+        self.namespace.cache.add(lock_key, 1)
+        threading.Timer(0.2, self.namespace.cache.delete, args=(lock_key,)).start()
+        started = time.monotonic()
+        self.assertEqual(self.namespace.get_or_set('key', lambda: 'value'), 'value')
+        self.assertLess(time.monotonic() - started, 2)
+
+
+class MetricsAuthTests(SimpleTestCase):
+    @override_settings(METRICS_AUTH_TOKEN=None)
+    def test_not_served_without_a_configured_token(self):
+        self.assertEqual(self.client.get(reverse('portfolio_app:metrics')).status_code, 404)
+
+    @override_settings(METRICS_AUTH_TOKEN='secret')
+    def test_requires_the_token(self):
+        url = reverse('portfolio_app:metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class MemoryReportTests(SimpleTestCase):
+    def setUp(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.addCleanup(tracemalloc.stop)
+        memory.reset_memory_tracking()
+
+    @override_settings(METRICS_AUTH_TOKEN=None)
+    def test_not_served_without_a_configured_token(self):
+        self.assertEqual(self.client.get(reverse('portfolio_app:memory')).status_code, 404)
+
+    @override_settings(METRICS_AUTH_TOKEN='secret')
+    def test_plain_reports_keep_the_diff_baseline(self):
+        url = reverse('portfolio_app:memory')
+        response = self.client.get(url, {'diff': '1'}, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        baseline = memory._baseline
+        self.assertIsNotNone(baseline)
+        self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertIs(memory._baseline, baseline)
+        sites = self.client.get(url, {'diff': '1'}, HTTP_AUTHORIZATION='Bearer secret').json()['top_allocations']
+        self.assertIn('size_diff_bytes', sites[0])
+
+
+class ClassifyInputTests(SimpleTestCase):
+    def test_trivial_inputs(self):
+        self.assertEqual(classify_input('Hi there!'), 'greeting')
+        self.assertEqual(classify_input('hi, thanks!'), 'thanks')
+        self.assertEqual(classify_input('ok cool'), 'chitchat')
+        self.assertEqual(classify_input('¡Hola!'), 'greeting')
+
+    def test_real_questions_are_not_trivial(self):
+        self.assertIsNone(classify_input('this'))
+        self.assertIsNone(classify_input('hi, can you help with django?'))
+        self.assertIsNone(classify_input(''))
+
+    @override_settings(FAST_PATH_MAX_CHARS=10)
+    def test_long_inputs_are_not_trivial(self):
+        self.assertIsNone(classify_input('thanks thanks thanks'))
+
+    def test_mid_conversation_only_greetings(self):
+        history = [
+            {'role': 'user', 'content': 'How do I reverse a list in Python?'},
+            {'role': 'assistant', 'content': 'Use my_list[::-1] or my_list.reverse().'},
+        ]
+        for reply in ('ok', 'great', 'perfect', 'got it', 'thanks'):
+            self.assertIsNone(classify_input(reply, history), reply)
+        self.assertEqual(classify_input('hello again', history), 'greeting')
+
+
+class UpstreamHttpErrorTests(SimpleTestCase):
+    def test_summarization_http_errors_count_against_the_breaker(self):
+        response = requests.Response()
+        response.status_code = 503
+        breaker = get_circuit_breaker('hf_summarization')
+        breaker.record_success()
+        with mock.patch('portfolio_app.rag_pipeline.requests.post', return_value=response):
+            self.assertIsNone(summarize_text_with_pegasus('text'))
+        self.assertEqual(breaker._failures, 1)
+        breaker.record_success()
+
+    def _raise_status(self, status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        raise requests.HTTPError(response=response)
+
+    def test_client_errors_leave_the_breaker_alone(self):
+        breaker = get_circuit_breaker('test_upstream')
+        breaker.record_success()
+        for status_code in (400, 422):
+            with self.assertRaises(requests.HTTPError):
+                call_upstream('test_upstream', self._raise_status, status_code)
+        self.assertEqual(breaker._failures, 0)
+
+    def test_server_errors_and_rate_limits_count_against_the_breaker(self):
+        breaker = get_circuit_breaker('test_upstream')
+        breaker.record_success()
+        for status_code in (503, 429):
+            with self.assertRaises(requests.HTTPError):
+                call_upstream('test_upstream', self._raise_status, status_code)
+        self.assertEqual(breaker._failures, 2)
+        breaker.record_success()
+
+
+class BulkheadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            BULKHEAD_ENABLED=True,
+            BULKHEAD_DIR=directory.name,
+            BULKHEAD_LIMITS={'gemini': 1, 'pinecone': 1, 'pinecone_batch': 1},
+            BULKHEAD_QUEUE_SIZE=0,
+            BULKHEAD_RETRY_AFTER_SECONDS=7,
+            GEMINI_API_KEY='test-key',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        resilience._bulkheads.clear()
+        self.addCleanup(resilience._bulkheads.clear)
+
+    def test_saturated_bulkhead_rejects_at_once(self):
+        with acquire_bulkhead('pinecone'):
+            with self.assertRaises(BulkheadFullError):
+                acquire_bulkhead('pinecone')
+        acquire_bulkhead('pinecone').release()
+
+    def test_saturated_bulkhead_is_a_503_with_retry_after(self):
+        with acquire_bulkhead('gemini'):
+            response = self.client.post(
+                reverse('portfolio_app:gemini_chat'),
+                data=json.dumps({'message': 'hi', 'stream': True}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+
+    def test_batch_calls_do_not_take_live_slots(self):
+        with acquire_bulkhead('pinecone'):
+            self.assertEqual(call_upstream('pinecone', lambda: 'done', bulkhead='pinecone_batch'), 'done')
+
+
+@override_settings(RESPONSE_COMPRESSION_ENABLED=True, RESPONSE_COMPRESSION_MIN_BYTES=10)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def compress(self, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_json(self):
+        response = self.compress(HttpResponse('{"a": 1}' * 100, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_leaves_binary_downloads_alone(self):
+        response = self.compress(HttpResponse(b'\x00' * 1000, content_type='application/octet-stream'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ExtractGeminiTextTests(SimpleTestCase):
+    def test_text_of_the_first_part(self):
+        result = {'candidates': [{'content': {'parts': [{'text': 'Hello'}]}}]}
+        self.assertEqual(extract_gemini_text(result), 'Hello')
+
+    def test_part_without_text(self):
+        result = {'candidates': [{'content': {'parts': [{}]}}]}
+        self.assertIsNone(extract_gemini_text(result))
+        self.assertEqual(extract_gemini_text(result, missing_text='none'), 'none')
+
+    def test_unexpected_structure(self):
+        self.assertIsNone(extract_gemini_text({'candidates': [{'finishReason': 'SAFETY'}]}, missing_text='none'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProjectIndexSignalTests(TestCase):
+    def setUp(self):
+        self.technology = Technology.objects.create(name='Django')
+        self.projects = [Project.objects.create(title=title, description='A project') for title in ('One', 'Two')]
+        for project in self.projects:
+            project.technologies.add(self.technology)
+
+    def test_reverse_clear_reindexes_the_affected_projects(self):
+        with mock.patch('portfolio_app.signals.schedule_project_index') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.technology.projects.clear()
+        self.assertEqual(
+            sorted(call.args[0] for call in schedule.call_args_list), sorted(project.pk for project in self.projects),
+        )
+
+    def test_forward_clear_reindexes_the_project(self):
+        with mock.patch('portfolio_app.signals.schedule_project_index') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.projects[0].technologies.clear()
+        schedule.assert_called_once_with(self.projects[0].pk)
+
+
+class MessageWriterTests(TestCase):
+    def test_submit_after_shutdown_writes_synchronously(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        conversation = Conversation.objects.create(google_user_id='user')
+        writer = MessageWriter(batch_size=10, flush_seconds=0.1, max_queue=10, spool_dir=spool_dir.name)
+        writer.shutdown()
+        with mock.patch('portfolio_app.summaries.schedule_summary_update'):
+            writer.submit(conversation.pk, [('user', 'hello'), ('assistant', 'hi')])
+        self.assertEqual(
+            list(Message.objects.filter(conversation=conversation).values_list('sender', 'content').order_by('pk')),
+            [('user', 'hello'), ('assistant', 'hi')],
+        )
+        self.assertEqual(writer.pending_messages(conversation.pk), [])
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=0, IDEMPOTENCY_TTL_HOURS=24, IDEMPOTENCY_LOCK_SECONDS=600)
+class IdempotencyTests(TestCase):
+    def post(self, body):
+        return RequestFactory().post('/api/codegen/', data=json.dumps(body), content_type='application/json')
+
+    def begin(self, body=None):
+        return idempotency.begin('user', 'key-1', 'codegen', self.post(body or {'input': 'reverse a list'}))
+
+    def test_completed_response_is_replayed(self):
+        record, stored = self.begin()
+        self.assertIsNotNone(record)
+        self.assertIsNone(stored)
+        idempotency.complete(record, 200, {'response': 'my_list[::-1]'})
+        self.assertEqual(self.begin(), (None, (200, {'response': 'my_list[::-1]'})))
+
+    def test_key_reused_for_another_request(self):
+        record, _ = self.begin()
+        idempotency.complete(record, 200, {'response': 'ok'})
+        with self.assertRaises(idempotency.IdempotencyKeyMismatch):
+            self.begin({'input': 'something else'})
+
+    def test_duplicate_while_processing_is_busy(self):
+        self.begin()
+        with self.assertRaises(idempotency.IdempotencyKeyBusy):
+            self.begin()
+
+    def test_server_errors_release_the_key(self):
+        record, _ = self.begin()
+        idempotency.complete(record, 502, {'error': 'upstream'})
+        record, stored = self.begin()
+        self.assertIsNotNone(record)
+        self.assertIsNone(stored)
+
+    def test_release(self):
+        record, _ = self.begin()
+        idempotency.release(record)
+        self.assertIsNotNone(self.begin()[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchFallbackTests(TestCase):
+    """
+    The icontains fallback used on databases without PostgreSQL full-text search.
+    """
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(google_user_id='user', title='Python')
+        Message.objects.create(conversation=self.conversation, sender='user', content='How do I reverse a list in Python?')
+        Message.objects.create(conversation=self.conversation, sender='assistant', content='Use slicing: my_list[::-1].')
+        other = Conversation.objects.create(google_user_id='someone-else')
+        Message.objects.create(conversation=other, sender='user', content='Reverse a list in Go')
+        deleted = Conversation.objects.create(google_user_id='user', deleted_at=timezone.now())
+        Message.objects.create(conversation=deleted, sender='user', content='Reverse a string')
+
+    def test_only_the_users_live_conversations(self):
+        results = search_messages('user', 'reverse', limit=10)
+        self.assertEqual([row['snippet'] for row in results], ['How do I reverse a list in Python?'])
+        self.assertEqual(results[0]['conversation_id'], self.conversation.pk)
+        self.assertIsNone(results[0]['rank'])
+
+    def test_assistant_messages_keep_their_role(self):
+        results = search_messages('user', 'slicing', limit=10)
+        self.assertEqual([(row['role'], row['snippet']) for row in results], [('assistant', 'Use slicing: my_list[::-1].')])
+
+    def test_projects_match_title_or_description_newest_first(self):
+        first = Project.objects.create(title='Chess engine', description='Alpha-beta search in Rust')
+        second = Project.objects.create(title='Search service', description='Full-text search API')
+        Project.objects.create(title='Portfolio', description='This site')
+        results = search_projects('search', limit=10)
+        self.assertEqual([row['project_id'] for row in results], [second.pk, first.pk])
+        self.assertEqual([row['project_id'] for row in search_projects('search', limit=1, offset=1)], [first.pk])
+
+    def test_search_view_paginates_public_projects(self):
+        for number in range(3):
+            Project.objects.create(title=f'Search tool {number}', description='')
+        response = self.client.get(reverse('portfolio_app:search'), {'q': 'search tool', 'type': 'projects', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['projects']['results']), 2)
+        self.assertTrue(response.json()['projects']['has_more'])
+        self.assertNotIn('messages', response.json())
+
+
+def _words(prefix, count, start=0):
+    # Fixed-width distinct words, so a proportional cut keeps the word count proportional
+    return ' '.join(f"{prefix}{index:03d}" for index in range(start, start + count))
+
+
+def _word_tokens(text):
+    return len(text.replace(' ...', '').split())
+
+
+@mock.patch.object(context_packing, '_chunk_tokens', _word_tokens)
+class PackContextTests(SimpleTestCase):
+    def pack(self, chunks, token_budget=1000):
+        return context_packing.pack_context(chunks, token_budget=token_budget, mmr_lambda=0.5, duplicate_threshold=0.6)
+
+    def test_exact_and_near_duplicates_are_dropped(self):
+        text = _words('a', 100)
+        packed = self.pack([
+            {'text': text, 'score': 0.9},
+            {'text': '  ' + text.upper() + '  ', 'score': 0.85},
+            {'text': _words('a', 99) + ' changed', 'score': 0.8},
+            {'text': _words('b', 50), 'score': 0.7},
+        ])
+        self.assertEqual([chunk['text'] for chunk in packed], [text, _words('b', 50)])
+
+    def test_mmr_prefers_a_different_chunk_over_a_similar_one(self):
+        overlapping = _words('a', 50) + ' ' + _words('c', 50)
+        packed = self.pack([
+            {'text': _words('a', 100), 'score': 0.9},
+            {'text': overlapping, 'score': 0.85},
+            {'text': _words('b', 100), 'score': 0.8},
+        ])
+        self.assertEqual([chunk['score'] for chunk in packed], [0.9, 0.8, 0.85])
+
+    def test_url_chunks_without_a_score_rank_first(self):
+        packed = self.pack([{'text': _words('a', 10), 'score': 0.99}, {'text': _words('u', 10)}])
+        self.assertEqual(packed[0]['text'], _words('u', 10))
+
+    def test_a_chunk_takes_at_most_max_chunk_share_of_the_budget(self):
+        packed = self.pack([{'text': _words('a', 300), 'score': 0.9}], token_budget=200)
+        self.assertTrue(packed[0]['truncated'])
+        self.assertTrue(packed[0]['text'].endswith(' ...'))
+        self.assertLessEqual(_word_tokens(packed[0]['text']), 200 * context_packing.MAX_CHUNK_SHARE)
+
+    def test_remainders_below_min_truncated_tokens_are_skipped(self):
+        self.assertLess(30, context_packing.MIN_TRUNCATED_TOKENS)
+        packed = self.pack([
+            {'text': _words('a', 90), 'score': 0.9},
+            {'text': _words('b', 80), 'score': 0.8},
+            {'text': _words('c', 200), 'score': 0.7},  # only 30 tokens left: skipped, not cut
+            {'text': _words('d', 20), 'score': 0.6},
+        ], token_budget=200)
+        self.assertEqual([chunk['score'] for chunk in packed], [0.9, 0.8, 0.6])
+        self.assertFalse(any(chunk.get('truncated') for chunk in packed))
+
+    def test_packed_total_stays_within_the_budget(self):
+        chunks = [{'text': _words(prefix, 40 + 37 * index), 'score': 1 - index / 10}
+                  for index, prefix in enumerate('abcdefgh')]
+        for token_budget in (100, 250, 600):
+            packed = self.pack(chunks, token_budget=token_budget)
+            self.assertTrue(packed)
+            self.assertLessEqual(sum(_word_tokens(chunk['text']) for chunk in packed), token_budget)
+
+    def test_truncate_cuts_proportionally_on_a_word_boundary(self):
+        cut = context_packing._truncate(_words('a', 100), 100, 25)
+        self.assertEqual(cut, _words('a', 24) + ' ...')
+
+    def test_shingles_normalize_case_and_whitespace(self):
+        self.assertEqual(context_packing.shingles('A  b C'), context_packing.shingles('a b\nc'))
+        self.assertEqual(len(context_packing.shingles('a b c')), 1)
+        self.assertEqual(context_packing.shingles('   '), set())
+        self.assertEqual(len(context_packing.shingles(_words('a', 10))), 10 - context_packing.SHINGLE_SIZE + 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SemanticCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SemanticCache(threshold=0.95, ttl_seconds=60, max_entries=2)
+        self.cache.clear()
+        self.cache.store([1.0, 0.0, 0.0], 'context', 'answer')
+
+    def test_similar_question_hits_and_dissimilar_misses(self):
+        self.assertEqual(self.cache.lookup([0.99, 0.05, 0.0], 'context'), 'answer')
+        self.assertIsNone(self.cache.lookup([0.7, 0.7, 0.0], 'context'))
+
+    def test_different_context_or_history_misses(self):
+        history = fingerprint_history([{'role': 'user', 'content': 'earlier question'}])
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], 'other context'))
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], 'context', history))
+        self.cache.store([1.0, 0.0, 0.0], 'context', 'follow-up answer', history)
+        self.assertEqual(self.cache.lookup([1.0, 0.0, 0.0], 'context', history), 'follow-up answer')
+        self.assertEqual(self.cache.lookup([1.0, 0.0, 0.0], 'context'), 'answer')
+
+    def test_oldest_answer_is_evicted_at_max_entries(self):
+        self.cache.store([0.0, 1.0, 0.0], 'context', 'second')
+        self.cache.store([0.0, 0.0, 1.0], 'context', 'third')
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], 'context'))
+        self.assertEqual(self.cache.lookup([0.0, 1.0, 0.0], 'context'), 'second')
+        self.assertEqual(self.cache.lookup([0.0, 0.0, 1.0], 'context'), 'third')
+
+    def test_bypass_by_body_field_or_cache_control(self):
+        factory = RequestFactory()
+        request = factory.post('/')
+        self.assertFalse(cache_bypassed(request, {}))
+        self.assertFalse(cache_bypassed(request, {'cache': True}))
+        self.assertTrue(cache_bypassed(request, {'cache': False}))
+        self.assertTrue(cache_bypassed(factory.post('/', HTTP_CACHE_CONTROL='No-Cache'), {}))
+
+
+class ArchiveRoundTripTests(TestCase):
+    def setUp(self):
+        self.conversation = Conversation.objects.create(google_user_id='user')
+        self.started = timezone.now() - timedelta(hours=1)
+        for index, sender in enumerate(['user', 'assistant', 'user']):
+            self.add_message(sender, f"message {index}", index)
+
+    def add_message(self, sender, content, minutes):
+        message = Message.objects.create(conversation=self.conversation, sender=sender, content=content)
+        # Distinct timestamps, so the order does not depend on insertion speed
+        Message.objects.filter(pk=message.pk).update(created_at=self.started + timedelta(minutes=minutes))
+
+    def contents(self, offset=0):
+        self.conversation.refresh_from_db()
+        return [content for _, content, _ in conversation_messages(self.conversation, offset)]
+
+    def archive(self, codec='zlib'):
+        return archive_conversation(self.conversation.pk, timezone.now() + timedelta(seconds=1), codec=codec)
+
+    def test_archived_messages_read_back_unchanged(self):
+        before = conversation_messages(self.conversation)
+        moved, raw_size, compressed_size = self.archive()
+        self.assertEqual(moved, 3)
+        self.assertGreater(raw_size, 0)
+        self.assertGreater(compressed_size, 0)
+        self.assertFalse(Message.objects.filter(conversation=self.conversation).exists())
+        self.conversation.refresh_from_db()
+        self.assertIsNotNone(self.conversation.archived_at)
+        self.assertEqual(conversation_messages(self.conversation), before)
+
+    def test_offsets_on_both_sides_of_the_archived_part(self):
+        self.archive(codec='lzma')
+        self.add_message('assistant', 'message 3', 3)
+        self.add_message('user', 'message 4', 4)
+        self.assertEqual(self.contents(), [f"message {index}" for index in range(5)])
+        self.assertEqual(self.contents(2), ['message 2', 'message 3', 'message 4'])
+        self.assertEqual(self.contents(3), ['message 3', 'message 4'])
+        self.assertEqual(self.contents(4), ['message 4'])
+        self.assertEqual(self.contents(5), [])
+
+    def test_rearchiving_merges_newer_messages(self):
+        self.archive()
+        self.add_message('assistant', 'message 3', 3)
+        self.assertEqual(self.archive()[0], 1)
+        self.assertEqual(self.conversation.archive.message_count, 4)
+        self.assertFalse(Message.objects.filter(conversation=self.conversation).exists())
+        self.assertEqual(self.contents(), [f"message {index}" for index in range(4)])
+        self.assertIsNone(self.archive())
+
+    def test_conversation_written_after_idle_before_is_skipped(self):
+        self.assertIsNone(archive_conversation(self.conversation.pk, timezone.now() - timedelta(days=1)))
+        self.assertEqual(Message.objects.filter(conversation=self.conversation).count(), 3)
+        self.conversation.refresh_from_db()
+        self.assertIsNone(self.conversation.archived_at)
+
+
+@override_settings(CONVERSATION_PURGE_PAUSE_SECONDS=0)
+class PurgeTests(TestCase):
+    def create_conversation(self, messages, **fields):
+        conversation = Conversation.objects.create(google_user_id='user')
+        Message.objects.bulk_create(
+            Message(conversation=conversation, sender='user', content=f"message {index}") for index in range(messages)
+        )
+        if fields:
+            Conversation.objects.filter(pk=conversation.pk).update(**fields)
+        return conversation
+
+    def test_live_conversation_is_left_alone(self):
+        conversation = self.create_conversation(3)
+        self.assertEqual(purge_conversation(conversation.pk, batch_size=2), 0)
+        self.assertTrue(Conversation.objects.filter(pk=conversation.pk).exists())
+        self.assertEqual(conversation.messages.count(), 3)
+
+    def test_batches_delete_every_message(self):
+        for messages in (7, 6):
+            conversation = self.create_conversation(messages, deleted_at=timezone.now())
+            self.assertEqual(purge_conversation(conversation.pk, batch_size=3), messages)
+            self.assertFalse(Conversation.objects.filter(pk=conversation.pk).exists())
+            self.assertFalse(Message.objects.filter(conversation_id=conversation.pk).exists())
+
+    def test_command_purges_only_expired_and_deleted_conversations(self):
+        long_ago = timezone.now() - timedelta(days=400)
+        expired = self.create_conversation(4, updated_at=long_ago)
+        recent = self.create_conversation(2, updated_at=timezone.now() - timedelta(days=10))
+        deleted = self.create_conversation(1, deleted_at=timezone.now())
+        out = StringIO()
+        call_command('purge_conversations', older_than_days=365, batch_size=3, stdout=out)
+        self.assertEqual(list(Conversation.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(Message.objects.filter(conversation_id__in=[expired.pk, deleted.pk]).count(), 0)
+        self.assertEqual(recent.messages.count(), 2)
+        self.assertIn("Purged 2 conversations (1 expired by age) and 5 messages", out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_conversation(4, updated_at=timezone.now() - timedelta(days=400))
+        out = StringIO()
+        call_command('purge_conversations', older_than_days=365, dry_run=True, stdout=out)
+        self.assertIn("expired conversations: 1 (4 messages in the table)", out.getvalue())
+        self.assertFalse(Conversation.objects.filter(deleted_at__isnull=False).exists())
+
+
+class ConversationCacheTests(SimpleTestCase):
+    def conversation(self, pk):
+        return Conversation(pk=pk, google_user_id='user', updated_at=timezone.now())
+
+    def test_least_recently_used_conversation_is_evicted(self):
+        cache = ConversationCache(max_conversations=2, max_messages=3)
+        for pk in (1, 2):
+            cache.put(self.conversation(pk), [('user', 'hi')], 1)
+        cache.get(1)
+        cache.put(self.conversation(3), [('user', 'hi')], 1)
+        self.assertIsNotNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertIsNotNone(cache.get(3))
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = ConversationCache(ttl_seconds=60)
+        with mock.patch('portfolio_app.conversation_cache.time') as clock:
+            clock.monotonic.return_value = 1000.0
+            cache.put(self.conversation(1), [('user', 'hi')], 1)
+            clock.monotonic.return_value = 1060.0
+            self.assertIsNotNone(cache.get(1))
+            clock.monotonic.return_value = 1061.0
+            self.assertIsNone(cache.get(1))
+
+    def test_only_the_newest_max_messages_are_kept(self):
+        cache = ConversationCache(max_messages=2)
+        cache.put(self.conversation(1), [('user', 'a'), ('assistant', 'b'), ('user', 'c')], 3)
+        self.assertEqual([content for _, content, _ in cache.get(1)['messages']], ['b', 'c'])
+
+
+@override_settings(CONVERSATION_CACHE_ENABLED=True, CONVERSATION_CACHE_MAX_MESSAGES=10, CONVERSATION_CACHE_VALIDATE=True)
+class CachedConversationTests(TestCase):
+    def setUp(self):
+        reset_conversation_cache()
+        self.addCleanup(reset_conversation_cache)
+        self.conversation = Conversation.objects.create(google_user_id='user')
+        history = [{'role': 'user', 'content': 'hello'}, {'role': 'assistant', 'content': 'hi'}]
+        cache_conversation(self.conversation, history, 2)
+
+    def test_hit_includes_written_through_exchanges(self):
+        cache_exchange(self.conversation.pk, [('user', 'more'), ('assistant', 'sure')], self.conversation.updated_at)
+        conversation, history = cached_conversation(self.conversation.pk, 'user')
+        self.assertEqual(conversation.pk, self.conversation.pk)
+        self.assertEqual([msg['content'] for msg in history], ['hello', 'hi', 'more', 'sure'])
+
+    def test_other_users_never_get_the_entry(self):
+        self.assertIsNone(cached_conversation(self.conversation.pk, 'someone-else'))
+        self.assertIsNotNone(cached_conversation(self.conversation.pk, 'user'))
+
+    def test_write_by_another_worker_invalidates_the_entry(self):
+        Conversation.objects.filter(pk=self.conversation.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertIsNone(cached_conversation(self.conversation.pk, 'user'))
+        # Dropped, not just skipped: the entry is gone even if the timestamps matched again
+        Conversation.objects.filter(pk=self.conversation.pk).update(updated_at=self.conversation.updated_at)
+        self.assertIsNone(cached_conversation(self.conversation.pk, 'user'))
+
+    def test_deleted_conversation_is_a_miss(self):
+        Conversation.objects.filter(pk=self.conversation.pk).delete()
+        self.assertIsNone(cached_conversation(self.conversation.pk, 'user'))
+
+    @override_settings(CONVERSATION_CACHE_VALIDATE=False)
+    def test_validation_can_be_turned_off(self):
+        Conversation.objects.filter(pk=self.conversation.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertIsNotNone(cached_conversation(self.conversation.pk, 'user'))
+
+
+@override_settings(
+    CONVERSATION_SUMMARY_TRIGGER_TOKENS=1, CONVERSATION_SUMMARY_KEEP_RECENT=2, CONVERSATION_SUMMARY_INPUT_CHARS=2000,
+)
+class ConversationSummaryTests(TestCase):
+    def setUp(self):
+        self.conversation = Conversation.objects.create(google_user_id='user')
+        started = timezone.now() - timedelta(hours=1)
+        for index in range(5):
+            message = Message.objects.create(
+                conversation=self.conversation, sender='user' if index % 2 == 0 else 'assistant', content=f"message {index}",
+            )
+            Message.objects.filter(pk=message.pk).update(created_at=started + timedelta(minutes=index))
+
+    def test_history_is_the_summary_plus_uncovered_messages(self):
+        self.assertEqual([msg['content'] for msg in history_for_prompt(self.conversation)],
+                         [f"message {index}" for index in range(5)])
+        self.conversation.summary = 'earlier talk'
+        self.conversation.summarized_message_count = 3
+        self.assertEqual(history_for_prompt(self.conversation), [
+            {'role': 'summary', 'content': 'earlier talk'},
+            {'role': 'assistant', 'content': 'message 3'},
+            {'role': 'user', 'content': 'message 4'},
+        ])
+
+    def test_older_messages_are_folded_into_the_summary(self):
+        with mock.patch('portfolio_app.rag_pipeline.summarize_text_with_pegasus', return_value='summary') as summarize:
+            self.assertTrue(update_conversation_summary(self.conversation.pk))
+        self.assertIn('User: message 0', summarize.call_args.args[0])
+        self.assertNotIn('message 3', summarize.call_args.args[0])
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.summary, self.conversation.summarized_message_count), ('summary', 3))
+
+    def test_concurrent_update_wins_over_a_stale_job(self):
+        def summarize(text, max_length):
+            # Another job commits its summary while this one is still summarizing
+            Conversation.objects.filter(pk=self.conversation.pk).update(summary='theirs', summarized_message_count=1)
+            return 'ours'
+
+        with mock.patch('portfolio_app.rag_pipeline.summarize_text_with_pegasus', side_effect=summarize):
+            self.assertFalse(update_conversation_summary(self.conversation.pk))
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.summary, self.conversation.summarized_message_count), ('theirs', 1))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProjectApiTests(TestCase):
+    def setUp(self):
+        PROJECT_LIST_CACHE.invalidate()
+        self.url = reverse('portfolio_app:project-list')
+        django, react = Technology.objects.create(name='Django'), Technology.objects.create(name='React')
+        self.projects = {}
+        for title, created, technologies in (('One', '2024-01-10', [django, react]), ('Two', '2024-02-10', [django]),
+                                             ('Three', '2024-03-10', [react])):
+            project = Project.objects.create(title=title, description='A project')
+            project.technologies.set(technologies)
+            Project.objects.filter(pk=project.pk).update(created_at=f"{created}T12:00:00Z")
+            self.projects[title] = project
+
+    def titles(self, query='', url=None):
+        response = self.client.get(url or f"{self.url}?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [project['title'] for project in response.json()['results']]
+
+    def test_technology_filter_requires_every_technology(self):
+        self.assertEqual(self.titles('technology=django'), ['Two', 'One'])
+        self.assertEqual(self.titles('technology=Django,%20react'), ['One'])
+        self.assertEqual(self.titles('technology=vue'), [])
+
+    def test_created_filters(self):
+        self.assertEqual(self.titles('created_after=2024-02-01'), ['Three', 'Two'])
+        self.assertEqual(self.titles('created_before=2024-02-01'), ['One'])
+        self.assertEqual(self.titles('created_after=2024-02-01&created_before=2024-03-01T00:00:00Z'), ['Two'])
+        self.assertEqual(self.client.get(f"{self.url}?created_after=last-week").status_code, 400)
+
+    def test_cursor_next_links(self):
+        page = self.client.get(f"{self.url}?page_size=2").json()
+        self.assertEqual([project['title'] for project in page['results']], ['Three', 'Two'])
+        self.assertIsNotNone(page['next'])
+        last = self.client.get(page['next']).json()
+        self.assertEqual([project['title'] for project in last['results']], ['One'])
+        self.assertIsNone(last['next'])
+
+    def test_technologies_round_trip_as_a_comma_string(self):
+        self.client.force_login(get_user_model().objects.create_user('admin'))
+        with mock.patch('portfolio_app.signals.schedule_project_index'):
+            response = self.client.post(self.url, {'title': 'Four', 'description': 'New',
+                                                   'technologies': ' vue ,Django, django'})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()['technologies'], 'Django, vue')
+            self.assertEqual(response.json()['technology_slugs'], ['django', 'vue'])
+            detail = reverse('portfolio_app:project-detail', args=[response.json()['id']])
+            response = self.client.patch(detail, {'technologies': 'React'}, content_type='application/json')
+            self.assertEqual(response.json()['technologies'], 'React')
+            response = self.client.patch(detail, {'technologies': ['React']}, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_writes_invalidate_the_cached_list(self):
+        self.assertEqual(self.titles(), ['Three', 'Two', 'One'])
+        # Queryset updates send no signals: the cached page is still served
+        Project.objects.filter(pk=self.projects['One'].pk).update(title='Renamed')
+        self.assertEqual(self.titles(), ['Three', 'Two', 'One'])
+        self.client.force_login(get_user_model().objects.create_user('admin'))
+        with mock.patch('portfolio_app.signals.schedule_project_index'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, {'title': 'Four', 'description': 'New', 'technologies': ''})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.titles(), ['Four', 'Three', 'Two', 'Renamed'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PROFILING_ENABLED=True, PROFILING_MAX_STORED=2)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.token = profiling.make_token(RequestProfile.CPROFILE, issued_by='admin')
+
+    def test_only_valid_signed_tokens_are_honoured(self):
+        self.assertEqual(profiling.requested_profile(self.factory.get('/', HTTP_X_PROFILE=self.token)),
+                         (RequestProfile.CPROFILE, 'admin'))
+        self.assertEqual(profiling.requested_profile(self.factory.get('/', {'profile': self.token})),
+                         (RequestProfile.CPROFILE, 'admin'))
+        tampered = self.token[:-1] + ('A' if self.token[-1] != 'A' else 'B')
+        other_salt = signing.dumps({'mode': RequestProfile.CPROFILE}, compress=True)
+        for token in ('', 'cprofile', tampered, other_salt):
+            self.assertIsNone(profiling.requested_profile(self.factory.get('/', HTTP_X_PROFILE=token)))
+            self.assertIsNone(profiling.requested_profile(self.factory.get('/', {'profile': token})))
+
+    def test_expired_token_or_disabled_profiling_is_ignored(self):
+        request = self.factory.get('/', HTTP_X_PROFILE=self.token)
+        with override_settings(PROFILING_TOKEN_MAX_AGE_SECONDS=-1):
+            self.assertIsNone(profiling.requested_profile(request))
+        with override_settings(PROFILING_ENABLED=False):
+            self.assertIsNone(profiling.requested_profile(request))
+
+    def test_profiled_request_is_stored_without_its_token(self):
+        url = reverse('portfolio_app:project-list')
+        response = self.client.get(url)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+        response = self.client.get(url, {'profile': self.token, 'page_size': 5})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.path, profile.issued_by), (f"{url}?page_size=5", 'admin'))
+
+    def test_only_the_newest_profiles_are_kept(self):
+        url = reverse('portfolio_app:project-list')
+        ids = [int(self.client.get(url, HTTP_X_PROFILE=self.token)['X-Profile-Id']) for _ in range(3)]
+        self.assertEqual(sorted(RequestProfile.objects.values_list('pk', flat=True)), ids[1:])
+
+
+def _fake_embeddings(texts):
+    return [[float(len(text))] for text in texts]
+
+
+@override_settings(BULKHEAD_ENABLED=False)
+@mock.patch('portfolio_app.rag_pipeline.embed_texts', side_effect=_fake_embeddings)
+class IngestionResumeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint_path = f"{directory.name}/checkpoint.json"
+        self.index = mock.Mock()
+        self.index.fetch.return_value = {'vectors': {}}
+        self.documents = {
+            'a.md': ' '.join(f"alpha{index}" for index in range(40)),
+            'b.md': ' '.join(f"beta{index}" for index in range(40)),
+        }
+
+    def ingest(self, documents, checkpoint_path=None):
+        ingestor = Ingestor(self.index, Checkpoint(checkpoint_path or self.checkpoint_path), chunk_tokens=16,
+                            overlap_tokens=4, embed_batch_size=4, upsert_batch_size=3, concurrency=2)
+        for source, text in documents.items():
+            ingestor.add(source, text)
+        return ingestor.finish()
+
+    def upserted_ids(self):
+        return [vector_id for call in self.index.upsert.call_args_list for vector_id, _, _ in call.kwargs['vectors']]
+
+    def test_rerun_skips_unchanged_documents(self, embed_texts):
+        first = self.ingest(self.documents)
+        self.assertGreater(first['upserted'], 0)
+        self.assertEqual(len(self.upserted_ids()), first['chunks'])
+        self.index.reset_mock()
+        embed_texts.reset_mock()
+
+        second = self.ingest(self.documents)
+        self.assertEqual(second['sources_unchanged'], 2)
+        embed_texts.assert_not_called()
+        self.index.upsert.assert_not_called()
+
+    def test_changed_document_only_upserts_its_new_chunks(self, embed_texts):
+        first = self.ingest(self.documents)
+        ids_before = set(self.upserted_ids())
+        self.index.reset_mock()
+        changed = dict(self.documents, **{'b.md': self.documents['b.md'] + ' gamma0 gamma1'})
+
+        second = self.ingest(changed)
+        self.assertEqual(second['sources_unchanged'], 1)
+        self.assertGreater(second['skipped_checkpoint'], 0)
+        self.assertTrue(self.upserted_ids())
+        self.assertFalse(set(self.upserted_ids()) & ids_before)
+        self.assertLess(second['upserted'], first['upserted'])
+
+    def test_chunks_already_in_the_index_are_not_upserted_again(self, embed_texts):
+        self.ingest(self.documents)
+        indexed = set(self.upserted_ids())
+        self.index.reset_mock()
+        self.index.fetch.side_effect = lambda ids, namespace: {'vectors': {i: {} for i in ids if i in indexed}}
+        embed_texts.reset_mock()
+
+        # A lost checkpoint: the index itself says what is already there
+        stats = self.ingest(self.documents, checkpoint_path=f"{self.checkpoint_path}.lost")
+        self.assertEqual(stats['skipped_index'], len(indexed))
+        embed_texts.assert_not_called()
+        self.index.upsert.assert_not_called()
@@ -0,0 +1,349 @@
+# portfolio_project/portfolio_app/tiered_cache.py
+"""
+Two-tier cache used by the app's caches (CACHES['default'], configured in settings.py).
+
+TieredCache is a Django cache backend: a small in-process LRU (L1) in front of a shared
+cache (L2, another CACHES entry): a file-based cache shared by the workers of one machine
+by default, or Redis (CACHE_URL=redis://...) to share it between machines. Reads are
+served from L1 for at most CACHE_L1_TIMEOUT seconds, so a value changed or invalidated by
+another worker is seen there within that time.
+
+CacheNamespace groups the keys of one cache (e.g. 'projects') under a version number kept
+in L2: invalidate() bumps the version, which orphans every key of the namespace at once
+(they expire on their own). get_or_set() protects the computation from stampedes: entries
+have a soft expiry, and when one is missing or stale only one caller per process (and,
+through an L2 lock, per deployment) recomputes it while the others serve the stale value
+or wait for the new one; if that computation fails, a waiter takes over at once. The L2
+lock is best-effort: it relies on cache.add(), which is atomic on Redis but a check-then-
+write on the file-based cache, so two processes may occasionally compute the same key.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import counter, span
+
+CACHE_LOOKUPS = counter(
+    'portfolio_cache_lookups_total', 'Cache backend lookups by tier (l1, l2) and result.', ('tier', 'result'),
+)
+CACHE_REQUESTS = counter(
+    'portfolio_cache_requests_total',
+    'Namespaced cache reads by namespace and result (hit, miss, stale, waited).', ('namespace', 'result'),
+)
+
+_MISSING = object()
+_CLAIMED = object()
+# Polling interval while waiting for another process to fill a key
+WAIT_POLL_SECONDS = 0.05
+
+
+class _LocalStore:
+    """
+    The L1 of one cache alias: key -> (pickled value, monotonic expiry), in LRU order.
+    Module-level (see _local_stores) because Django creates a backend instance per thread.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[1] <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+            payload = entry[0]
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl):
+        # Pickled like the locmem backend, so callers never share (and mutate) one object
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (payload, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+
+def _local_store(name, max_entries):
+    store = _local_stores.get(name)
+    if store is None:
+        with _local_stores_lock:
+            store = _local_stores.setdefault(name, _LocalStore(max_entries))
+    return store
+
+
+class TieredCache(BaseCache):
+    """
+    In-process L1 in front of the cache alias given as LOCATION (the L2).
+    OPTIONS: L1_MAX_ENTRIES, L1_TIMEOUT (seconds a value is served from L1).
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__(params)
+        self._l2_alias = location
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 10))
+        self._l1 = _local_store(location, int(options.get('L1_MAX_ENTRIES', 1000)))
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self._l1_timeout if timeout is None else min(self._l1_timeout, timeout)
+
+    def _remember(self, key, value, timeout):
+        ttl = self._l1_ttl(timeout)
+        if ttl > 0:
+            self._l1.set(key, value, ttl)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._l1.get(local_key)
+        if value is not _MISSING:
+            CACHE_LOOKUPS.inc(tier='l1', result='hit')
+            return value
+        CACHE_LOOKUPS.inc(tier='l1', result='miss')
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            CACHE_LOOKUPS.inc(tier='l2', result='miss')
+            return default
+        CACHE_LOOKUPS.inc(tier='l2', result='hit')
+        self._remember(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=self._l2_timeout(timeout), version=version)
+        self._remember(local_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=self._l2_timeout(timeout), version=version)
+        if added:
+            self._remember(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout=self._l2_timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        # Atomic on Redis; the L1 copy is dropped so this process sees the new value at once
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+
+    def _l2_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+
+class CacheNamespace:
+    """
+    Keys of one cache under a shared, versioned prefix, with stampede-protected get_or_set().
+    `timeout` is how long an entry is fresh; it is kept for `stale_timeout` seconds more, to
+    be served while one caller recomputes it.
+    """
+
+    def __init__(self, name, timeout=300, stale_timeout=None, alias='default'):
+        self.name = name
+        self.timeout = timeout
+        self.stale_timeout = settings.CACHE_STALE_SECONDS if stale_timeout is None else stale_timeout
+        self.alias = alias
+        self._inflight = {}  # full key -> threading.Event, computations running in this process
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self):
+        return f"ns:{self.name}:version"
+
+    def version(self):
+        version = self.cache.get(self._version_key())
+        if version is None:
+            # Clock-based, so a version lost to eviction never comes back as an older number
+            # (which would bring back entries invalidated since)
+            initial = time.time_ns() // 1_000_000
+            self.cache.add(self._version_key(), initial, timeout=None)
+            version = self.cache.get(self._version_key()) or initial
+        return version
+
+    def key(self, key):
+        key = str(key)
+        if len(key) > 150 or not key.isprintable() or ' ' in key:
+            key = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return f"{self.name}:{self.version()}:{key}"
+
+    def invalidate(self):
+        """
+        Orphan every key of the namespace (other workers follow within CACHE_L1_TIMEOUT).
+        """
+        # Not atomic, but two concurrent invalidations both move readers to a new version
+        self.cache.set(self._version_key(), self.version() + 1, timeout=None)
+
+    def _envelope(self, full_key):
+        envelope = self.cache.get(full_key)
+        return envelope if isinstance(envelope, tuple) and len(envelope) == 2 else None
+
+    def get(self, key, default=None):
+        """
+        The fresh value for key, or default.
+        """
+        envelope = self._envelope(self.key(key))
+        if envelope is not None and envelope[1] > time.time():
+            CACHE_REQUESTS.inc(namespace=self.name, result='hit')
+            return envelope[0]
+        CACHE_REQUESTS.inc(namespace=self.name, result='miss')
+        return default
+
+    def set(self, key, value, timeout=None):
+        self._store(self.key(key), value, self.timeout if timeout is None else timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.key(key))
+
+    def _store(self, full_key, value, timeout):
+        self.cache.set(full_key, (value, time.time() + timeout), timeout=timeout + self.stale_timeout)
+
+    def _claim(self, full_key):
+        """
+        True if this caller should compute the key: nobody in this process is already doing
+        it and no other process holds its L2 lock (best-effort, see the module docstring).
+        """
+        with self._inflight_lock:
+            if full_key in self._inflight:
+                return False
+            self._inflight[full_key] = threading.Event()
+        if self.cache.add(f"{full_key}:lock", 1, timeout=settings.CACHE_LOCK_SECONDS):
+            return True
+        self._finish(full_key)
+        return False
+
+    def _finish(self, full_key, locked=False):
+        if locked:
+            self.cache.delete(f"{full_key}:lock")
+        with self._inflight_lock:
+            event = self._inflight.pop(full_key, None)
+        if event is not None:
+            event.set()
+
+    def _wait(self, full_key):
+        """
+        Wait for the caller computing full_key. Returns the value it stored; _CLAIMED once
+        the claim is free again with nothing stored (that computation failed, or its lock
+        expired) and this caller holds it instead; or _MISSING after CACHE_LOCK_SECONDS.
+        """
+        deadline = time.monotonic() + settings.CACHE_LOCK_SECONDS
+        while time.monotonic() < deadline:
+            with self._inflight_lock:
+                event = self._inflight.get(full_key)
+            if event is not None:
+                event.wait(WAIT_POLL_SECONDS)
+            else:
+                time.sleep(WAIT_POLL_SECONDS)
+            envelope = self._envelope(full_key)
+            if envelope is not None:
+                return envelope[0]
+            if self._claim(full_key):
+                # The value may have been stored between the check above and the claim
+                envelope = self._envelope(full_key)
+                if envelope is None:
+                    return _CLAIMED
+                self._finish(full_key, locked=True)
+                return envelope[0]
+        return _MISSING
+
+    def _compute(self, full_key, compute, timeout):
+        # Called with the claim held; it is released whether compute() succeeds or not
+        CACHE_REQUESTS.inc(namespace=self.name, result='miss')
+        try:
+            with span(f"cache_fill_{self.name}"):
+                value = compute()
+            self._store(full_key, value, timeout)
+            return value
+        finally:
+            self._finish(full_key, locked=True)
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        The cached value for key, computing (and storing) it with compute() when missing or
+        stale. Exceptions from compute() propagate and nothing is stored.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        full_key = self.key(key)
+        envelope = self._envelope(full_key)
+        if envelope is not None and envelope[1] > time.time():
+            CACHE_REQUESTS.inc(namespace=self.name, result='hit')
+            return envelope[0]
+        if self._claim(full_key):
+            return self._compute(full_key, compute, timeout)
+        if envelope is not None:
+            # Someone else is refreshing it: the stale value is good enough meanwhile
+            CACHE_REQUESTS.inc(namespace=self.name, result='stale')
+            return envelope[0]
+        value = self._wait(full_key)
+        if value is _CLAIMED:
+            # The other computation failed: this caller makes the next attempt
+            return self._compute(full_key, compute, timeout)
+        if value is not _MISSING:
+            CACHE_REQUESTS.inc(namespace=self.name, result='waited')
+            return value
+        # The other computation is taking too long: do it here
+        CACHE_REQUESTS.inc(namespace=self.name, result='miss')
+        value = compute()
+        self._store(full_key, value, timeout)
+        return value
+
+
+def invalidate_namespace(name, alias='default'):
+    CacheNamespace(name, alias=alias).invalidate()
+
+
+def reset_local_caches():
+    """
+    Drop the L1 contents and locks inherited from a preloading master.
+    """
+    global _local_stores_lock
+    _local_stores_lock = threading.Lock()
+    # Backend instances keep a reference to their store, so reset the stores in place
+    for store in _local_stores.values():
+        store.lock = threading.Lock()
+        store.entries.clear()
+    caches.close_all()
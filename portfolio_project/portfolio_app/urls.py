@@ -1,11 +1,21 @@
 # portfolio_project/portfolio_app/urls.py
 
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # MODIFIED: Import the new custom_ai_model_view
-from .views import ProjectViewSet, health_check, gemini_chat_view, custom_ai_model_view, codellama_codegen_view, flux_image_view, conversation_history_view, conversation_list_view, conversation_delete_view, conversation_create_view
+from .views import ProjectViewSet, health_check, metrics_view, memory_view, gemini_chat_view, custom_ai_model_view, codellama_codegen_view, flux_image_view, conversation_history_view, conversation_list_view, conversation_delete_view, conversation_create_view, search_view
 from django.views.decorators.csrf import csrf_exempt
 
+if settings.ASGI_MODE:
+    # Same URLs and contracts, served by async views so waiting on upstreams does not hold a thread
+    from .async_views import (
+        gemini_chat_async_view as gemini_chat_view,
+        custom_ai_model_async_view as custom_ai_model_view,
+        codellama_codegen_async_view as codellama_codegen_view,
+        flux_image_async_view as flux_image_view,
+    )
+
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet) # Register the ProjectViewSet at the 'projects' endpoint
@@ -15,6 +25,12 @@ app_name = 'portfolio_app' # Define app_name for namespacing URLs (still good pr
 urlpatterns = [
     # Health check endpoint. Will be /api/health/ due to project/urls.py prefix
     path('health/', health_check, name='health_check'),
+
+    # Prometheus metrics (latency histograms, upstream error counters)
+    path('metrics', metrics_view, name='metrics'),
+
+    # Worker memory: RSS and top allocation sites (tracemalloc, when MEMORY_TRACKING_ENABLED)
+    path('metrics/memory', memory_view, name='memory'),
     
     # Include the API URLs generated by the router. Will be /api/projects/ due to project/urls.py prefix
     path('api/', include(router.urls)), # CORRECTED: Removed 'api/' prefix here
@@ -41,4 +57,7 @@ urlpatterns = [
     path('api/conversation/<int:conversation_id>/', conversation_delete_view, name='conversation_delete'),
     # API endpoint for creating a new conversation (POST)
     path('api/conversation/', conversation_create_view, name='conversation_create'),
+
+    # Full-text search over projects and (with a Google token) the user's own messages
+    path('api/search/', search_view, name='search'),
 ]
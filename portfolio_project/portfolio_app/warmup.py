@@ -0,0 +1,99 @@
+# portfolio_project/portfolio_app/warmup.py
+"""
+Optional warm-up for preforked servers.
+With gunicorn preload enabled (see gunicorn.conf.py), warm_up() runs once in the master
+after Django is loaded: it imports the heavy AI libraries, loads the tokenizer and resolves
+the Pinecone index, so every forked worker inherits them copy-on-write instead of paying
+for them on its first request. reset_after_fork() then drops the per-process state that
+must not be shared between processes (sockets, thread pools, metric values).
+"""
+import importlib
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Deferred by rag_pipeline/views until first use; preloading imports them up front
+HEAVY_MODULES = ('transformers', 'huggingface_hub', 'pinecone', 'bs4', 'lxml', 'pysafebrowsing')
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+def _load_url_conf():
+    # Django imports the URLconf (and with it every view module) on the first request
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def _load_tokenizer():
+    from .rag_pipeline import get_tokenizer
+    get_tokenizer()
+
+
+def _connect_pinecone():
+    if not settings.PINECONE_API_KEY:
+        logger.info("[warm_up] PINECONE_API_KEY not set; skipping Pinecone")
+        return
+    from .rag_pipeline import get_pinecone_index
+    get_pinecone_index()
+
+
+WARM_UP_STEPS = (
+    ('imports', _import_heavy_modules),
+    ('urlconf', _load_url_conf),
+    ('tokenizer', _load_tokenizer),
+    ('pinecone', _connect_pinecone),
+)
+
+
+def warm_up():
+    """
+    Run every warm-up step, returning {step: seconds}. A failing step is logged and
+    skipped; workers then fall back to doing that work lazily.
+    """
+    timings = {}
+    for name, step in WARM_UP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("[warm_up] Step %s failed: %s", name, e)
+            continue
+        timings[name] = time.perf_counter() - started
+    logger.info("[warm_up] Finished: %s", ', '.join(f"{name}={seconds:.2f}s" for name, seconds in timings.items()))
+    return timings
+
+
+def reset_after_fork():
+    """
+    Called in each worker right after fork: discard connection pools, thread pools and
+    metric values inherited from the master. Tokenizers and imported modules are kept.
+    """
+    from .conversation_cache import reset_conversation_cache
+    from .gemini_client import reset_gemini_session
+    from .memory import reset_memory_tracking
+    from .message_writer import reset_message_writer
+    from .metrics import reset_registry
+    from .project_index import reset_project_index_queue
+    from .purge import reset_purge_executor
+    from .rag_pipeline import reset_pinecone_index
+    from .resilience import reset_executor
+    from .summaries import reset_summary_executor
+    from .tiered_cache import reset_local_caches
+
+    reset_gemini_session()
+    reset_pinecone_index()
+    reset_executor()
+    reset_summary_executor()
+    reset_project_index_queue()
+    reset_message_writer()
+    reset_conversation_cache()
+    reset_purge_executor()
+    reset_local_caches()
+    reset_memory_tracking()
+    reset_registry()
@@ -1,16 +1,48 @@
 import os
+import tempfile
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 import dj_database_url
-import logging
+from corsheaders.defaults import default_headers
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Load environment variables from .env for local development
+load_dotenv(BASE_DIR / '.env')
+
+# Logging: records are queued by request threads and written by a background listener
+# thread (portfolio_app.logging_utils), formatted as JSON with large payloads truncated.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', '2000'))
+# Per-logger sampling of DEBUG/INFO records, e.g. "portfolio_app.rag_pipeline=0.1,portfolio_app.views=0.5"
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition('=') for item in os.environ.get('LOG_SAMPLE_RATES', '').split(','))
+    if name.strip() and rate
+}
 
-# Configure logging to show more details for debugging
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'portfolio_app.logging_utils.JsonFormatter',
+            'max_field_chars': LOG_MAX_FIELD_CHARS,
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'portfolio_app.logging_utils.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
+    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'portfolio_app.logging_utils.NonBlockingHandler',
+            'formatter': 'json',
+            'filters': ['sampling'],
         },
     },
     'loggers': {
@@ -24,6 +56,11 @@ LOGGING = {
             'level': 'CRITICAL',
             'propagate': False,
         },
+        'portfolio_app': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -31,12 +68,6 @@ LOGGING = {
     },
 }
 
-# Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-# Load environment variables from .env for local development
-load_dotenv(BASE_DIR / '.env')
-
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'a-very-insecure-default-key-for-local-dev-only')
 
@@ -62,8 +93,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portfolio_app.middleware.ServerTimingMiddleware', # Outermost so Server-Timing covers the whole request
+    'portfolio_app.middleware.MemoryMiddleware', # Peak memory per request, RSS limit checks
+    'portfolio_app.middleware.ProfilingMiddleware', # On-demand profiles also cover the middleware below and rendering
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # IMPORTANT: WhiteNoise should be very high up
+    'portfolio_app.middleware.AsyncCapableWhiteNoiseMiddleware', # IMPORTANT: WhiteNoise should be very high up
+    'portfolio_app.middleware.CompressionMiddleware', # Below WhiteNoise: static files are served pre-compressed
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -157,6 +192,8 @@ REST_FRAMEWORK = {
 CORS_ALLOWED_ORIGINS_STR = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:5173,http://127.0.0.1:5173')
 CORS_ALLOWED_ORIGINS = [h.strip() for h in CORS_ALLOWED_ORIGINS_STR.split(',') if h.strip()]
 CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'False') == 'True'
+# The frontend sends Idempotency-Key on codegen and image requests
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-profile')
 
 
 # CSRF Configuration for Production/Development
@@ -179,6 +216,10 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/project/media' # Absolute path for Docker volume/Render Persistent Disk
 
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+GEMINI_API_BASE = os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.0-flash')
+# Max pooled keep-alive connections to Gemini per worker process
+GEMINI_POOL_MAXSIZE = int(os.environ.get('GEMINI_POOL_MAXSIZE', '10'))
 
 # --- Hugging Face Inference Endpoint Settings ---
 # This is the ID of your fine-tuned model on Hugging Face Hub.
@@ -186,15 +227,276 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 # For the public inference API, it's the model ID (e.g., "betancourtosmar/fine-tuned-mistral-django-qa")
 HF_MODEL_ID = os.getenv('HF_MODEL_ID', 'betancourtosmar/fine-tuned-mistral-django-qa') # Default to your model ID
 HF_API_TOKEN = os.getenv('HF_API_TOKEN') # Your Hugging Face API token (read access)
+# Optional: send all inference calls to this server instead (e.g. a dedicated endpoint or the benchmark stand-ins)
+HF_INFERENCE_BASE_URL = os.getenv('HF_INFERENCE_BASE_URL')
 
 # --- Google reCAPTCHA Settings ---
 # Your reCAPTCHA Secret Key (obtained from Google reCAPTCHA Admin Console)
 RECAPTCHA_SECRET_KEY = os.getenv('RECAPTCHA_SECRET_KEY')
 
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID", None)
+GOOGLE_OAUTH2_CERTS_URL = os.environ.get("GOOGLE_OAUTH2_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
 
 # --- Pinecone Settings ---
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", None)
 PINECONE_HOST = os.environ.get("PINECONE_HOST", None)
+# Optional control-plane host override (list/describe indexes)
+PINECONE_CONTROLLER_HOST = os.environ.get("PINECONE_CONTROLLER_HOST", None)
+
+GOOGLE_SAFE_BROWSING_API_KEY = os.getenv('GOOGLE_SAFE_BROWSING_API_KEY')
+GOOGLE_SAFE_BROWSING_API_URL = os.getenv('GOOGLE_SAFE_BROWSING_API_URL')
+
+# --- Cache (see portfolio_app/tiered_cache.py) ---
+# 'default' is an in-process L1 in front of the shared L2 'shared', chosen by CACHE_URL:
+# file:///path (default; shared by the workers of one machine), redis://host:6379/0 (shared by
+# all machines; needs the redis package) or locmem:// (private to each process). The file
+# cache holds pickles, so its directory must be private to the app's user (see _private_dir)
+_CACHE_DIR = Path(tempfile.gettempdir()) / f"portfolio-cache-{os.getuid() if hasattr(os, 'getuid') else 'user'}"
+CACHE_URL = os.environ.get('CACHE_URL', f"file://{_CACHE_DIR}")
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))
+# Entries kept in each worker's L1, and how long a value is served from there (which is also
+# how long other workers may serve a value after it was changed or invalidated)
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', '1000'))
+CACHE_L1_TIMEOUT = float(os.environ.get('CACHE_L1_TIMEOUT', '10'))
+# Expired entries are still served for this long while one caller recomputes them
+CACHE_STALE_SECONDS = int(os.environ.get('CACHE_STALE_SECONDS', '60'))
+# Longest a computation may hold a key's lock (others wait up to this long without a stale value)
+CACHE_LOCK_SECONDS = int(os.environ.get('CACHE_LOCK_SECONDS', '30'))
+
+
+def _private_dir(path):
+    """
+    Create path as a directory only this user can use (mode 0700), and refuse an existing
+    one owned by someone else or open to others: whoever can write the file cache's pickles
+    can run code in the app, and whoever can lock the bulkhead slot files can starve it.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        info = os.stat(path)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ImproperlyConfigured(
+                f"Directory {path} must be owned by uid {os.getuid()} and not accessible to others (chmod 700)"
+            )
+    return path
+
+
+def _shared_cache(url):
+    if url.startswith(('redis://', 'rediss://')):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url, 'TIMEOUT': None}
+    if url.startswith('locmem://'):
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared', 'TIMEOUT': None,
+                'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES}}
+    return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': _private_dir(url.removeprefix('file://')),
+            'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES}}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'portfolio_app.tiered_cache.TieredCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': None,
+        'OPTIONS': {'L1_MAX_ENTRIES': CACHE_L1_MAX_ENTRIES, 'L1_TIMEOUT': CACHE_L1_TIMEOUT},
+    },
+    'shared': _shared_cache(CACHE_URL),
+}
+
+# --- Semantic answer cache (codegen endpoint) ---
+SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'True') == 'True'
+# Minimum cosine similarity between question embeddings to reuse a cached answer
+SEMANTIC_CACHE_SIMILARITY_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_SIMILARITY_THRESHOLD', '0.95'))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.environ.get('SEMANTIC_CACHE_TTL_SECONDS', '3600'))
+# Answers kept per retrieved context (and history); the shared cache evicts whole contexts
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get('SEMANTIC_CACHE_MAX_ENTRIES', '32'))
+# Embeddings of identical inputs, and fetched URL pages and their Safe Browsing verdicts
+EMBEDDING_CACHE_SECONDS = int(os.environ.get('EMBEDDING_CACHE_SECONDS', '86400'))
+URL_CONTENT_CACHE_SECONDS = int(os.environ.get('URL_CONTENT_CACHE_SECONDS', '900'))
+URL_SAFETY_CACHE_SECONDS = int(os.environ.get('URL_SAFETY_CACHE_SECONDS', '3600'))
+
+# --- Prompt context packing (codegen endpoint) ---
+# Pinecone matches fetched per question; near-duplicates are dropped and the rest are
+# MMR-ranked and packed into CONTEXT_TOKEN_BUDGET (URL content included)
+CONTEXT_FETCH_K = int(os.environ.get('CONTEXT_FETCH_K', '10'))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '1500'))
+# 1.0 ranks by relevance only; lower values favour chunks unlike those already chosen
+CONTEXT_MMR_LAMBDA = float(os.environ.get('CONTEXT_MMR_LAMBDA', '0.7'))
+# Shingle (word 5-gram) Jaccard similarity at which a chunk counts as a duplicate
+CONTEXT_DUPLICATE_THRESHOLD = float(os.environ.get('CONTEXT_DUPLICATE_THRESHOLD', '0.6'))
+
+# --- Project auto-indexing (Project records as RAG context) ---
+# Saved/deleted projects are synced to the Pinecone index in the background (needs PINECONE_API_KEY)
+PROJECT_INDEX_ENABLED = os.environ.get('PROJECT_INDEX_ENABLED', 'True') == 'True'
+# Saves within this window are embedded and upserted as one batch
+PROJECT_INDEX_DELAY_SECONDS = float(os.environ.get('PROJECT_INDEX_DELAY_SECONDS', '2'))
+
+# --- Rolling conversation summaries (codegen endpoint) ---
+# Once the unsummarized part of a conversation exceeds the trigger, a background job folds
+# everything but the most recent messages into Conversation.summary
+CONVERSATION_SUMMARY_ENABLED = os.environ.get('CONVERSATION_SUMMARY_ENABLED', 'True') == 'True'
+CONVERSATION_SUMMARY_TRIGGER_TOKENS = int(os.environ.get('CONVERSATION_SUMMARY_TRIGGER_TOKENS', '1500'))
+CONVERSATION_SUMMARY_KEEP_RECENT = int(os.environ.get('CONVERSATION_SUMMARY_KEEP_RECENT', '6'))
+# Characters of transcript per summarization call (Pegasus reads at most ~512 tokens)
+CONVERSATION_SUMMARY_INPUT_CHARS = int(os.environ.get('CONVERSATION_SUMMARY_INPUT_CHARS', '2000'))
+CONVERSATION_SUMMARY_MAX_LENGTH = int(os.environ.get('CONVERSATION_SUMMARY_MAX_LENGTH', '120'))
+
+# --- Conversation message persistence ---
+# Write-behind: the AI endpoints queue messages and respond without waiting for the database;
+# a background thread per worker writes them in batches (see portfolio_app/message_writer.py)
+MESSAGE_WRITE_BEHIND = os.environ.get('MESSAGE_WRITE_BEHIND', 'False') == 'True'
+MESSAGE_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('MESSAGE_WRITE_BEHIND_BATCH_SIZE', '100'))
+MESSAGE_WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get('MESSAGE_WRITE_BEHIND_FLUSH_SECONDS', '0.2'))
+# Beyond this many queued exchanges, requests write synchronously instead
+MESSAGE_WRITE_BEHIND_MAX_QUEUE = int(os.environ.get('MESSAGE_WRITE_BEHIND_MAX_QUEUE', '10000'))
+# Exchanges that cannot be written at shutdown are saved here and replayed on the next start
+MESSAGE_WRITE_BEHIND_SPOOL_DIR = os.environ.get('MESSAGE_WRITE_BEHIND_SPOOL_DIR', str(BASE_DIR / 'message-spool'))
+
+# --- Conversation archive (cold storage) ---
+# `manage.py archive_conversations` compresses the messages of conversations idle this long
+# into one blob per conversation (see portfolio_app/archive.py)
+CONVERSATION_ARCHIVE_IDLE_DAYS = int(os.environ.get('CONVERSATION_ARCHIVE_IDLE_DAYS', '90'))
+CONVERSATION_ARCHIVE_CODEC = os.environ.get('CONVERSATION_ARCHIVE_CODEC', 'zlib')  # zlib or lzma
+
+# --- Conversation deletion and retention ---
+# Deleted conversations are hidden at once and purged in the background in raw DELETE
+# batches of this many messages (see portfolio_app/purge.py)
+CONVERSATION_PURGE_BATCH_SIZE = int(os.environ.get('CONVERSATION_PURGE_BATCH_SIZE', '1000'))
+CONVERSATION_PURGE_PAUSE_SECONDS = float(os.environ.get('CONVERSATION_PURGE_PAUSE_SECONDS', '0.05'))
+# `manage.py purge_conversations` deletes conversations idle this long (unset: only finish
+# pending deletions unless --older-than-days is given)
+CONVERSATION_RETENTION_DAYS = int(os.environ['CONVERSATION_RETENTION_DAYS']) if os.environ.get('CONVERSATION_RETENTION_DAYS') else None
+
+# --- Projects API ---
+# Projects per page of /api/projects/ (cursor pagination; clients may ask for up to 100 with ?page_size=)
+PROJECTS_PAGE_SIZE = int(os.environ.get('PROJECTS_PAGE_SIZE', '20'))
+# Pages of the project list are cached this long (any change to projects invalidates them)
+PROJECTS_CACHE_SECONDS = int(os.environ.get('PROJECTS_CACHE_SECONDS', '300'))
+
+# --- Idempotency keys (codegen and image generation) ---
+# A duplicate waits this long for the request that first used its key before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '60'))
+# A key still processing after this long is assumed abandoned (e.g. its worker died) and may be
+# claimed again; keep it above the image deadline (UPSTREAM_DEADLINE_HF_IMAGE)
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '300'))
+# How long responses are kept for replay (`manage.py purge_idempotency_keys` deletes older keys)
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+
+# --- Codegen fast path ---
+# Greetings, thanks and chit-chat are answered without URL extraction, embedding or retrieval
+# (see portfolio_app/fast_path.py): with a canned reply, or 'llm' for a minimal-prompt LLM reply
+FAST_PATH_ENABLED = os.environ.get('FAST_PATH_ENABLED', 'True') == 'True'
+FAST_PATH_REPLIES = os.environ.get('FAST_PATH_REPLIES', 'canned')
+# Longer inputs always take the full pipeline
+FAST_PATH_MAX_CHARS = int(os.environ.get('FAST_PATH_MAX_CHARS', '80'))
+
+# --- Search (/api/search/) ---
+# Results per page (at most SEARCH_MAX_PAGE_SIZE with ?page_size=) and the longest query accepted
+SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', '50'))
+SEARCH_MAX_QUERY_CHARS = int(os.environ.get('SEARCH_MAX_QUERY_CHARS', '200'))
+
+# --- Response size ---
+# Brotli (when the brotli package is installed) or gzip for JSON, HTML and plain-text responses
+# of at least this size; streaming responses are never compressed
+RESPONSE_COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'True') == 'True'
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('RESPONSE_COMPRESSION_BROTLI_QUALITY', '5'))
+# Characters of each retrieved context chunk in codegen responses (?context=full for all of it)
+CONTEXT_PREVIEW_CHARS = int(os.environ.get('CONTEXT_PREVIEW_CHARS', '300'))
+
+# --- Hot conversation cache (codegen endpoint) ---
+# Per-worker cache of recently used conversations and their latest messages
+# (see portfolio_app/conversation_cache.py)
+CONVERSATION_CACHE_ENABLED = os.environ.get('CONVERSATION_CACHE_ENABLED', 'True') == 'True'
+CONVERSATION_CACHE_MAX_CONVERSATIONS = int(os.environ.get('CONVERSATION_CACHE_MAX_CONVERSATIONS', '1000'))
+CONVERSATION_CACHE_MAX_MESSAGES = int(os.environ.get('CONVERSATION_CACHE_MAX_MESSAGES', '50'))
+CONVERSATION_CACHE_TTL_SECONDS = int(os.environ.get('CONVERSATION_CACHE_TTL_SECONDS', '1800'))
+# Check each hit against the conversation's updated_at (one primary-key query); needed when
+# several workers write to the same conversations
+CONVERSATION_CACHE_VALIDATE = os.environ.get(
+    'CONVERSATION_CACHE_VALIDATE', str(int(os.environ.get('WEB_CONCURRENCY', '1')) > 1)
+) == 'True'
+
+# --- Upstream resilience (deadlines, circuit breakers, hedging) ---
+# Per-dependency deadline in seconds for a single upstream call
+UPSTREAM_DEFAULT_DEADLINE = float(os.environ.get('UPSTREAM_DEFAULT_DEADLINE', '30'))
+UPSTREAM_DEADLINES = {
+    'hf_embedding': float(os.environ.get('UPSTREAM_DEADLINE_HF_EMBEDDING', '10')),
+    'hf_llm': float(os.environ.get('UPSTREAM_DEADLINE_HF_LLM', '60')),
+    'hf_image': float(os.environ.get('UPSTREAM_DEADLINE_HF_IMAGE', '120')),
+    'hf_summarization': float(os.environ.get('UPSTREAM_DEADLINE_HF_SUMMARIZATION', '30')),
+    'pinecone': float(os.environ.get('UPSTREAM_DEADLINE_PINECONE', '5')),
+    'gemini': float(os.environ.get('UPSTREAM_DEADLINE_GEMINI', '30')),
+    'safebrowsing': float(os.environ.get('UPSTREAM_DEADLINE_SAFEBROWSING', '5')),
+    'google_auth': float(os.environ.get('UPSTREAM_DEADLINE_GOOGLE_AUTH', '5')),
+    'recaptcha': float(os.environ.get('UPSTREAM_DEADLINE_RECAPTCHA', '5')),
+}
+# Consecutive failures that open a breaker, and how long it stays open before a probe
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.environ.get('CIRCUIT_BREAKER_RESET_SECONDS', '30'))
+# Threads available for in-flight upstream calls per worker process
+UPSTREAM_MAX_THREADS = int(os.environ.get('UPSTREAM_MAX_THREADS', '16'))
+# Hedged retries for idempotent calls: start a second attempt after this many seconds
+UPSTREAM_HEDGING_ENABLED = os.environ.get('UPSTREAM_HEDGING_ENABLED', 'False') == 'True'
+UPSTREAM_HEDGE_DELAYS = {
+    'hf_embedding': float(os.environ.get('UPSTREAM_HEDGE_DELAY_HF_EMBEDDING', '1.5')),
+    'pinecone': float(os.environ.get('UPSTREAM_HEDGE_DELAY_PINECONE', '0.5')),
+    'safebrowsing': float(os.environ.get('UPSTREAM_HEDGE_DELAY_SAFEBROWSING', '1.0')),
+}
 
-GOOGLE_SAFE_BROWSING_API_KEY = os.getenv('GOOGLE_SAFE_BROWSING_API_KEY')
\ No newline at end of file
+# --- Bulkheads (concurrent upstream calls) ---
+# Concurrent calls allowed per dependency, counted across all workers of the machine (slot
+# files locked under BULKHEAD_DIR). Dependencies not listed are not limited. Keep the total
+# below the request threads (GUNICORN_THREADS x workers) so health checks and the projects
+# API always find a free thread while the AI endpoints are saturated.
+BULKHEAD_ENABLED = os.environ.get('BULKHEAD_ENABLED', 'True') == 'True'
+_BULKHEAD_DIR = Path(tempfile.gettempdir()) / f"portfolio-bulkheads-{os.getuid() if hasattr(os, 'getuid') else 'user'}"
+BULKHEAD_DIR = _private_dir(os.environ.get('BULKHEAD_DIR', str(_BULKHEAD_DIR)))
+BULKHEAD_LIMITS = {
+    'hf_llm': int(os.environ.get('BULKHEAD_LIMIT_HF_LLM', '2')),
+    'hf_image': int(os.environ.get('BULKHEAD_LIMIT_HF_IMAGE', '1')),
+    'gemini': int(os.environ.get('BULKHEAD_LIMIT_GEMINI', '2')),
+    'hf_embedding': int(os.environ.get('BULKHEAD_LIMIT_HF_EMBEDDING', '2')),
+    'pinecone': int(os.environ.get('BULKHEAD_LIMIT_PINECONE', '2')),
+    # Batch jobs (manage.py ingest, reconcile_project_index and the project index thread) have
+    # their own slots, so running them never takes Pinecone or embedding slots from live
+    # requests. `ingest --concurrency` is capped below the Pinecone batch limit.
+    'pinecone_batch': int(os.environ.get('BULKHEAD_LIMIT_PINECONE_BATCH', '6')),
+    'hf_embedding_batch': int(os.environ.get('BULKHEAD_LIMIT_HF_EMBEDDING_BATCH', '2')),
+}
+# Callers that may wait for a slot per dependency, and for how long; beyond that a
+# request is rejected at once with 503 and Retry-After: BULKHEAD_RETRY_AFTER_SECONDS
+BULKHEAD_QUEUE_SIZE = int(os.environ.get('BULKHEAD_QUEUE_SIZE', '2'))
+BULKHEAD_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_QUEUE_TIMEOUT', '2'))
+BULKHEAD_RETRY_AFTER_SECONDS = int(os.environ.get('BULKHEAD_RETRY_AFTER_SECONDS', '5'))
+
+# --- Metrics / Server-Timing ---
+# Bearer token required to scrape /metrics; without it the endpoint answers 404
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+# When set, each worker snapshots its metrics here and /metrics merges all live workers
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_DUMP_INTERVAL_SECONDS = float(os.environ.get('METRICS_DUMP_INTERVAL_SECONDS', '5'))
+
+# --- On-demand request profiling ---
+# Staff get a signed token from `manage.py profile_token` and send it as X-Profile (or
+# ?profile=) to profile that request; see portfolio_app/profiling.py
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'True') == 'True'
+PROFILING_TOKEN_MAX_AGE_SECONDS = int(os.environ.get('PROFILING_TOKEN_MAX_AGE_SECONDS', '3600'))
+PROFILING_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+# Newest profiles kept in the database
+PROFILING_MAX_STORED = int(os.environ.get('PROFILING_MAX_STORED', '200'))
+
+# --- Memory accounting and worker recycling ---
+# tracemalloc in every worker: peak memory per request and per stage, and the top
+# allocation sites at /metrics/memory. Tracing slows allocation-heavy code, so it is opt-in.
+MEMORY_TRACKING_ENABLED = os.environ.get('MEMORY_TRACKING_ENABLED', 'False') == 'True'
+# Frames kept per allocation (more frames: longer stacks in ?group=traceback reports, more overhead)
+MEMORY_TRACE_FRAMES = int(os.environ.get('MEMORY_TRACE_FRAMES', '5'))
+# A gunicorn worker whose RSS passes this many MiB is recycled gracefully (0 disables)
+MEMORY_RSS_LIMIT_MB = int(os.environ.get('MEMORY_RSS_LIMIT_MB', '0'))
+MEMORY_RSS_CHECK_SECONDS = float(os.environ.get('MEMORY_RSS_CHECK_SECONDS', '5'))
+
+# --- ASGI mode ---
+# Serve through uvicorn workers (see gunicorn.conf.py) and route the AI endpoints to the
+# async views in portfolio_app/async_views.py
+ASGI_MODE = os.environ.get('ASGI_MODE', 'False') == 'True'
+# Threads per worker for blocking work the async views cannot await (token checks, URL fetches, tokenizer)
+ASYNC_BLOCKING_THREADS = int(os.environ.get('ASYNC_BLOCKING_THREADS', '32'))